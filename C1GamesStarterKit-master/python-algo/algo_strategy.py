@@ -1,24 +1,43 @@
 import gamelib
+from gamelib import instrumentation
 import random
 import math
 import warnings
 from sys import maxsize
 import json
 
-
 """
 Most of the algo code you write will be in this file unless you create new
 modules yourself. Start by modifying the 'on_turn' function.
 
 Advanced strategy tips: 
 
-  - You can analyze action frames by modifying on_action_frame function
+  - You can react to events of the action phase, such as breaches, by modifying 
+  the on_breach function, or analyze whole action frames in on_action_frame
 
   - The GameState.map object can be manually manipulated to create hypothetical 
   board states. Though, we recommended making a copy of the map to preserve 
-  the actual current map state.
+  the actual current map state. GameState.fork() makes a cheap copy to experiment on.
+
+  - Set the GAMELIB_INSTRUMENTATION environment variable to a file path, or to "-"
+  for stderr, to write a JSON record of where the time of each turn went, including
+  the strategy phases timed below. Otherwise their timers are compiled out.
+
+  - on_turn runs its analysis through a TurnScheduler, which submits the best
+  plan found once its tasks are done or the turn's time budget runs out. Add
+  tasks to it, and propose forks holding alternative plans.
 """
 
+# Detailed output of the attack calculations is logged at the debug level,
+# call gamelib.set_level(gamelib.log.DEBUG, "algo_strategy") to see it
+log = gamelib.get_logger("algo_strategy")
+
+def defense_value(unit):
+    """ The defensive value of a unit, summed over each side of the board by which_side_weaker.
+    Each point of health is worth what the unit cost, and damage to mobile units is added on top. """
+    return unit.cost[0] * unit.health + unit.damage_i
+
+
 class AlgoStrategy(gamelib.AlgoCore):
     def __init__(self):
         super().__init__()
@@ -41,18 +60,25 @@ class AlgoStrategy(gamelib.AlgoCore):
         INTERCEPTOR = config["unitInformation"][5]["shorthand"]
         MP = 1
         SP = 0
+        # Set to True to prepare paths and threat maps for the next turn while the engine plays out the action phase.
+        # It runs on a thread competing with on_turn, and did not make the turns of local games faster, so it is off
+        self.speculate = False
+        # on_action_frame only looks at breaches, so frames without them can be skipped when turns fall behind
+        self.coalesce_frames = True
         # This is a good place to do initial setup
         self.scored_on_locations = []
-        # Stores all of the places we have already built a structure in as [[x: int, y: int, type: str, upgraded: 0/1]]
-        self.built_structures = []
-        # The iteration number we are of the defense lineup
-        self.defense_iteration = 1
+        # Stores all of the places we have already built a structure in, in the order they were built, to rebuild them when destroyed
+        self.built_structures = gamelib.StructureRegistry()
         # Defense iteration order
         self.defense_order = ["TURRET", "WALL", "FUNNEL", "SUPPORT"]
-        # The index of the current defense stage we are supposed to be at
-        self.intended_defense_stage = 0
         self.priority_supports =  [[13, 2, SUPPORT, 0],
                 [14, 2, SUPPORT, 0]]
+        # The areas compared by which_side_weaker, compiled once into the locations they cover
+        self.side_regions = [
+            gamelib.Region("L", [[0, 13], [8, 13], [8, 10], [3, 10]]),
+            gamelib.Region("C", [[10, 7], [18, 7], [10, 13], [18, 13]]),
+            gamelib.Region("R", [[27, 13], [24, 10], [19, 10], [19, 13]]),
+        ]
         # Stores the map of formations by priority and side
         # List description: [x, y, TYPE, upgraded]
         # To understand the placements strategy, play through doing all turns 1 for LRC turret, then wall, then funnel, then support, and then playing through for turns 2-4
@@ -232,6 +258,15 @@ class AlgoStrategy(gamelib.AlgoCore):
                 "C": []
             }
         }
+        # Compiles the formations into a single plan: priority supports, then the cycle through each stage of iterations 1 to 4
+        # Stages are named (stage, iteration), and their items are dropped from the plan once built
+        self.defense_plan = gamelib.BuildPlan()
+        self.defense_plan.add_stage("PRIORITY_SUPPORT", self.priority_supports)
+        formations = {"TURRET": self.turret_formations, "WALL": self.wall_formations,
+                      "FUNNEL": self.funnel_formations, "SUPPORT": self.support_formations}
+        for iteration in range(1, 5):
+            for stage in self.defense_order:
+                self.defense_plan.add_stage((stage, iteration), formations[stage][iteration])
 
 
     def on_turn(self, turn_state):
@@ -245,30 +280,76 @@ class AlgoStrategy(gamelib.AlgoCore):
         game_state = gamelib.GameState(self.config, turn_state)
         gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
         game_state.suppress_warnings(True)  #Comment or remove this line to enable warnings.
+        # Waits briefly for a speculation still running, the turn's time is better spent on the strategy
+        self.reconcile_speculation(game_state, timeout=0.005)
         
-        # Executes our custom strategy
-        self.custom_strategy(game_state)
-
-        game_state.submit_turn()
+        # Executes our custom strategy within the turn's time budget, then submits the best plan found
+        scheduler = gamelib.TurnScheduler(game_state, start_time=self.turn_start_time)
+        self.custom_strategy(scheduler)
+        return scheduler.submit()
 
     """
     NOTE: This is where our algorithm begins, the code below is part of the provided starter-algo.    
     """
 
-    def custom_strategy(self, game_state):
+    def custom_strategy(self, scheduler):
+        # Each task builds on a fork of the best plan so far and proposes it, so the tasks that finish before the turn's time runs out are submitted
         # Execute setup if this is the first turn
-        if game_state.turn_number == 0:
-            self.execute_setup_formation(game_state)
+        if scheduler.game_state.turn_number == 0:
+            scheduler.add_task(self.setup_task, priority=4)
         else:
-            # Determine if anything needs to be rebuilt
-            structure_points_after_rebuild = self.execute_rebuild(game_state)
-            # Setup defenses if we have more than 1 structure point left
-            if structure_points_after_rebuild > 1:
-                self.execute_defense(game_state)
-        # Execute attack
-        if game_state.turn_number != 0:
-            self.execute_attack(game_state)
-    
+            # Rebuild, then setup defenses, then attack, and lastly defend the locations we were scored on with what is left
+            scheduler.add_task(self.rebuild_task, priority=4)
+            scheduler.add_task(self.defense_task, priority=3)
+            scheduler.add_task(self.attack_task, priority=2)
+            scheduler.add_task(self.reactive_defense_task, priority=1)
+
+    def next_score(self, scheduler):
+        # Every plan builds on the best plan before it, so it is always the better one
+        return 1 if scheduler.best_score is None else scheduler.best_score + 1
+
+    def setup_task(self, scheduler):
+        plan = scheduler.best_plan.fork()
+        self.execute_setup_formation(plan)
+        scheduler.propose(plan, self.next_score(scheduler))
+
+    def rebuild_task(self, scheduler):
+        plan = scheduler.best_plan.fork()
+        self.execute_rebuild(plan)
+        scheduler.propose(plan, self.next_score(scheduler))
+
+    def defense_task(self, scheduler):
+        plan = scheduler.best_plan.fork()
+        # Setup defenses if we have more than 1 structure point left after rebuilding
+        if plan.get_resource(SP, 0) <= 1:
+            return
+        try:
+            for _ in self.execute_defense(plan):
+                yield
+        except GeneratorExit:
+            # The scheduler stops the task between stages once the time runs out, so the plan holds every stage built so far
+            scheduler.propose(plan, self.next_score(scheduler))
+            raise
+        scheduler.propose(plan, self.next_score(scheduler))
+
+    def attack_task(self, scheduler):
+        plan = scheduler.best_plan.fork()
+        # Get information about attacking each side, from the bottom right to attack left and the bottom left to attack right
+        # Each side takes a simulation, so the task can stop in between
+        breach_left = self.can_breach_enemy([14, 0], plan)
+        yield
+        breach_right = self.can_breach_enemy([13, 0], plan)
+        self.execute_attack(plan, breach_left, breach_right)
+        yield plan, self.next_score(scheduler)
+
+    def reactive_defense_task(self, scheduler):
+        if not self.scored_on_locations:
+            return
+        plan = scheduler.best_plan.fork()
+        self.build_reactive_defense(plan)
+        scheduler.propose(plan, self.next_score(scheduler))
+
+    @instrumentation.timer("strategy.setup")
     def execute_setup_formation(self, game_state):
         # Setup locations for all turrets
         turrets = [[14,11], [4,12], [23, 12]]
@@ -279,27 +360,23 @@ class AlgoStrategy(gamelib.AlgoCore):
             game_state.attempt_spawn(TURRET, [turret], 1)
             game_state.attempt_upgrade([turret])
             # Adds structures to built structures, in upgraded form
-            self.built_structures.append([turret[0], turret[1], TURRET, 1])
+            self.built_structures.add(turret[0], turret[1], TURRET, 1)
         # Spawns all walls
         for wall in walls:
             game_state.attempt_spawn(WALL, [wall], 1)
             # Adds structures to built structures, in non-upgraded form
-            self.built_structures.append([wall[0], wall[1], WALL, 0])
+            self.built_structures.add(wall[0], wall[1], WALL, 0)
 
+    @instrumentation.timer("strategy.rebuild")
     def execute_rebuild(self, game_state):
-        # Iterates through all of the built structures, checking if any of them need to be rebuilt
-        # List allows us to maintain the priority that everything should be rebuilt in the order that it was built
-        for structure in self.built_structures:
-            # Parses parameters
-            x = structure[0]
-            y = structure[1]
-            type = structure[2]
-            upgraded = structure[3]
+        # Only the built structures that were destroyed or lost their upgrade, in the order they were built
+        for structure, destroyed in self.built_structures.missing(game_state):
             # Attemps to spawn structure
-            game_state.attempt_spawn(type, [x, y], 1)
+            if destroyed:
+                game_state.attempt_spawn(structure.unit_type, [structure.x, structure.y], 1)
             # Attempts to upgrade structure if it was previously upgraded
-            if upgraded:
-                game_state.attempt_upgrade([x, y])
+            if structure.upgrade:
+                game_state.attempt_upgrade([structure.x, structure.y])
             # Gets own structure points, returns if we have 1 structure point left since that means we can't possibly do anything
             remaining_structure_points = game_state.get_resource(0, 0)
             # Returns out if one point or less left
@@ -310,118 +387,29 @@ class AlgoStrategy(gamelib.AlgoCore):
         return game_state.get_resource(0, 0)
     
     def execute_defense(self, game_state):
-        # Constants for determining the order of defense gameplay
-        current_defense_stage = self.intended_defense_stage
-        current_turn_iteration = self.defense_iteration
-        # This variable keeps track of whether the intended and the current stage is the same
-        # If true, all stage have succeeded
-        # If false, we are off cycle because we have failed a stage and skipped a couple to spend points as we did not have enough points for some previous stage
-        off_cycle = False
-        # Stores stockpiling
-        stockpiling = self.is_enemy_stockpiling(game_state)
-        stockpiling_accounted_for = False
-        priority_supports_accounted_for = False
-        # Number of turns taken
-        turns = 0
-        # Iterates through defense moves until we have insufficient structure points to do anything or we hit an infinite loop or we reach a state where we have maxed out defense (after 4 turns)
-        while (game_state.get_resource(0,0) >= 2) and turns < 30 and current_turn_iteration <= 4:
-            gamelib.debug_write(f"Defense Stage: {current_defense_stage} Turn Iteration: {current_turn_iteration}")
-            # If only 2 structure points, we default to "WALL"
-            structure_points = game_state.get_resource(0,0)
-            # Stores which upgrades are priority, ["L", "R", "C"] in some order
-            side_priorities = [side_denominator[0] for side_denominator in self.which_side_weaker(game_state)]
-            # Determines which stage to default to, first priority is walls with two points left, then turrets if stockpiling, and then intended order
-            if self.priority_supports and not priority_supports_accounted_for:
-                for defense_tuple in self.priority_supports:
-                    status = game_state.attempt_spawn(defense_tuple[2], [defense_tuple[0], defense_tuple[1]], 1)
-                    if status:
-                        # Removes thing from list of defenses
-                        self.priority_supports.remove(defense_tuple)
-                        # Appends [x, y, TYPE, upgraded]
-                        self.built_structures.append([defense_tuple[0], defense_tuple[1], defense_tuple[2], defense_tuple[3]])
-                priority_supports_accounted_for = True
-            if stockpiling and not stockpiling_accounted_for:
-                stage = "TURRET"
-                stockpiling_accounted_for = True
-                off_cycle = True
-            else:
-                stage = self.defense_order[current_defense_stage]
-            # Turret stage
-            if stage == "TURRET":
-                # Places turrets
-                succeeded = self.place_defenses(game_state, side_priorities, self.turret_formations[current_turn_iteration])
-                # Points to defense stage WALL
-                current_defense_stage = 1
-                gamelib.debug_write("Finished turret, advancing to wall")
-            # Wall stage
-            elif stage == "WALL":
-                # Places walls
-                succeeded = self.place_defenses(game_state, side_priorities, self.wall_formations[current_turn_iteration])
-                # Points to defense stage FUNNEL
-                current_defense_stage = 2
-                gamelib.debug_write("Finished wall, advancing to funnel")
-            # Funnel stage
-            elif stage == "FUNNEL":
-                # Places funnel
-                succeeded = self.place_defenses(game_state, side_priorities, self.funnel_formations[current_turn_iteration])
-                # Points to defense stage SUPPORT
-                current_defense_stage = 3
-                gamelib.debug_write("Finished funnel, advancing to support")
-            # Support stage
-            else:
-                # Places support
-                succeeded = self.place_defenses(game_state, side_priorities, self.support_formations[current_turn_iteration])
-                # Points to defense stage TURRET
-                current_defense_stage = 0
-                gamelib.debug_write("Finished support, advancing to turret")
-            # Adds that a turn was completed
-            turns += 1
-            # If we reset to 0, increase the turn iteration by 1 too
-            if current_defense_stage == 0:
-                current_turn_iteration += 1
-            # If it did not succeed, indicate that we are going off cycle
-            if not succeeded:
-                off_cycle = True
-            # If we are still on cycle, update the intended defense constants and the current defense constants to match
-            if not off_cycle:
-                self.intended_defense_stage = current_defense_stage
-                self.defense_iteration = current_turn_iteration  
-        # If an infinite loop was hit, print a statement for debuggability
-        if turns == 30:
-            gamelib.debug_write("HIT AN INFINITE LOOP ON DEFENSE ITERATIONS")
-        return
-
-    def place_defenses(self, game_state, side_priorities, formation) -> bool:
-        # Stores whether or not all of the moves so far have been succeeded
-        succeeded = True
-        # Iterates through all of the moves, in the order of the side priorities
-        for side in side_priorities:
-            # Gets the list of defenses to place for that side
-            list_of_defenses = formation[side]
-            # Parses each defense, attempting to place it
-            # Tuple = [x, y, TYPE, upgraded (0,1)]
-            for defense_tuple in list_of_defenses:
-                upgraded = defense_tuple[3]
-                # Attempts to spawn/update in different ways depending on whether or not we need an upgraded version of the structure
-                if upgraded:
-                    game_state.attempt_spawn(defense_tuple[2], [defense_tuple[0], defense_tuple[1]], 1)
-                    move_status = game_state.attempt_upgrade([defense_tuple[0], defense_tuple[1]])
-                else:
-                    move_status = game_state.attempt_spawn(defense_tuple[2], [defense_tuple[0], defense_tuple[1]], 1)
-                # Removes move from list if it has succeeded
-                if move_status:
-                    # Removes thing from list of defenses
-                    list_of_defenses.remove(defense_tuple)
-                    # Appends [x, y, TYPE, upgraded]
-                    self.built_structures.append([defense_tuple[0], defense_tuple[1], defense_tuple[2], defense_tuple[3]])
-                # Changes var to False if otherwise
-                else:
-                    succeeded = False
-        return succeeded
-
-    def execute_attack(self, game_state):
-        # Determines whether or not we will be attacking
-        attack, attack_left_side, number_of_troops = self.execute_attack_calculation(game_state)
+        # Builds one stage at a time, yielding after each
+        # The cycle resumes from the first stage not completed yet, and goes through each stage in order while at least 2 structure points are left
+        # Once a stage fails, the following ones are built off cycle to spend the points, and the cycle resumes from the failed stage next turn
+        cycle = [stage for stage in self.defense_plan.names if stage != "PRIORITY_SUPPORT"]
+        turrets = None
+        # If the enemy is stockpiling, the turrets of the current iteration come first, off cycle, followed by the walls of that iteration
+        if self.defense_plan.cursor < len(cycle) and self.is_enemy_stockpiling(game_state):
+            turrets = ("TURRET", cycle[self.defense_plan.cursor][1])
+        # Priority supports are attempted once at the start, and sides ordered by which is weakest when each stage starts
+        recorded = 0
+        for result in self.defense_plan.iter_cycle(game_state, first=turrets, before=["PRIORITY_SUPPORT"],
+                group_order=self.which_side_weaker, min_resource=2):
+            # Records what each stage built right away, so it is rebuilt later even if the turn stops after this stage
+            for item in result.built[recorded:]:
+                self.built_structures.add(item.x, item.y, item.unit_type, item.upgrade)
+            recorded = len(result.built)
+            gamelib.debug_write("Defense stage {}: built {}, deferred {}, blocked {} so far".format(
+                result.stages[-1], recorded, len(result.deferred), len(result.blocked)))
+            yield
+
+    def execute_attack(self, game_state, breach_left, breach_right):
+        # Determines whether or not we will be attacking, from what can_breach_enemy found for each side
+        attack, attack_left_side, number_of_troops = self.execute_attack_calculation(game_state, breach_left, breach_right)
         # Attacks if true
         if (attack):
             # Determines coords for attacking depending if we are attack L or R
@@ -434,62 +422,59 @@ class AlgoStrategy(gamelib.AlgoCore):
             # Spawns scouts
             game_state.attempt_spawn(SCOUT, [spawn_coords[0], spawn_coords[1]], number_of_troops)
 
-    def execute_attack_calculation(self, game_state):
+    @instrumentation.timer("strategy.attack_calculation")
+    def execute_attack_calculation(self, game_state, breach_left, breach_right):
         # Calculate attack related stuff here
 
         num_troops = game_state.number_affordable(SCOUT) # check how many troops are affordable
 
-        # Define the left and right start coordinates
-        attack_left_start_coordinates = [14,0]
-        attack_right_start_coordinates = [13,0]
-
         # See how many structure points the enemy has
         enemy_structure_points = game_state.get_resource(SP, 1)
 
         # If they have over a certain amount, overload by a certain number of scouts in case they place another turret
         overload = 5 if enemy_structure_points >= 8 else 3 if enemy_structure_points >= 3 else 0
 
-        # Get information about attacking each side
-        survivable_L, remaining_troops_L, structure_destruction_score_L = self.can_breach_enemy(attack_left_start_coordinates, game_state)
-        survivable_R, remaining_troops_R, structure_destruction_score_R = self.can_breach_enemy(attack_right_start_coordinates, game_state)
+        # Information about attacking each side
+        survivable_L, remaining_troops_L, structure_destruction_score_L = breach_left
+        survivable_R, remaining_troops_R, structure_destruction_score_R = breach_right
 
-        gamelib.debug_write(f"Number of troops: {num_troops}")
-        gamelib.debug_write(f"Left survivable? {survivable_L}  Remaining troops: {remaining_troops_L}  Destruction score: {structure_destruction_score_L}")
-        gamelib.debug_write(f"Right survivable? {survivable_R}  Remaining troops: {remaining_troops_R}  Destruction score: {structure_destruction_score_R}")
+        log.info("Number of troops: {}", num_troops)
+        log.info("Left survivable? {}  Remaining troops: {}  Destruction score: {}", survivable_L, remaining_troops_L, structure_destruction_score_L)
+        log.info("Right survivable? {}  Remaining troops: {}  Destruction score: {}", survivable_R, remaining_troops_R, structure_destruction_score_R)
 
         # Attack regardless if we can deploy more than 12 troops (at least one every three turns)
         if game_state.get_resource(MP, 0) >= 15.0:
-            gamelib.debug_write("Attacking left")
+            log.info("Attacking left")
             return True, structure_destruction_score_L > structure_destruction_score_R, int(game_state.get_resource(MP, 0))
         
         # Decision flow based in this order of priority: Can you survive, number of troops surviving, the number of structures destroyed
         if survivable_L:
             if survivable_R:
                 if remaining_troops_L > remaining_troops_R:
-                    gamelib.debug_write("Attacking left")
+                    log.info("Attacking left")
                     return (True, True, num_troops) if remaining_troops_L > overload else (False, False, 0)
                 elif remaining_troops_L < remaining_troops_R:
-                    gamelib.debug_write("Attacking right")
+                    log.info("Attacking right")
                     return (True, False, num_troops) if remaining_troops_R > overload else (False, False, 0)
                 else:
                     if structure_destruction_score_L > structure_destruction_score_R:
-                        gamelib.debug_write("Attacking left")
+                        log.info("Attacking left")
                         return (True, True, num_troops) if remaining_troops_L > overload else (False, False, 0)
                     elif structure_destruction_score_L < structure_destruction_score_R:
-                        gamelib.debug_write("Attacking right")
+                        log.info("Attacking right")
                         return (True, False, num_troops) if remaining_troops_R > overload else (False, False, 0)
                     else:
-                        gamelib.debug_write("Attacking left")
+                        log.info("Attacking left")
                         return (True, True, num_troops) if remaining_troops_L > overload else (False, False, 0) # If literally everything matches default to left
             else:
-                gamelib.debug_write("Attacking left")
+                log.info("Attacking left")
                 return (True, True, num_troops) if remaining_troops_L >= overload else (False, False, 0)
         else:
             if survivable_R:
-                gamelib.debug_write("Attacking right")
+                log.info("Attacking right")
                 return (True, False, num_troops) if remaining_troops_R >= overload else (False, False, 0) 
             else:
-                gamelib.debug_write("Not Attacking")
+                log.info("Not Attacking")
                 return False, False, 0
               
     
@@ -500,6 +485,7 @@ class AlgoStrategy(gamelib.AlgoCore):
             return True
         return False
     
+    @instrumentation.timer("strategy.can_breach_enemy")
     def can_breach_enemy(self, start_location, game_state: gamelib.GameState) -> "tuple[bool, int, int]":
         """
         Overview:
@@ -546,7 +532,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         # Create a mobile unit at the starting location
         unit = gamelib.GameUnit(unit_type, game_state.config, x=start_location[0], y=start_location[1], player_index=0)
         unit = add_support(unit)
-        gamelib.debug_write("About the unit:", unit)
+        log.debug("About the unit: {}", unit)
 
         # Chunks stores all the different types of chunks. Only chunks with targets/threats are stored, and are categorized as 1, 2, or 3
         chunks = []
@@ -580,20 +566,20 @@ class AlgoStrategy(gamelib.AlgoCore):
             for attacker in attackers:
                 total_damage_per_frame += attacker.damage_i
 
-            gamelib.debug_write(f"Case 1: We're taking {total_damage_per_frame} damage per frame")
+            log.debug("Case 1: We're taking {} damage per frame", total_damage_per_frame)
 
             lower_bound = math.ceil(num_mobile_units * mobile_unit.health / float(total_damage_per_frame))
-            gamelib.debug_write(f"Case 1: Number of mobile units: {num_mobile_units} Health per unit: {mobile_unit.health}")
-            gamelib.debug_write(f"Case 1: We're taking at least {lower_bound} frames to die")
+            log.debug("Case 1: Number of mobile units: {} Health per unit: {}", num_mobile_units, mobile_unit.health)
+            log.debug("Case 1: We're taking at least {} frames to die", lower_bound)
 
             # Can we survive with the number of mobile units we have?
             can_survive_onslaught = frames_in_range <= lower_bound
-            gamelib.debug_write(f"Case 1: Lower bound: {lower_bound} Frames in range: {frames_in_range}")
+            log.debug("Case 1: Lower bound: {} Frames in range: {}", lower_bound, frames_in_range)
 
             # How many units will survive the onslaught?
             # (Total health - total damage) / health_per_unit, ceilinged
             num_units_survived = math.ceil((num_mobile_units * mobile_unit.health - frames_in_range * total_damage_per_frame) / float(mobile_unit.health))
-            gamelib.debug_write(f"Case 1: Number survived: {num_units_survived}")
+            log.debug("Case 1: Number survived: {}", num_units_survived)
 
             return can_survive_onslaught, num_units_survived
         
@@ -605,7 +591,7 @@ class AlgoStrategy(gamelib.AlgoCore):
             damage_dealt = num_mobile_units * mobile_unit.damage_f * frames_in_range
             structure_destroyed = target.cost[game_state.SP] if target.health <= damage_dealt else 0
 
-            gamelib.debug_write(f"Case 2: Damage dealt: {damage_dealt}, Target halth: {target.health}")
+            log.debug("Case 2: Damage dealt: {}, Target halth: {}", damage_dealt, target.health)
             return structure_destroyed
 
         def case_3(num_mobile_units: int, mobile_unit: gamelib.GameUnit, attackers: "list[gamelib.GameUnit]", target: gamelib.GameUnit, path: "list[list[int]]", frames_in_range: int) -> "tuple[bool, int, int]":
@@ -617,22 +603,22 @@ class AlgoStrategy(gamelib.AlgoCore):
                 - A score pertaining to how many structures were destroyed
             """
 
-            gamelib.debug_write("Path:",path)
+            log.debug("Path: {}", path)
             # Begin by summing up the amount of damage dealt from all attackers in one frame
             attackers_damage = 0 
             for attacker in attackers:
                 attackers_damage += attacker.damage_i
 
-            gamelib.debug_write(f"Case 3: We're taking {attackers_damage} damage per frame")
+            log.debug("Case 3: We're taking {} damage per frame", attackers_damage)
 
             # How many mobile units are killed in one frame? This is a float for reasons we'll see below
             kills_per_frame = attackers_damage / float(mobile_unit.health)
-            gamelib.debug_write(f"Case 3: Kills per frame: {kills_per_frame}")
+            log.debug("Case 3: Kills per frame: {}", kills_per_frame)
 
             # damage_dealt is the amount of damage we'll do
             damage_dealt = 0
             for i, location in enumerate(path): # iterates from 0 to (frames_in_range - 1)
-                gamelib.debug_write("location type:", type(location))
+                log.debug("location type: {}", type(location))
                 mobile_unit.x = location[0]
                 mobile_unit.y = location[1]
                 # We floor the number of kills per frame. Because if a turret shot enough to kill 1.7 units, it still technically killed one
@@ -657,17 +643,17 @@ class AlgoStrategy(gamelib.AlgoCore):
 
             # Has the target been destroyed?
             target_destroyed = target.cost[game_state.SP] if damage_dealt >= target.health else 0
-            gamelib.debug_write(f"Case 3: Target health: {target.health}")
+            log.debug("Case 3: Target health: {}", target.health)
 
             # If we survived, how many remain?
             num_survived = num_mobile_units - math.floor(frames_in_range * kills_per_frame) if survived else 0
-            gamelib.debug_write("Number survived:", num_survived)
+            log.debug("Number survived: {}", num_survived)
 
             return survived, num_survived, target_destroyed
 
         total_structures_destroyed = 0
         for chunk in chunks:
-            gamelib.debug_write(chunk)
+            log.debug("Chunk: {}", chunk)
             if chunk["category"] == 1:
                 survived, num_units = case_1(num_units, unit, chunk["attackers"], chunk["numFrames"])
                 if not survived:
@@ -685,55 +671,10 @@ class AlgoStrategy(gamelib.AlgoCore):
 
         return True, num_units, total_structures_destroyed
 
+    @instrumentation.timer("strategy.which_side_weaker")
     def which_side_weaker(self, game_state):
-        # TODO: calibrate
-        TURRET_POINTS = 3
-        UPGRADED_TURRET_POINTS = 8
-        WALL_POINTS = 2
-
-        def is_within_trapezoid(location, trapezoid):
-            """ Checks if the given location is within the specified trapezoid. """
-            x, y = location
-            def is_point_in_trapezoid(x, y, trapezoid):
-                def sign(p1, p2, p3):
-                    return (p1[0] - p3[0]) * (p2[1] - p3[1]) - (p2[0] - p3[0]) * (p1[1] - p3[1])
-                
-                b1 = sign([x, y], trapezoid[0], trapezoid[1]) < 0.0
-                b2 = sign([x, y], trapezoid[1], trapezoid[2]) < 0.0
-                b3 = sign([x, y], trapezoid[2], trapezoid[3]) < 0.0
-                b4 = sign([x, y], trapezoid[3], trapezoid[0]) < 0.0
-                
-                return ((b1 == b2) and (b2 == b3) and (b3 == b4))
-            
-            return is_point_in_trapezoid(x, y, trapezoid)
-
-        def calculate_area_value(trapezoid, game_state):
-            score = 0
-            for x in range(game_state.ARENA_SIZE):
-                for y in range(game_state.ARENA_SIZE):
-                    location = [x, y]
-                    if is_within_trapezoid(location, trapezoid):
-                        units = game_state.game_map[x, y]
-                        for unit in units:
-                            score += (unit.cost[0] * unit.health + unit.damage_i)
-                            # if unit.unit_type == TURRET:
-                            #     score += (TURRET_POINTS*unit.health + unit.damage_i)
-                            # elif unit.unit_type == 'UPGRADED_TURRET':
-                            #     score += UPGRADED_TURRET_POINTS*unit.health
-                            # elif unit.unit_type == 'WALL':
-                            #     score += WALL_POINTS*unit.health                         
-            return score
-
-        # Define trapezoid vertices for left and right and center sides
-        left_trapezoid = [[0, 13], [8, 13], [8, 10], [3, 10]]
-        center_trapezoid = [[10, 7], [18, 7], [10, 13], [18, 13]]
-        right_trapezoid = [[27, 13], [24, 10], [19, 10], [19, 13]]
-
-        left_side_score = calculate_area_value(left_trapezoid, game_state)
-        center_side_score = calculate_area_value(center_trapezoid, game_state)
-        right_side_score = calculate_area_value(right_trapezoid, game_state)
-
-        scores = [("L", left_side_score), ("C", center_side_score), ("R", right_side_score)]
+        # Scores are kept by the game map and only updated for the locations where units changed
+        scores = [(region.name, game_state.get_region_score(region, defense_value)) for region in self.side_regions]
 
         sorted_scores = sorted(scores, key=lambda x: x[1])
 
@@ -805,7 +746,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         """
         This function builds reactive defenses based on where the enemy scored on us from.
         We can track where the opponent scored by looking at events in action frames 
-        as shown in the on_action_frame function
+        as shown in the on_breach function
         """
         for location in self.scored_on_locations:
             # Build turret one space above so that it doesn't block our own edge spawn locations
@@ -892,26 +833,20 @@ class AlgoStrategy(gamelib.AlgoCore):
                 filtered.append(location)
         return filtered
 
-    def on_action_frame(self, turn_string):
+    def on_breach(self, breach):
         """
-        This is the action frame of the game. This function could be called 
-        hundreds of times per turn and could slow the algo down so avoid putting slow code here.
-        Processing the action frames is complicated so we only suggest it if you have time and experience.
-        Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
+        This is called for every unit that scores during the action phase. 
+        Only the breach events of each frame are decoded, so it is cheap even though 
+        an action phase has hundreds of frames. See on_death, on_damage, on_spawn and 
+        on_round_end in AlgoCore for the other events, or on_action_frame for whole frames.
         """
         # Let's record at what position we get scored on
-        state = json.loads(turn_string)
-        events = state["events"]
-        breaches = events["breach"]
-        for breach in breaches:
-            location = breach[0]
-            unit_owner_self = True if breach[4] == 1 else False
-            # When parsing the frame data directly, 
-            # 1 is integer for yourself, 2 is opponent (StarterKit code uses 0, 1 as player_index instead)
-            if not unit_owner_self:
-                gamelib.debug_write("Got scored on at: {}".format(location))
-                self.scored_on_locations.append(location)
-                gamelib.debug_write("All locations: {}".format(self.scored_on_locations))
+        # player_index is 0 for yourself and 1 for the opponent, like elsewhere in the StarterKit
+        if breach.player_index == 1:
+            location = [breach.x, breach.y]
+            gamelib.debug_write("Got scored on at: {}".format(location))
+            self.scored_on_locations.append(location)
+            gamelib.debug_write("All locations: {}".format(self.scored_on_locations))
 
 if __name__ == "__main__":
     algo = AlgoStrategy()
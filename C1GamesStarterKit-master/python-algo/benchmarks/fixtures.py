@@ -0,0 +1,125 @@
+import os
+import json
+import random
+
+ARENA_SIZE = 28
+HALF_ARENA = ARENA_SIZE // 2
+
+WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE = range(8)
+
+EVENTS = {"selfDestruct": [], "breach": [], "damage": [], "shield": [], "move": [], "spawn": [], "death": [], "attack": [], "melee": []}
+
+
+def load_config():
+    """Loads game-configs.json from the root of the StarterKit
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "game-configs.json")
+    with open(path) as config_file:
+        return json.load(config_file)
+
+
+def in_arena(x, y):
+    row = y + 1 if y < HALF_ARENA else ARENA_SIZE - y
+    return HALF_ARENA - row <= x <= HALF_ARENA + row - 1
+
+
+def own_half(player_index):
+    """Every location of a player's half of the arena, player 0 at the bottom"""
+    rows = range(HALF_ARENA) if player_index == 0 else range(HALF_ARENA, ARENA_SIZE)
+    return [(x, y) for y in rows for x in range(ARENA_SIZE) if in_arena(x, y)]
+
+
+class Board:
+    """Collects the units of a fixture and serializes them like the game engine does"""
+    def __init__(self, config):
+        self.config = config
+        self.units = ([[] for _ in range(8)], [[] for _ in range(8)])
+        self.occupied = set()
+        self.next_id = 1
+
+    def add(self, player_index, unit_type, x, y, upgraded=False, health=None):
+        if unit_type <= TURRET:
+            if (x, y) in self.occupied:
+                return
+            self.occupied.add((x, y))
+        if health is None:
+            unit_config = self.config["unitInformation"][unit_type]
+            health = unit_config.get("upgrade", {}).get("startHealth", unit_config["startHealth"]) if upgraded else unit_config["startHealth"]
+        entry = [x, y, float(health), str(self.next_id)]
+        self.next_id += 1
+        self.units[player_index][unit_type].append(entry)
+        if upgraded:
+            self.units[player_index][UPGRADE].append(entry)
+
+    def serialize(self, turn_number, resources=((40.0, 10.0), (40.0, 10.0))):
+        return json.dumps({
+            "p2Units": self.units[1], "turnInfo": [0, turn_number, -1],
+            "p1Stats": [30.0, resources[0][0], resources[0][1], 0], "p1Units": self.units[0],
+            "p2Stats": [30.0, resources[1][0], resources[1][1], 0], "events": EVENTS})
+
+
+def mirror(x, y):
+    return ARENA_SIZE - 1 - x, ARENA_SIZE - 1 - y
+
+
+def empty(config):
+    """The first turn, with nothing on the board"""
+    return Board(config).serialize(0, ((40.0, 5.0), (40.0, 5.0)))
+
+
+def mid_game(config, seed=1):
+    """A wall line with gaps, turrets behind it and a few supports on each side"""
+    rng = random.Random(seed)
+    board = Board(config)
+    for player_index in (0, 1):
+        def place(unit_type, x, y, upgraded=False):
+            if player_index == 1:
+                x, y = mirror(x, y)
+            board.add(player_index, unit_type, x, y, upgraded)
+        for x in range(ARENA_SIZE):
+            if rng.random() < 0.7:
+                place(WALL, x, 13)
+        for x, y in rng.sample([location for location in own_half(0) if 8 <= location[1] <= 12], 16):
+            place(TURRET, x, y, rng.random() < 0.4)
+        for x, y in rng.sample([location for location in own_half(0) if 3 <= location[1] <= 7], 4):
+            place(SUPPORT, x, y, rng.random() < 0.5)
+    return board.serialize(12, ((18.0, 9.5), (22.0, 12.0)))
+
+
+def maze(config):
+    """Rows of walls with a single gap at alternating ends, so units snake across the whole board"""
+    board = Board(config)
+    for player_index in (0, 1):
+        for index, y in enumerate(range(2, HALF_ARENA, 2)):
+            row = [x for x in range(ARENA_SIZE) if in_arena(x, y)]
+            gap = row[-2] if index % 2 == 0 else row[1]
+            for x in row:
+                if x != gap:
+                    location = (x, y) if player_index == 0 else mirror(x, y)
+                    board.add(player_index, WALL, *location)
+    return board.serialize(20, ((6.0, 14.0), (6.0, 14.0)))
+
+
+def crowded(config, seed=2):
+    """Over 300 damaged structures, covering most of both halves"""
+    rng = random.Random(seed)
+    board = Board(config)
+    for player_index in (0, 1):
+        for x, y in own_half(player_index):
+            if rng.random() < 0.78:
+                unit_type = rng.choice([WALL, WALL, TURRET, TURRET, SUPPORT])
+                board.add(player_index, unit_type, x, y, rng.random() < 0.3, rng.uniform(5, 75))
+    return board.serialize(40, ((30.0, 20.0), (30.0, 20.0)))
+
+
+def all_fixtures(config):
+    """
+        Returns:
+            A dict mapping each fixture name to its serialized turn state
+    """
+    return {
+        "empty": empty(config),
+        "mid_game": mid_game(config),
+        "maze": maze(config),
+        "crowded": crowded(config),
+    }
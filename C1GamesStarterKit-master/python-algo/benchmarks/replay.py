@@ -0,0 +1,185 @@
+"""
+Plays the turns of .replay files through AlgoStrategy, without the game engine, and reports how long each turn took.
+
+    python benchmarks/replay.py my_game.replay                   # play player 1's turns
+    python benchmarks/replay.py replays/*.replay --player 2      # play player 2's turns of many games
+    python benchmarks/replay.py my_game.replay --commands        # also print the commands of each turn
+
+The messages of the replay are fed to AlgoStrategy.start as the engine would send them, so on_game_start, on_turn
+and the action frame handlers all run. The board follows the replay, not the commands the strategy sends,
+and the random module is seeded before every game so runs are reproducible.
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import contextlib
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import algo_strategy
+from gamelib.command_reader import classify, CONFIG, END
+
+ARENA_SIZE = 28
+
+# The index of the player in each kind of event, 1 or 2 in replays
+EVENT_PLAYER_INDEX = {"breach": 4, "damage": 4, "death": 3, "spawn": 3, "selfDestruct": 5, "move": 5, "attack": 6, "shield": 6, "melee": 6}
+
+
+def load_replay(path):
+    """Reads a replay file
+
+    Returns:
+        The config message and the list of game state messages, in the order the engine sent them
+    """
+    config = None
+    messages = []
+    with open(path) as replay:
+        for line in replay:
+            line = line.strip()
+            if not line:
+                continue
+            if config is None and classify(line) == CONFIG:
+                config = line
+            elif line.startswith("{"):
+                messages.append(line)
+    if config is None:
+        raise ValueError("{} does not start with a game config".format(path))
+    return config, messages
+
+
+def mirror(value):
+    """Mirrors every location found in a value, recursing through lists"""
+    if isinstance(value, list):
+        if len(value) == 2 and all(isinstance(coordinate, int) for coordinate in value):
+            return [ARENA_SIZE - 1 - value[0], ARENA_SIZE - 1 - value[1]]
+        return [mirror(item) for item in value]
+    return value
+
+
+def flip(message):
+    """Turns a game state seen by player 1 into the same game state as the engine sends it to player 2,
+    which has the players swapped and the board rotated so player 2 is at the bottom.
+    """
+    state = json.loads(message)
+    state["p1Stats"], state["p2Stats"] = state.get("p2Stats"), state.get("p1Stats")
+    p1_units, p2_units = state.get("p1Units", []), state.get("p2Units", [])
+    state["p1Units"], state["p2Units"] = [[mirror(unit[:2]) + unit[2:] for unit in units] for units in p2_units], \
+        [[mirror(unit[:2]) + unit[2:] for unit in units] for units in p1_units]
+    events = state.get("events", {})
+    for name, entries in events.items():
+        player_index = EVENT_PLAYER_INDEX.get(name)
+        flipped = []
+        for entry in entries:
+            entry = mirror(entry)
+            if player_index is not None and len(entry) > player_index and entry[player_index] in (1, 2):
+                entry[player_index] = 3 - entry[player_index]
+            flipped.append(entry)
+        events[name] = flipped
+    return json.dumps(state)
+
+
+def percentile(values, fraction):
+    """The nearest-rank percentile of a list of values"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def summarize(times):
+    """
+        Returns:
+            The number of turns and the mean, median, 90th, 99th percentile and slowest turn time in milliseconds
+    """
+    milliseconds = [1000 * seconds for seconds in times]
+    return {
+        "turns": len(milliseconds),
+        "mean_ms": round(sum(milliseconds) / len(milliseconds), 3) if milliseconds else 0,
+        "p50_ms": round(percentile(milliseconds, 0.5), 3),
+        "p90_ms": round(percentile(milliseconds, 0.9), 3),
+        "p99_ms": round(percentile(milliseconds, 0.99), 3),
+        "max_ms": round(max(milliseconds), 3) if milliseconds else 0,
+    }
+
+
+def play(path, player=1, seed=0, debug=None):
+    """Plays the turns of a replay through a new AlgoStrategy
+
+    Args:
+        path: The replay file
+        player: The player whose turns are played, 1 or 2
+        seed: The seed of the random module
+        debug: A file to write the debug output of the strategy to, or None to discard it
+
+    Returns:
+        A list of {"turn", "ms", "commands"} records, one per turn, commands holding the build and deploy lines sent
+    """
+    config, messages = load_replay(path)
+    if player == 2:
+        messages = [flip(message) for message in messages]
+    if not messages or classify(messages[-1]) != END:
+        messages.append('{"turnInfo": [2, -1, -1]}')
+
+    strategy = algo_strategy.AlgoStrategy()
+    turns = []
+    on_turn = strategy.on_turn
+
+    def timed_turn(turn_state):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            start = time.perf_counter()
+            game_state = on_turn(turn_state)
+            elapsed = time.perf_counter() - start
+        turns.append({"turn": turn_state["turnInfo"][1], "ms": round(1000 * elapsed, 3),
+                      "commands": output.getvalue().splitlines()})
+        return game_state
+    strategy.on_turn = timed_turn
+
+    random.seed(seed)
+    stdin, sys.stdin = sys.stdin, io.StringIO("\n".join([config] + messages) + "\n")
+    try:
+        with contextlib.redirect_stderr(debug if debug is not None else io.StringIO()):
+            strategy.start()
+    finally:
+        sys.stdin = stdin
+    return turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays the turns of replays through AlgoStrategy and times them")
+    parser.add_argument("replays", nargs="+", help="The .replay files to play")
+    parser.add_argument("--player", type=int, choices=(1, 2), default=1, help="The player whose turns are played")
+    parser.add_argument("--seed", type=int, default=0, help="The seed of the random module, set before each game")
+    parser.add_argument("--commands", action="store_true", help="Print the commands sent each turn")
+    parser.add_argument("--debug", action="store_true", help="Show the debug output of the strategy")
+    parser.add_argument("--output", help="Save the turn records and the summary as JSON to this file")
+    args = parser.parse_args()
+
+    games = {}
+    times = []
+    for path in args.replays:
+        turns = play(path, args.player, args.seed, sys.stderr if args.debug else None)
+        games[path] = {"summary": summarize([turn["ms"] / 1000 for turn in turns]), "turns": turns}
+        times += [turn["ms"] / 1000 for turn in turns]
+        summary = games[path]["summary"]
+        print("{}: {turns} turns, mean {mean_ms:.1f} ms, p50 {p50_ms:.1f} ms, p90 {p90_ms:.1f} ms, p99 {p99_ms:.1f} ms, max {max_ms:.1f} ms".format(
+            path, **summary))
+        if args.commands:
+            for turn in turns:
+                print("    turn {:>3} {:>8.1f} ms  {}".format(turn["turn"], turn["ms"], "  ".join(turn["commands"])))
+
+    total = summarize(times)
+    if len(args.replays) > 1:
+        print("all: {turns} turns, mean {mean_ms:.1f} ms, p50 {p50_ms:.1f} ms, p90 {p90_ms:.1f} ms, p99 {p99_ms:.1f} ms, max {max_ms:.1f} ms".format(**total))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"player": args.player, "seed": args.seed, "summary": total, "games": games}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Times gamelib and the strategy on generated boards, without the game engine.
+
+    python benchmarks/run.py                     # run, save benchmarks/results.json and compare to the baseline
+    python benchmarks/run.py --save-baseline     # run and store the results as the new baseline
+    python benchmarks/run.py --filter maze       # only run the benchmarks whose name contains "maze"
+    python -m benchmarks.run                     # the same, run as a module from the python-algo folder
+
+The baseline committed in benchmarks/baseline.json was measured on one development machine. It is machine
+specific, so save a new one on the machine you compare on before relying on the comparison.
+The run fails if a benchmark got slower than the baseline by more than the threshold.
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import contextlib
+import statistics
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import gamelib
+import algo_strategy
+from gamelib.navigation import _FIELD_CACHE
+try:
+    from .fixtures import load_config, all_fixtures
+except ImportError:
+    # Run as a script, benchmarks/ is on the path instead
+    from fixtures import load_config, all_fixtures
+
+
+def measure(function, setup=None, min_time=0.2, min_runs=5, max_runs=2000):
+    """Calls function until min_time seconds were spent in it, calling setup before each call untimed
+
+    Returns:
+        The median and minimum time of a call in microseconds, and the number of calls
+    """
+    times = []
+    total = 0
+    while len(times) < max_runs and (total < min_time or len(times) < min_runs):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        total += elapsed
+    return {"median_us": round(1e6 * statistics.median(times), 2), "min_us": round(1e6 * min(times), 2), "runs": len(times)}
+
+
+def forget_caches():
+    # Each turn the engine sends a new board, so searches start from nothing
+    _FIELD_CACHE.clear()
+
+
+def make_strategy(config):
+    strategy = algo_strategy.AlgoStrategy()
+    strategy.on_game_start(config)
+    return strategy
+
+
+def benchmarks(config, fixtures):
+    """
+        Returns:
+            A list of (name, function, setup) for every benchmark
+    """
+    found = []
+    for fixture, serialized in fixtures.items():
+        game_state = gamelib.GameState(config, serialized)
+        game_state.suppress_warnings(True)
+        game_map = game_state.game_map
+        locations = [location for location in game_map]
+        rng = random.Random(3)
+        samples = rng.sample(locations, 50)
+        scout = gamelib.GameUnit("PI", config, 0, None, 13, 0)
+        structures = [unit for unit in game_map.get_all_units() if unit.stationary and unit.damage_i > 0][:20]
+        finder = gamelib.navigation.ShortestPathFinder()
+        end_points = game_map.get_edge_locations(game_map.TOP_RIGHT)
+        edges = game_map.get_edge_locations(game_map.BOTTOM_LEFT) + game_map.get_edge_locations(game_map.BOTTOM_RIGHT)
+        start = next((location for location in edges if not game_state.contains_stationary_unit(location)), [13, 0])
+        strategy = make_strategy(config)
+
+        def parse(serialized=serialized):
+            gamelib.GameState(config, serialized)
+
+        def navigate(game_state=game_state):
+            finder.navigate_multiple_endpoints(start, end_points, game_state)
+
+        def locations_in_range(game_map=game_map, samples=samples):
+            for location in samples:
+                game_map.get_locations_in_range(location, 4.5)
+
+        def get_target(game_state=game_state, samples=samples):
+            for location in samples:
+                scout.x, scout.y = location
+                game_state.get_target(scout)
+            for structure in structures:
+                game_state.get_target(structure)
+
+        def forget_targets(game_map=game_map):
+            # Choices are remembered until the board changes, so without this every call after the first is a lookup
+            game_map.get_targeting().clear()
+
+        def get_attackers(game_state=game_state, samples=samples):
+            for location in samples:
+                game_state.get_attackers(location, 0)
+
+        def which_side_weaker(game_state=game_state, strategy=strategy):
+            strategy.which_side_weaker(game_state)
+
+        def can_breach_enemy(game_state=game_state, strategy=strategy):
+            strategy.can_breach_enemy(start, game_state)
+
+        def on_turn(serialized=serialized):
+            random.seed(0)
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                make_strategy(config).on_turn(serialized)
+
+        found += [
+            (fixture + "/GameState", parse, forget_caches),
+            (fixture + "/navigate_multiple_endpoints", navigate, forget_caches),
+            (fixture + "/get_locations_in_range x50", locations_in_range, None),
+            (fixture + "/get_target x{}".format(len(samples) + len(structures)), get_target, forget_targets),
+            (fixture + "/get_target remembered x{}".format(len(samples) + len(structures)), get_target, None),
+            (fixture + "/get_attackers x50", get_attackers, None),
+            (fixture + "/which_side_weaker", which_side_weaker, None),
+            (fixture + "/can_breach_enemy", can_breach_enemy, forget_caches),
+            (fixture + "/on_turn", on_turn, forget_caches),
+        ]
+    return found
+
+
+def compare(results, baseline, threshold):
+    """Prints each result next to its baseline
+
+    Returns:
+        The names of the benchmarks that got slower than the baseline by more than the threshold
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None or not base["median_us"]:
+            print("{:55} {:>12.1f} us".format(name, result["median_us"]))
+            continue
+        ratio = result["median_us"] / base["median_us"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print("{:55} {:>12.1f} us {:>7.2f}x{}".format(name, result["median_us"], ratio, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for gamelib and the strategy")
+    parser.add_argument("--output", default=os.path.join(BENCHMARK_DIR, "results.json"), help="Where to save the results")
+    parser.add_argument("--baseline", default=os.path.join(BENCHMARK_DIR, "baseline.json"), help="The results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Save the results as the baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=0.2, help="The slowdown over the baseline that counts as a regression, 0.2 is 20%%")
+    parser.add_argument("--min-time", type=float, default=0.2, help="The least seconds spent timing each benchmark")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this")
+    args = parser.parse_args()
+
+    config = load_config()
+    results = {}
+    # The strategy's debug output would otherwise pile up between turns
+    gamelib.set_level(gamelib.log.OFF)
+    for name, function, setup in benchmarks(config, all_fixtures(config)):
+        if args.filter in name:
+            results[name] = measure(function, setup, args.min_time)
+            with contextlib.redirect_stderr(io.StringIO()):
+                gamelib.log.flush()
+
+    record = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": gamelib.board_arrays.numpy_available(),
+        "results": results,
+    }
+    path = args.baseline if args.save_baseline else args.output
+    with open(path, "w") as output:
+        json.dump(record, output, indent=2, sort_keys=True)
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    print("Saved {}".format(path))
+    if regressions:
+        print("{} benchmarks slower than the baseline by more than {:.0%}".format(len(regressions), args.threshold))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
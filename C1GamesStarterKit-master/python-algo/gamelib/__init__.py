@@ -13,17 +13,65 @@ Investigating it is useful for any player that wants to access information about
 The AlgoCore class in algocore.py handles communication with the game engine, and forms the bones of an algo. AlgoStrategy inherits from it. 
 Investigating it is useful for advanced players interested in getting data from the action phase or communicating directly with the game engine. \n
 
+The CommandReader class in command_reader.py reads the messages of the game engine on a background thread for AlgoCore, 
+and can skip action frames that are already outdated when the algo falls behind. \n
+
+events.py defines the events passed to AlgoCore functions such as on_breach and on_death, 
+which only decode the parts of each action frame they need. \n
+
 The Navigation class in navigation.py contains functions related to path-finding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
+The ThreatMap class in threat_map.py indexes the units that can attack each location. GameMap keeps one up to date, 
+and GameState uses it to answer get_attackers quickly. \n
+
+The Targeting class in targeting.py chooses the targets of attacking units from precomputed candidates, 
+remembering each choice until the map changes. GameMap keeps one for GameState.get_target. \n
+
+The BuildPlan class in build_plan.py holds the structures to build over the turns as stages in priority order, 
+and builds the pending ones as far as resources allow in a single pass each turn, or in a cycle that resumes from the first unfinished stage. \n
+
+The StructureRegistry class in structure_registry.py records the structures you intend to keep standing, 
+and finds the ones destroyed or downgraded on the board of each turn, checking only the tiles that changed, so only those are rebuilt. \n
+
+The Region class in regions.py describes a fixed area of the board by the locations it covers, and RegionScores 
+keeps the score of regions summed over their units as the map changes. GameState.get_region_score uses them. \n
+
+The Simulator class in simulator.py simulates the action phase of a turn frame by frame on a fork of a GameState. 
+It is useful for comparing candidate attacks before deploying them. \n
+
+The TurnScheduler class in scheduler.py runs the analysis of a turn by priority within a time budget, 
+keeping the best plan found so far and submitting it when time runs out. \n
+
+The Speculation class in speculation.py prepares the next turn on a background thread while the engine plays out the action phase, 
+and is used by AlgoCore when its speculate attribute is set. \n
+
+The EvaluationPool class in evaluation_pool.py evaluates candidate moves in parallel on worker processes, 
+sharing the board of each turn with them through shared memory. \n
+
+The BoardArrays class in board_arrays.py describes the board with NumPy arrays for vectorized analysis such as region sums and damage heatmaps. 
+It is optional and only available when NumPy is installed. \n
+
+instrumentation.py provides timers and counters that write a JSON record of where the time of each turn went. 
+Once enabled, it also times the main GameState functions. \n
+
+log.py buffers the debug output of a turn and writes it once the turn is submitted. Its get_logger function gives each module 
+a Logger with levels, whose messages are only formatted when their level is enabled. \n
+
 util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write().
 """
 
 from .algocore import AlgoCore
-from .util import debug_write
+from .util import debug_write, decode_json
+from .log import get_logger, set_level
 from .game_state import GameState
 from .unit import GameUnit
 from .game_map import GameMap
+from .regions import Region
+from .build_plan import BuildPlan
+from .structure_registry import StructureRegistry
+from .simulator import Simulator
+from .scheduler import TurnScheduler
 
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["algocore", "board_arrays", "build_plan", "command_reader", "evaluation_pool", "events", "game_state", "game_map", "instrumentation", "log", "navigation", "regions", "scheduler", "simulator", "speculation", "structure_registry", "targeting", "threat_map", "unit", "util"]
  
\ No newline at end of file
@@ -1,7 +1,12 @@
-import json
+import time
 
 from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .unit import get_unit_stats
+from .speculation import Speculation, is_final_frame
+from .command_reader import CommandReader, CONFIG, TURN, ACTION_FRAME, END
+from .events import FrameEvents
+from . import log
+from .util import debug_write, decode_json, BANNER_TEXT, send_command
 
 class AlgoCore(object):
     """
@@ -10,10 +15,26 @@ class AlgoCore(object):
 
     Attributes :
         * config (JSON): json object containing information about the game
+        * report_turn_time (bool): If true, the time taken by each turn, by decoding its message and by building the GameState
+          on_turn returns is printed out
+        * last_turn_time (float): The time in seconds from receiving the most recent turn message to submitting the turn
+        * turn_start_time (float): The time.perf_counter() time the most recent turn message was received at, None before the first turn
+        * speculate (bool): If true, the next turn is prepared on a background thread once the final action frame arrives, see precompute
+        * speculation (:obj: Speculation): The speculation of the next turn, created once speculate is set and the first action phase ends
+        * coalesce_frames (bool): If true, action frames that a newer frame has already replaced are skipped, unless they hold breach, death, self destruct or spawn events
+        * command_reader (:obj: CommandReader): Reads the messages of the game engine on a background thread, created by start
 
     """
     def __init__(self):
         self.config = None
+        self.report_turn_time = False
+        self.last_turn_time = 0
+        self.turn_start_time = None
+        self.speculate = False
+        self.speculation = None
+        self.coalesce_frames = False
+        self.command_reader = None
+        self.__frame_events = None
 
     def on_game_start(self, config):
         """
@@ -26,10 +47,11 @@ class AlgoCore(object):
     def on_turn(self, game_state):
         """
         This step function is called at the start of each turn.
-        It is passed the current game state, which can be used to initiate a new GameState object. 
+        It is passed the current game state, already decoded, which can be used to initiate a new GameState object. 
         By default, it sends empty commands to the game engine. \n
         algo_strategy.py inherits from AlgoCore and overrides this on turn function. 
         Adjusting the on_turn function in algo_strategy is the main way to adjust your algo's logic. 
+        It may return the GameState it submitted, so report_turn_time can report how long building it took.
         """
         send_command("[]")
         send_command("[]")
@@ -43,6 +65,69 @@ class AlgoCore(object):
         """
         pass
 
+    def on_breach(self, breach):
+        """
+        Override this function to be called with a BreachEvent whenever a unit scores during the action phase. 
+        Only overridden event functions are called, and the frames are only decoded as far as they need, 
+        so they are much cheaper than reading every frame in on_action_frame.
+        """
+        pass
+
+    def on_death(self, death):
+        """
+        Override this function to be called with a DeathEvent whenever a unit is destroyed, scores or is removed.
+        """
+        pass
+
+    def on_damage(self, damage):
+        """
+        Override this function to be called with a DamageEvent whenever a unit takes damage.
+        """
+        pass
+
+    def on_spawn(self, spawn):
+        """
+        Override this function to be called with a SpawnEvent whenever a unit is added to the board.
+        """
+        pass
+
+    def on_round_end(self, round_end):
+        """
+        Override this function to be called with a RoundEndEvent on the last frame of each action phase.
+        """
+        pass
+
+    def precompute(self, game_state):
+        """
+        When speculate is true, this function is called on a background thread with a GameState built from
+        the final action frame of each round, while the engine prepares the next turn. 
+        Its return value is given back by reconcile_speculation if the board has not changed by the next turn. \n
+        It must not print to stdout, and should only rely on the units of the board.
+        """
+        return None
+
+    def reconcile_speculation(self, game_state, timeout=None):
+        """
+        Call this from on_turn with the turn's GameState to reuse the work done by precompute. 
+        Waits at most timeout seconds for precompute to finish, or until it does if timeout is None. \n
+        Returns the value precompute returned, or None if speculation is off, unfinished or the board changed.
+        """
+        if self.speculation is None:
+            return None
+        return self.speculation.reconcile(game_state, timeout)
+
+
+    def __subscribe_events(self, config):
+        handlers = {}
+        for name in FrameEvents.EVENT_TYPES + ("round_end",):
+            function_name = "on_" + name
+            if getattr(type(self), function_name) is not getattr(AlgoCore, function_name):
+                handlers[name] = getattr(self, function_name)
+        self.__frame_events = FrameEvents(config, handlers) if handlers else None
+        # Frames holding subscribed events are never skipped, and last frames never are either
+        subscribed = tuple(name for name in handlers if name in FrameEvents.EVENT_TYPES)
+        if self.command_reader is not None:
+            self.command_reader.keep_events = tuple(dict.fromkeys(self.command_reader.keep_events + subscribed))
 
     def start(self):
         """ 
@@ -52,44 +137,75 @@ class AlgoCore(object):
         The algo continues this loop until it receives the "End" turn message from the game.
         """
         debug_write(BANNER_TEXT)
+        self.command_reader = CommandReader()
+        self.command_reader.start()
 
         while True:
-            # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
-            # manually kill this Python program.
-            game_state_string = get_command()
-            if "replaySave" in game_state_string:
-                """
-                This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
-                """
-                parsed_config = json.loads(game_state_string)
-                self.on_game_start(parsed_config)
-            elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
-                if stateType == 0:
-                    """
-                    This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
-                    deploy phase. Printing is handled by the provided functions.
-                    """
-                    self.on_turn(game_state_string)
-                elif stateType == 1:
-                    """
-                    If stateType == 1, this game_state_string string represents a single frame of an action phase
-                    """
-                    self.on_action_frame(game_state_string)
-                elif stateType == 2:
-                    """
-                    This is the end game message. This means the game is over so break and finish the program.
-                    """
-                    debug_write("Got end state, game over. Stopping algo.")
-                    break
-                else:
-                    """
-                    Something is wrong? Received an incorrect or improperly formatted string.
-                    """
-                    debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
-            else:
-                """
-                Something is wrong? Received an incorrect or improperly formatted string.
-                """
-                debug_write("Got unexpected string : {}".format(game_state_string))
+            # Messages are read on a background thread and classified without decoding them
+            kind, game_state_string, received_time = self.command_reader.get(self.coalesce_frames)
+            if not self.handle_message(kind, game_state_string, received_time):
+                break
+
+    def handle_message(self, kind, game_state_string, received_time=None):
+        """
+        Handles a single message from the game engine. start calls it for every message it reads, 
+        and it can be called directly to drive the algo without stdin, such as from a local engine. \n
+        kind is the classification of the message by command_reader.classify, and received_time the 
+        time.perf_counter() time it arrived at, or None for now. \n
+        Returns False once the game is over.
+        """
+        if kind == CONFIG:
+            """
+            This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
+            """
+            parsed_config = decode_json(game_state_string)
+            # Computes the shared unit stats once, before any unit is created
+            get_unit_stats(parsed_config)
+            self.on_game_start(parsed_config)
+            self.__subscribe_events(parsed_config)
+        elif kind == TURN:
+            """
+            This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
+            deploy phase. Printing is handled by the provided functions.
+            """
+            self.turn_start_time = received_time if received_time is not None else time.perf_counter()
+            # The turn is decoded once here, and GameState is built from the decoded state
+            decode_start = time.perf_counter()
+            state = decode_json(game_state_string)
+            decode_time = time.perf_counter() - decode_start
+            game_state = self.on_turn(state)
+            self.last_turn_time = time.perf_counter() - self.turn_start_time
+            if self.report_turn_time:
+                parse_time = game_state.parse_time if isinstance(game_state, GameState) else 0
+                debug_write("Turn {} took {:.1f} ms, {:.1f} ms of it decoding the message and {:.1f} ms building the game state".format(
+                    state["turnInfo"][1], 1000 * self.last_turn_time, 1000 * decode_time, 1000 * parse_time))
+        elif kind == ACTION_FRAME:
+            """
+            This game_state_string string represents a single frame of an action phase
+            """
+            self.on_action_frame(game_state_string)
+            if self.__frame_events is not None:
+                self.__frame_events.dispatch(game_state_string)
+            # Only the unit lists are decoded to find the final frame, and only the final frame is decoded in full
+            if self.speculate and is_final_frame(game_state_string, self.config):
+                if self.speculation is None:
+                    self.speculation = Speculation(self.config, self.precompute)
+                self.speculation.start(decode_json(game_state_string))
+        elif kind == END:
+            """
+            This is the end game message. This means the game is over so break and finish the program.
+            """
+            debug_write("Got end state, game over. Stopping algo.")
+            log.flush()
+            return False
+        elif kind is not None:
+            """
+            Something is wrong? Received an incorrect or improperly formatted string.
+            """
+            debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
+        else:
+            """
+            Something is wrong? Received an incorrect or improperly formatted string.
+            """
+            debug_write("Got unexpected string : {}".format(game_state_string))
+        return True
@@ -0,0 +1,203 @@
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def numpy_available():
+    """
+        Returns:
+            Boolean, True if NumPy is installed and BoardArrays can be used, False otherwise.
+    """
+    return np is not None
+
+
+class BoardArrays:
+    """Dense NumPy arrays describing every location of a GameMap, for vectorized board analytics.
+
+    A BoardArrays is built once from a GameMap and then kept up to date by it as units are added,
+    removed or upgraded through GameMap functions. Use GameMap.get_board_arrays to get the one
+    belonging to a map. Every array is indexed [x, y] and is zero (or -1) at empty locations.
+    A location holding several units reports the type and owner of the first one, the sum of
+    their health, damage and costs and the largest attackRange.
+
+    Attributes :
+        * game_map (:obj: GameMap): The map being described
+        * max_range (float): The longest attackRange of any unit type
+        * in_bounds (bool array): True for every location on the board
+        * unit_type (int8 array): The index of the unit type in the config's unitInformation, -1 if empty
+        * owner (int8 array): The player index of the units, -1 if empty
+        * count (int16 array): The number of units
+        * stationary (bool array): True if the location holds a structure
+        * upgraded (bool array): True if any unit is upgraded
+        * health (float array): The total health of the units
+        * damage_f (float array): The total damage dealt to structures
+        * damage_i (float array): The total damage dealt to mobile units
+        * attack_range (float array): The longest attackRange of the units
+        * cost (float array): The total costs of the units, indexed [resource, x, y] with 0 for SP and 1 for MP
+
+    """
+    def __init__(self, game_map):
+        """Builds the arrays from the units currently on the map
+
+        Args:
+            game_map: The GameMap to describe
+
+        """
+        if np is None:
+            raise ImportError("BoardArrays requires NumPy")
+        self.game_map = game_map
+        self.__type_index = {unit["shorthand"]: index for index, unit in enumerate(game_map.config["unitInformation"])}
+        self.max_range = 0
+        for unit in game_map.config["unitInformation"]:
+            if unit.get('attackRange', 0) >= self.max_range:
+                self.max_range = unit.get('attackRange', 0)
+
+        geometry = game_map.geometry
+        size = geometry.size
+        self.__size = size
+        self.__offsets = tuple((dx, dy, math.sqrt(dx**2 + dy**2)) for dx, dy in geometry.stencil(self.max_range))
+        self.in_bounds = np.array(geometry.bounds, dtype=bool).reshape(size, size)
+        xs, ys = np.meshgrid(np.arange(size), np.arange(size), indexing='ij')
+        self.__xs = xs
+        self.__ys = ys
+
+        shape = (size, size)
+        self.unit_type = np.full(shape, -1, dtype=np.int8)
+        self.owner = np.full(shape, -1, dtype=np.int8)
+        self.count = np.zeros(shape, dtype=np.int16)
+        self.stationary = np.zeros(shape, dtype=bool)
+        self.upgraded = np.zeros(shape, dtype=bool)
+        self.health = np.zeros(shape)
+        self.damage_f = np.zeros(shape)
+        self.damage_i = np.zeros(shape)
+        self.attack_range = np.zeros(shape)
+        self.cost = np.zeros((2, size, size))
+
+        for x, y in zip(*np.nonzero(self.in_bounds)):
+            self.update_location(int(x), int(y))
+
+    def copy(self, game_map):
+        """Copies these arrays for a copy of their map
+
+        Args:
+            game_map: The copy of the described map, holding the same units
+
+        Returns:
+            A new BoardArrays describing game_map
+        """
+        board_arrays = BoardArrays.__new__(BoardArrays)
+        board_arrays.__dict__.update(self.__dict__)
+        board_arrays.game_map = game_map
+        for name in ("unit_type", "owner", "count", "stationary", "upgraded", "health", "damage_f", "damage_i", "attack_range", "cost"):
+            setattr(board_arrays, name, getattr(self, name).copy())
+        return board_arrays
+
+    def update_location(self, x, y):
+        """Re-reads the units at a location. Called by GameMap whenever they change.
+
+        Args:
+            x: The x coordinate of the changed location
+            y: The y coordinate of the changed location
+
+        """
+        units = self.game_map[x, y]
+        if not units:
+            self.unit_type[x, y] = -1
+            self.owner[x, y] = -1
+            self.count[x, y] = 0
+            self.stationary[x, y] = False
+            self.upgraded[x, y] = False
+            self.health[x, y] = 0
+            self.damage_f[x, y] = 0
+            self.damage_i[x, y] = 0
+            self.attack_range[x, y] = 0
+            self.cost[:, x, y] = 0
+            return
+
+        first = units[0]
+        self.unit_type[x, y] = self.__type_index[first.unit_type]
+        self.owner[x, y] = first.player_index
+        self.count[x, y] = len(units)
+        self.stationary[x, y] = any(unit.stationary for unit in units)
+        self.upgraded[x, y] = any(unit.upgraded for unit in units)
+        self.health[x, y] = sum(unit.health for unit in units)
+        self.damage_f[x, y] = sum(unit.damage_f for unit in units)
+        self.damage_i[x, y] = sum(unit.damage_i for unit in units)
+        self.attack_range[x, y] = max(unit.attackRange for unit in units)
+        self.cost[0, x, y] = sum(unit.cost[0] for unit in units)
+        self.cost[1, x, y] = sum(unit.cost[1] for unit in units)
+
+    def polygon_mask(self, vertices):
+        """Gets the locations inside a polygon
+
+        Args:
+            vertices: The [x, y] corners of the polygon, in order around it
+
+        Returns:
+            A bool array that is True for every location on the board lying on the same side of every edge
+        """
+        sides = []
+        for i in range(len(vertices)):
+            (x1, y1), (x2, y2) = vertices[i], vertices[(i + 1) % len(vertices)]
+            sides.append((self.__xs - x2) * (y1 - y2) - (x1 - x2) * (self.__ys - y2) < 0.0)
+        mask = np.ones_like(self.in_bounds)
+        for side in sides[1:]:
+            mask &= side == sides[0]
+        return mask & self.in_bounds
+
+    def region_sum(self, mask, values):
+        """Sums values over a region of the board
+
+        Args:
+            mask: A bool array selecting the region, such as one returned by polygon_mask
+            values: An array of values indexed [x, y], such as health or an expression of these arrays
+
+        Returns:
+            The sum of values inside the region
+        """
+        return values[mask].sum().item()
+
+    def __spread(self, values, ranges):
+        size = self.__size
+        spread = np.zeros((size, size))
+        for dx, dy, distance in self.__offsets:
+            reaching = np.where(ranges >= distance, values, 0)
+            if dx >= 0:
+                src_x, dst_x = slice(0, size - dx), slice(dx, size)
+            else:
+                src_x, dst_x = slice(-dx, size), slice(0, size + dx)
+            if dy >= 0:
+                src_y, dst_y = slice(0, size - dy), slice(dy, size)
+            else:
+                src_y, dst_y = slice(-dy, size), slice(0, size + dy)
+            spread[dst_x, dst_y] += reaching[src_x, src_y]
+        spread[~self.in_bounds] = 0
+        return spread
+
+    def coverage(self, player_index):
+        """Counts the units of a player able to attack each location
+
+        Args:
+            player_index: The index corresponding to the attacking player, 0 for you 1 for the enemy
+
+        Returns:
+            An array with, for every location, the number of that player's damaging units in range of it
+        """
+        attackers = (self.owner == player_index) & (self.damage_f + self.damage_i > 0)
+        return self.__spread(np.where(attackers, self.count, 0), self.attack_range)
+
+    def damage_heatmap(self, player_index):
+        """Gets the damage dealt each frame to a mobile unit at every location
+
+        Args:
+            player_index: The index corresponding to the defending player, 0 for you 1 for the enemy
+
+        Returns:
+            An array with, for every location, the total damage to mobile units dealt by the
+            other player's units in range. This matches ThreatMap.get_damage_per_frame.
+        """
+        attackers = (self.owner >= 0) & (self.owner != player_index)
+        return self.__spread(np.where(attackers, self.damage_i, 0), self.attack_range)
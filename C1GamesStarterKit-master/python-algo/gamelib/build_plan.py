@@ -0,0 +1,194 @@
+from collections import namedtuple
+
+# A structure to build. upgrade is 1 (or True) if the structure should also be upgraded
+PlanItem = namedtuple("PlanItem", ["x", "y", "unit_type", "upgrade", "stage", "group"])
+
+
+class BuildResult:
+    """The outcome of a call to BuildPlan.build, BuildPlan.build_cycle or BuildPlan.iter_cycle. Items are listed in the order they were considered.
+
+    Attributes :
+        * built (list): The PlanItems completed by spawning or upgrading their structure
+        * deferred (list): The PlanItems that could not be afforded, including stages skipped for lack of resources.
+          Their structure may already be spawned, waiting for the upgrade.
+        * blocked (list): The PlanItems whose location holds a unit that cannot be upgraded for them, or is outside your half of the arena
+        * stages (list): The names of the stages that were tried
+
+    """
+    def __init__(self):
+        self.built = []
+        self.deferred = []
+        self.blocked = []
+        self.stages = []
+
+
+class BuildPlan:
+    """Structures to build over the turns, declared once as stages in priority order.
+
+    Each stage holds groups of items, such as the sides of the board, whose order can be chosen again
+    every time the stage is built. An item is done, and dropped from the plan, once its spawn command is
+    accepted, or its upgrade command for items asking for an upgrade, so each call only goes over the items
+    still pending. A location already holding a unit blocks an item that only spawns, even if it is the same
+    structure, and an item asking for an upgrade is only done by upgrading the structure at its location.
+
+    build_cycle goes through the stages in order from a cursor, which only moves past a stage once every
+    item of the stages before it is done, so stages that could not be completed are tried again first next time.
+
+    Attributes :
+        * names (list): The names of the stages, in priority order
+        * cursor (int): The position of the stage build_cycle starts from, among the stages of names it cycles through
+
+    """
+    def __init__(self):
+        self.names = []
+        self.cursor = 0
+        self.__stages = {}
+
+    def add_stage(self, name, groups):
+        """Adds a stage after the ones already planned
+
+        Args:
+            name: A name for the stage, unique within the plan
+            groups: A dict from a group name to a list of [x, y, unit_type, upgrade] items, or a single list of items.
+                Items are built in the order given.
+
+        """
+        if name in self.__stages:
+            raise ValueError("The plan already has a stage named {}".format(name))
+        if not isinstance(groups, dict):
+            groups = {None: groups}
+        self.names.append(name)
+        self.__stages[name] = {group: [PlanItem(x, y, unit_type, upgrade, name, group) for x, y, unit_type, upgrade in items]
+                for group, items in groups.items()}
+
+    def get_pending(self, name):
+        """Gets the items of a stage that are not built yet
+
+        Args:
+            name: The name of the stage
+
+        Returns:
+            A list of PlanItems, group by group in the order the groups were added
+        """
+        return [item for items in self.__stages[name].values() for item in items]
+
+    def pending_stages(self):
+        """
+            Returns:
+                The names of the stages with items left to build, in priority order
+        """
+        return [name for name in self.names if any(self.__stages[name].values())]
+
+    def build(self, game_state, stages=None, group_order=None, min_resource=0):
+        """Builds the pending items of stages as far as resources allow, in a single pass
+
+        Args:
+            game_state: The GameState to build on
+            stages: The names of the stages to build, in order, or None for every pending stage in priority order
+            group_order: The order of the groups of each stage, as a list, or as a function taking the game state that is
+                called before each stage. Groups left out are built last, in the order they were added.
+            min_resource: The structure points needed to start on a stage. Later stages are skipped once below it.
+
+        Returns:
+            A BuildResult
+        """
+        result = BuildResult()
+        if stages is None:
+            stages = self.pending_stages()
+        for name in stages:
+            if not any(self.__stages[name].values()):
+                continue
+            if game_state.get_resource(0) < min_resource:
+                result.deferred += self.get_pending(name)
+                continue
+            self.__build_stage(game_state, name, group_order, result)
+        return result
+
+    def build_cycle(self, game_state, first=None, before=(), group_order=None, min_resource=0):
+        """Builds stages in order from the cursor until resources run out, moving the cursor past the stages completed
+
+        Once a stage is left with items that could not be built, the later stages are still built to spend the
+        remaining resources, but the cursor stays, so the unfinished stage comes first again next time.
+
+        Args:
+            game_state: The GameState to build on
+            first: The name of a stage to build before the one at the cursor, out of order. Building continues with the
+                stage after it, and the cursor does not move during this call.
+            before: The names of stages to build once at the start, such as priority structures. They are left out of
+                the cycle, and skipped along with everything else if the cycle is over or resources are below min_resource.
+            group_order: The order of the groups of each stage, see build
+            min_resource: The structure points needed to start on the next stage. Checked before before, then before
+                every stage after the first one.
+
+        Returns:
+            A BuildResult
+        """
+        result = BuildResult()
+        for result in self.iter_cycle(game_state, first, before, group_order, min_resource):
+            pass
+        return result
+
+    def iter_cycle(self, game_state, first=None, before=(), group_order=None, min_resource=0):
+        """Builds like build_cycle, taking the same arguments, one stage at a time
+
+        The cursor is moved as each stage is completed, so the generator can be closed between stages.
+
+        Returns:
+            A generator yielding the BuildResult of the stages built so far after each stage
+        """
+        result = BuildResult()
+        cycle = [name for name in self.names if name not in before]
+        position = self.cursor
+        if position >= len(cycle) or game_state.get_resource(0) < min_resource:
+            return
+        for name in before:
+            self.__build_stage(game_state, name, group_order, result)
+            yield result
+        on_cycle = first is None
+        if first is not None:
+            self.__build_stage(game_state, first, group_order, result)
+            position = cycle.index(first) + 1
+            yield result
+        while position < len(cycle):
+            if len(result.stages) > len(before) and game_state.get_resource(0) < min_resource:
+                break
+            completed = self.__build_stage(game_state, cycle[position], group_order, result)
+            position += 1
+            on_cycle = on_cycle and completed
+            if on_cycle:
+                self.cursor = position
+            yield result
+
+    def __build_stage(self, game_state, name, group_order, result):
+        # Returns True if every item of the stage is done
+        groups = self.__stages[name]
+        game_map = game_state.game_map
+        result.stages.append(name)
+        order = group_order(game_state) if callable(group_order) else group_order or []
+        completed = True
+        for group in [group for group in order if group in groups] + [group for group in groups if group not in order]:
+            pending = []
+            for item in groups[group]:
+                location = [item.x, item.y]
+                in_bounds = game_map.in_arena_bounds(location) and item.y < game_state.HALF_ARENA
+                occupied = not in_bounds or bool(game_map[location])
+                if not occupied and game_state.type_cost(item.unit_type)[0] <= game_state.get_resource(0):
+                    spawned = game_state.attempt_spawn(item.unit_type, location)
+                else:
+                    spawned = 0
+                if item.upgrade:
+                    done = in_bounds and bool(game_map[location]) and game_state.attempt_upgrade(location)
+                else:
+                    done = spawned
+                if done:
+                    result.built.append(item)
+                    continue
+                completed = False
+                pending.append(item)
+                structure = game_map[location][0] if in_bounds and game_map[location] else None
+                if not in_bounds or (structure is not None and (not item.upgrade or structure.upgraded or structure.player_index != 0)):
+                    result.blocked.append(item)
+                else:
+                    result.deferred.append(item)
+            groups[group] = pending
+        return completed
@@ -0,0 +1,147 @@
+import sys
+import time
+import threading
+from collections import deque
+
+from .util import debug_write, decode_json
+
+CONFIG = -1
+TURN = 0
+ACTION_FRAME = 1
+END = 2
+
+DEFAULT_KEEP_EVENTS = ("breach", "death", "selfDestruct", "spawn")
+
+
+def classify(message):
+    """Finds the kind of a message from the game engine without decoding it
+
+    Args:
+        message: A line received from the game engine
+
+    Returns:
+        CONFIG for the config, the state type in turnInfo (TURN, ACTION_FRAME or END) for game states,
+        or None if the message is neither
+    """
+    start = message.find('"turnInfo"')
+    if start >= 0:
+        end = len(message)
+        index = start + len('"turnInfo"')
+        while index < end and message[index] in ' :[':
+            index += 1
+        digits = index
+        while index < end and message[index].isdigit():
+            index += 1
+        if index > digits:
+            return int(message[digits:index])
+        # Not in the usual form, so leave it to the full decode
+        try:
+            return int(decode_json(message)["turnInfo"][0])
+        except (ValueError, KeyError, IndexError, TypeError):
+            return None
+    if "replaySave" in message:
+        return CONFIG
+    return None
+
+
+def has_events(message, event_names):
+    """Checks whether an action frame holds any events of the given types, without decoding it
+
+    Args:
+        message: An action frame received from the game engine
+        event_names: The event types to look for, such as "breach" or "death"
+
+    Returns:
+        True unless every listed event type is missing or holds an empty list
+    """
+    for name in event_names:
+        start = message.find('"{}"'.format(name))
+        if start < 0:
+            continue
+        index = start + len(name) + 2
+        end = len(message)
+        while index < end and message[index] in ' :':
+            index += 1
+        if message[index:index + 1] != '[':
+            return True
+        index += 1
+        while index < end and message[index] == ' ':
+            index += 1
+        if message[index:index + 1] != ']':
+            return True
+    return False
+
+
+class CommandReader:
+    """Reads messages from the game engine on a background thread, so the engine never waits on a slow algo.
+
+    Messages are classified as they arrive and queued in order. When coalescing, an action frame is skipped
+    if a newer action frame is already queued behind it and it holds none of the kept events. The final frame
+    of an action phase and every frame with a kept event are always delivered, and so are all other messages.
+
+    Attributes :
+        * stream (file): The stream read from, stdin by default
+        * max_queued (int): The most messages queued. The reader waits for the algo once that many are waiting.
+        * keep_events (tuple): The event types whose frames are never skipped
+        * dropped (int): The number of action frames skipped so far
+        * eof (bool): Whether the stream has ended
+
+    """
+    def __init__(self, stream=None, max_queued=1024, keep_events=DEFAULT_KEEP_EVENTS):
+        self.stream = sys.stdin if stream is None else stream
+        self.max_queued = max_queued
+        self.keep_events = keep_events
+        self.dropped = 0
+        self.eof = False
+        self.__queue = deque()
+        self.__condition = threading.Condition()
+        self.__thread = None
+
+    def start(self):
+        """Starts reading on the background thread
+        """
+        self.__thread = threading.Thread(target=self.__read, daemon=True)
+        self.__thread.start()
+
+    def __read(self):
+        while True:
+            try:
+                message = self.stream.readline()
+            except (EOFError, ValueError):
+                message = ""
+            entry = (classify(message) if message else None, message, time.perf_counter())
+            with self.__condition:
+                while len(self.__queue) >= self.max_queued:
+                    self.__condition.wait()
+                self.__queue.append(entry)
+                self.eof = message == ""
+                self.__condition.notify_all()
+            if not message:
+                return
+
+    def get(self, coalesce=False):
+        """Gets the next message, waiting for one if none is queued
+
+        Args:
+            coalesce: If true, skips action frames that are already outdated, see the class description
+
+        Returns:
+            A (kind, message, received_time) tuple, where kind is as returned by classify and
+            received_time is the time.perf_counter() time the message was read at
+        """
+        with self.__condition:
+            while not self.__queue:
+                self.__condition.wait()
+            kind, message, received_time = self.__queue[0]
+            if not message:
+                # Happens if parent game process dies, so exit for cleanup
+                debug_write("Got EOF, parent game process must have died, exiting for cleanup")
+                exit()
+            self.__queue.popleft()
+            if coalesce:
+                while (kind == ACTION_FRAME and self.__queue and self.__queue[0][0] == ACTION_FRAME
+                        and not has_events(message, self.keep_events)):
+                    kind, message, received_time = self.__queue.popleft()
+                    self.dropped += 1
+            self.__condition.notify_all()
+        return kind, message, received_time
@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import time
+import queue
+import struct
+import pickle
+import atexit
+import multiprocessing
+from multiprocessing import shared_memory
+
+from . import log
+from .game_state import GameState
+from .util import debug_write, decode_json
+
+_HEADER = struct.Struct("<QI")
+
+
+def encode_state(game_state):
+    """Serializes the board of a GameState in the format the game engine uses
+
+    Args:
+        game_state: The state to serialize
+
+    Returns:
+        A json string that GameState can parse back into the same units, resources, health and turn number.
+        Pending build and deploy commands are not included.
+    """
+    unit_information = game_state.config["unitInformation"]
+    type_index = {unit["shorthand"]: index for index, unit in enumerate(unit_information)}
+    remove_index = len(unit_information) - 2
+    upgrade_index = len(unit_information) - 1
+    units = ([[] for _ in unit_information], [[] for _ in unit_information])
+    for unit in game_state.game_map.get_all_units():
+        player_units = units[unit.player_index]
+        entry = [unit.x, unit.y, unit.health, ""]
+        player_units[type_index[unit.unit_type]].append(entry)
+        if unit.pending_removal:
+            player_units[remove_index].append(entry)
+        if unit.upgraded:
+            player_units[upgrade_index].append(entry)
+
+    resources = game_state._player_resources
+    return json.dumps({
+        "turnInfo": [0, game_state.turn_number, -1, 0],
+        "p1Stats": [game_state.my_health, resources[0]['SP'], resources[0]['MP'], game_state.my_time],
+        "p2Stats": [game_state.enemy_health, resources[1]['SP'], resources[1]['MP'], game_state.enemy_time],
+        "p1Units": units[0],
+        "p2Units": units[1]})
+
+
+def _read_state(config, segment, task_version):
+    # publish clears the version while it writes, so a copy is only kept if the version is the same before and after
+    give_up = time.perf_counter() + 1
+    while True:
+        version, length = _HEADER.unpack_from(segment.buf)
+        if version > task_version:
+            raise RuntimeError("The state was published again before this task was evaluated")
+        if version == task_version:
+            data = bytes(segment.buf[_HEADER.size:_HEADER.size + length])
+            if _HEADER.unpack_from(segment.buf)[0] == version:
+                game_state = GameState(config, decode_json(data))
+                game_state.suppress_warnings(True)
+                return game_state
+        if time.perf_counter() > give_up:
+            raise RuntimeError("The published state could not be read")
+        time.sleep(0.001)
+
+
+def _failure(call_id, index, error):
+    try:
+        return pickle.dumps((call_id, index, False, error))
+    except Exception:
+        return pickle.dumps((call_id, index, False, RuntimeError(repr(error))))
+
+
+def _worker_main(config, tasks, results):
+    # Anything printed to stdout would be read by the game engine as a command
+    sys.stdout = sys.stderr
+    segment = None
+    version = None
+    game_state = None
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        call_id, segment_name, task_version, fn, batch = task
+        try:
+            if task_version != version:
+                version = None
+                if segment is None or segment.name != segment_name:
+                    if segment is not None:
+                        segment.close()
+                    segment = None
+                    segment = shared_memory.SharedMemory(name=segment_name)
+                game_state = _read_state(config, segment, task_version)
+                version = task_version
+        except Exception as error:
+            # Every candidate of the batch fails with the error, so map_evaluate does not wait for them
+            for index, _ in batch:
+                results.put(_failure(call_id, index, error))
+            log.flush()
+            continue
+        for index, candidate in batch:
+            try:
+                result = pickle.dumps((call_id, index, True, fn(game_state.fork(), candidate)))
+            except Exception as error:
+                result = _failure(call_id, index, error)
+            results.put(result)
+        # Worker processes never submit a turn, so what evaluation functions logged is written after every batch
+        log.flush()
+    if segment is not None:
+        segment.close()
+
+
+class EvaluationPool:
+    """Evaluates candidate moves in parallel on long-lived worker processes.
+
+    Create the pool once, in on_game_start, so workers are forked before the game starts. Each turn,
+    publish the GameState once and then call map_evaluate as often as needed. The board is written to
+    shared memory, so only the evaluation function and the candidates are sent to the workers.
+    When only one core is available, or processes cannot be forked, candidates are evaluated in this process.
+
+    The evaluation function must be defined at the top level of a module, so it can be sent to the workers.
+    It is called as fn(game_state, candidate) with a fork of the published state that it is free to change,
+    and must return a picklable value. It must not print to stdout. What it logs with debug_write or a Logger
+    is written to stderr by the worker after each batch of candidates.
+
+    Attributes :
+        * config (JSON): Contains information about the game
+        * DEFAULT_TIMEOUT (float): The seconds map_evaluate waits for results unless told otherwise
+        * POLL_INTERVAL (float): How often, in seconds, map_evaluate checks that the workers are alive while waiting
+        * processes (int): The number of worker processes, 0 if candidates are evaluated in this process
+
+    """
+    DEFAULT_TIMEOUT = 2.0
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, config, processes=None, segment_size=1 << 18):
+        """Starts the worker processes
+
+        Args:
+            config: The game config
+            processes: The number of worker processes. Defaults to one less than the number of cores.
+            segment_size: The initial size in bytes of the shared memory holding the published board
+
+        """
+        self.config = config
+        if processes is None:
+            processes = (os.cpu_count() or 1) - 1
+        if processes > 0 and "fork" not in multiprocessing.get_all_start_methods():
+            processes = 0
+        self.processes = processes
+        self.__game_state = None
+        self.__version = 0
+        self.__call_id = 0
+        self.__workers = []
+        self.__segment = None
+        if processes <= 0:
+            return
+
+        context = multiprocessing.get_context("fork")
+        self.__segment = shared_memory.SharedMemory(create=True, size=segment_size)
+        self.__tasks = context.Queue()
+        self.__results = context.Queue()
+        for _ in range(processes):
+            worker = context.Process(target=_worker_main, args=(config, self.__tasks, self.__results), daemon=True)
+            worker.start()
+            self.__workers.append(worker)
+        atexit.register(self.close)
+
+    def publish(self, game_state):
+        """Publishes the state candidates will be evaluated against, usually once per turn
+
+        Args:
+            game_state: The current GameState. Later changes to it are not seen by the workers until it is published again.
+
+        """
+        self.__game_state = game_state
+        self.__version += 1
+        if not self.__workers:
+            return
+
+        data = encode_state(game_state).encode()
+        if _HEADER.size + len(data) > self.__segment.size:
+            # Workers attach to the new segment when they see its name in their next task
+            self.__segment.close()
+            self.__segment.unlink()
+            self.__segment = shared_memory.SharedMemory(create=True, size=2 * (_HEADER.size + len(data)))
+        # Workers still reading an earlier state see the version change and read again
+        _HEADER.pack_into(self.__segment.buf, 0, 0, 0)
+        self.__segment.buf[_HEADER.size:_HEADER.size + len(data)] = data
+        _HEADER.pack_into(self.__segment.buf, 0, self.__version, len(data))
+
+    def map_evaluate(self, fn, candidates, timeout=DEFAULT_TIMEOUT, default=None):
+        """Evaluates fn against the published state for every candidate
+
+        If a worker process dies, the candidates still waiting for a result are evaluated in this process,
+        and the remaining workers are used for later calls.
+
+        Args:
+            fn: A top level function taking a GameState and a candidate
+            candidates: A list of candidates, such as spawn locations or structure placements
+            timeout: The most seconds to wait for results, or None to wait for all of them
+            default: The result used for candidates that were not evaluated before the timeout
+
+        Returns:
+            A list with the result of fn for each candidate, in the order of candidates.
+            If fn raised an exception for any candidate, the first one is raised instead.
+        """
+        if self.__game_state is None:
+            raise RuntimeError("Call publish before map_evaluate")
+        candidates = list(candidates)
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        results = [default] * len(candidates)
+        if not self.__workers:
+            self.__evaluate_here(fn, candidates, range(len(candidates)), results, deadline)
+            return results
+
+        self.__call_id += 1
+        call_id = self.__call_id
+        chunk_size = max(1, len(candidates) // (4 * len(self.__workers)))
+        indexed = list(enumerate(candidates))
+        for start in range(0, len(indexed), chunk_size):
+            self.__tasks.put((call_id, self.__segment.name, self.__version, fn, indexed[start:start + chunk_size]))
+
+        received = [False] * len(candidates)
+        pending = len(candidates)
+        error = None
+        while pending:
+            wait = self.POLL_INTERVAL if deadline is None else min(self.POLL_INTERVAL, deadline - time.perf_counter())
+            if wait <= 0:
+                break
+            try:
+                result_call, index, succeeded, value = pickle.loads(self.__results.get(timeout=wait))
+            except queue.Empty:
+                dead = [worker for worker in self.__workers if not worker.is_alive()]
+                if not dead:
+                    continue
+                # The tasks held by dead workers are lost, so what is left is evaluated here
+                for worker in dead:
+                    debug_write("Evaluation worker {} died with exit code {}".format(worker.pid, worker.exitcode))
+                    self.__workers.remove(worker)
+                self.processes = len(self.__workers)
+                self.__drain_tasks()
+                self.__evaluate_here(fn, candidates, [index for index in range(len(candidates)) if not received[index]], results, deadline)
+                pending = 0
+                break
+            # Results of an earlier call that timed out are dropped
+            if result_call != call_id or received[index]:
+                continue
+            received[index] = True
+            pending -= 1
+            if succeeded:
+                results[index] = value
+            elif error is None:
+                error = value
+        if pending:
+            self.__drain_tasks()
+        if error is not None:
+            raise error
+        return results
+
+    def __evaluate_here(self, fn, candidates, indexes, results, deadline):
+        for index in indexes:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            results[index] = fn(self.__game_state.fork(), candidates[index])
+
+    def __drain_tasks(self):
+        # Tasks no worker has picked up yet would only produce results nobody waits for
+        try:
+            while True:
+                self.__tasks.get_nowait()
+        except queue.Empty:
+            pass
+
+    def close(self):
+        """Stops the worker processes and frees the shared memory
+        """
+        workers, self.__workers = self.__workers, []
+        if self.__segment is None:
+            return
+        self.__drain_tasks()
+        for _ in workers:
+            self.__tasks.put(None)
+        for worker in workers:
+            worker.join(1)
+            if worker.is_alive():
+                debug_write("Evaluation worker {} did not stop, terminating it".format(worker.pid))
+                worker.terminate()
+        self.__segment.close()
+        self.__segment.unlink()
+        self.__segment = None
@@ -0,0 +1,99 @@
+import json
+from collections import namedtuple
+
+from .command_reader import has_events
+
+BreachEvent = namedtuple("BreachEvent", ["x", "y", "damage", "unit_type", "unit_id", "player_index"])
+BreachEvent.__doc__ = """A unit scored by reaching the opposite edge. player_index is 0 for you and 1 for the enemy."""
+DeathEvent = namedtuple("DeathEvent", ["x", "y", "unit_type", "unit_id", "player_index", "removed_by_owner"])
+DeathEvent.__doc__ = """A unit was destroyed, scored or removed by its owner. player_index is 0 for you and 1 for the enemy."""
+DamageEvent = namedtuple("DamageEvent", ["x", "y", "damage", "unit_type", "unit_id", "player_index"])
+DamageEvent.__doc__ = """A unit took damage. player_index is 0 for you and 1 for the enemy."""
+SpawnEvent = namedtuple("SpawnEvent", ["x", "y", "unit_type", "unit_id", "player_index"])
+SpawnEvent.__doc__ = """A unit was added to the board. player_index is 0 for you and 1 for the enemy."""
+RoundEndEvent = namedtuple("RoundEndEvent", ["turn_number", "frame"])
+RoundEndEvent.__doc__ = """The action phase of a turn ended, on its last frame."""
+
+_decoder = json.JSONDecoder()
+
+
+def decode_field(message, name):
+    """Decodes a single value of a message from the game engine, leaving the rest of it undecoded
+
+    Args:
+        message: A message from the game engine
+        name: The key of the value, such as "breach" or "p1Units"
+
+    Returns:
+        The decoded value of the first occurrence of the key, or None if the message does not contain it
+    """
+    start = message.find('"{}"'.format(name))
+    if start < 0:
+        return None
+    start = message.index(':', start + len(name) + 2) + 1
+    while message[start] == ' ':
+        start += 1
+    return _decoder.raw_decode(message, start)[0]
+
+
+class FrameEvents:
+    """Turns action frames into typed events for the handlers subscribed to them.
+
+    Frames are scanned for the subscribed event types first, and only the lists of those types are decoded,
+    so frames without matching events cost a few substring searches. Handlers are called once per event,
+    in the order of the frame, with a namedtuple holding the unit type as a shorthand and the player as 0 or 1.
+    The round end handler needs the units of the frame to tell whether it is the last one, so subscribing
+    to it decodes the unit lists of every frame.
+
+    Attributes :
+        * EVENT_TYPES (tuple): The event types that can be subscribed to, other than "round_end"
+        * handlers (dict): The function subscribed to each event type
+
+    """
+    EVENT_TYPES = ("breach", "death", "damage", "spawn")
+
+    def __init__(self, config, handlers):
+        """Sets up the subscriptions of a game
+
+        Args:
+            config: The game config
+            handlers: A dict mapping event types from EVENT_TYPES, or "round_end", to the function called with each such event
+
+        """
+        self.handlers = dict(handlers)
+        unit_information = config["unitInformation"]
+        self.__shorthands = [unit.get("shorthand") for unit in unit_information]
+        self.__mobile_indexes = [index for index, unit in enumerate(unit_information) if unit.get("unitCategory") == 1]
+        self.__event_types = tuple(name for name in self.EVENT_TYPES if name in self.handlers)
+
+    def dispatch(self, message):
+        """Calls the subscribed handlers with the events of an action frame
+
+        Args:
+            message: The action frame, as received from the game engine
+
+        """
+        if self.__event_types and has_events(message, self.__event_types):
+            shorthands = self.__shorthands
+            for name in self.__event_types:
+                if not has_events(message, (name,)):
+                    continue
+                handler = self.handlers[name]
+                for event in decode_field(message, name):
+                    if name == "breach":
+                        handler(BreachEvent(event[0][0], event[0][1], event[1], shorthands[event[2]], event[3], event[4] - 1))
+                    elif name == "death":
+                        handler(DeathEvent(event[0][0], event[0][1], shorthands[event[1]], event[2], event[3] - 1, event[4]))
+                    elif name == "damage":
+                        handler(DamageEvent(event[0][0], event[0][1], event[1], shorthands[event[2]], event[3], event[4] - 1))
+                    else:
+                        handler(SpawnEvent(event[0][0], event[0][1], shorthands[event[1]], event[2], event[3] - 1))
+
+        handler = self.handlers.get("round_end")
+        if handler is not None:
+            for name in ("p1Units", "p2Units"):
+                units = decode_field(message, name)
+                if any(units[index] for index in self.__mobile_indexes):
+                    return
+            turn_info = decode_field(message, "turnInfo")
+            handler(RoundEndEvent(turn_info[1], turn_info[2]))
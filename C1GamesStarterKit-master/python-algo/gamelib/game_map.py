@@ -1,7 +1,78 @@
 import math
 from .unit import GameUnit
+from .threat_map import ThreatMap
+from .targeting import Targeting
+from .regions import RegionScores
+from .board_arrays import BoardArrays, numpy_available
 from .util import debug_write
 
+
+class ArenaGeometry:
+    """Lookup tables for the fixed geometry of the arena.
+    Built once for each arena size and getHitRadius and shared by every GameMap using them.
+
+    Attributes :
+        * size (int): The size of the arena
+        * hit_radius (float): The getHitRadius of units
+        * bounds (tuple): True for every location on the board, indexed by x * size + y
+        * edges (tuple): The four edges as tuples of (x, y) tuples, in the order returned by GameMap.get_edges
+        * edge_sets (tuple): The four edges as frozensets of (x, y) tuples
+
+    """
+    def __init__(self, size, hit_radius):
+        self.size = size
+        self.hit_radius = hit_radius
+        half = size // 2
+
+        bounds = [False] * (size * size)
+        for y in range(size):
+            row_size = y + 1 if y < half else size - y
+            startx = half - row_size
+            for x in range(startx, startx + 2 * row_size):
+                bounds[x * size + y] = True
+        self.bounds = tuple(bounds)
+
+        top_right = tuple((half + num, size - 1 - num) for num in range(half))
+        top_left = tuple((half - 1 - num, size - 1 - num) for num in range(half))
+        bottom_left = tuple((half - 1 - num, num) for num in range(half))
+        bottom_right = tuple((half + num, num) for num in range(half))
+        self.edges = (top_right, top_left, bottom_left, bottom_right)
+        self.edge_sets = tuple(frozenset(edge) for edge in self.edges)
+        self.__stencils = {}
+
+    def stencil(self, radius):
+        """Gets the offsets of the locations within range of a location
+
+        Args:
+            radius: The radius of the search area
+
+        Returns:
+            A tuple of (dx, dy) offsets whose centers are within radius + hit_radius, ordered by dx then dy
+        """
+        offsets = self.__stencils.get(radius)
+        if offsets is None:
+            search_radius = math.ceil(radius)
+            reach = radius + self.hit_radius
+            offsets = tuple((dx, dy)
+                    for dx in range(-search_radius, search_radius + 1)
+                    for dy in range(-search_radius, search_radius + 1)
+                    if math.sqrt(dx**2 + dy**2) < reach)
+            self.__stencils[radius] = offsets
+        return offsets
+
+
+_GEOMETRIES = {}
+
+def get_arena_geometry(size, hit_radius):
+    """Gets the shared ArenaGeometry for an arena size and getHitRadius
+    """
+    key = (size, hit_radius)
+    geometry = _GEOMETRIES.get(key)
+    if geometry is None:
+        geometry = _GEOMETRIES[key] = ArenaGeometry(size, hit_radius)
+    return geometry
+
+
 class GameMap:
     """Holds data about the current game map and provides functions
     useful for getting information related to the map.
@@ -9,6 +80,17 @@ class GameMap:
     game_map[x, y] will return a list of Units located at that location, 
     or an empty list if there are no units at the location
 
+    The map keeps a mask of the tiles holding structures for path-finding, an index of the
+    units threatening each tile and, once requested, NumPy arrays describing each tile. They are only kept up to date when units are changed through
+    GameMap functions, so do not modify the list returned by game_map[x, y] directly.
+
+    A copy made with GameMap.copy shares its tile lists and units with the original until they are
+    changed through GameMap functions, at which point the changed tile is copied first.
+
+    Every change made through GameMap functions increases version and marks its tile as dirty until the next checkpoint,
+    and is passed on to the subscribers of the map, so data derived from the board can be cached safely.
+    A subscriber is any object with an update_location(x, y) method, like ThreatMap, BoardArrays and Targeting.
+
     Attributes :
         * config (JSON): Contains information about the current game rules
         * enable_warnings (bool): If true, debug messages for game_map functions will print out
@@ -18,6 +100,8 @@ class GameMap:
         * TOP_LEFT (int): A constant that represents the top left edge
         * BOTTOM_LEFT (int): Hidden challenge! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
+        * geometry (:obj: ArenaGeometry): Precomputed bounds, edges and range stencils for this map
+        * version (int): The number of changes made to the map, only ever increasing, copies included
 
     """
     def __init__(self, config):
@@ -35,7 +119,20 @@ class GameMap:
         self.TOP_LEFT = 1
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
+        self.geometry = get_arena_geometry(self.ARENA_SIZE, self.config["unitInformation"][0]['getHitRadius'])
+        self.__bounds = self.geometry.bounds
         self.__map = self.__empty_grid()
+        self.__blocked = bytearray(self.ARENA_SIZE * self.ARENA_SIZE)
+        self.__threat_map = None
+        self.__board_arrays = None
+        self.__targeting = None
+        self.__region_scores = {}
+        self.__subscribers = []
+        self.__dirty = set()
+        self.version = 0
+        # None until the map is copied, then 2 for tiles whose list and units are shared with another map,
+        # 1 for tiles whose units are shared and 0 for tiles owned by this map
+        self.__shared = None
         self.__start = [13,0]
     
     def __getitem__(self, location):
@@ -47,6 +144,9 @@ class GameMap:
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
             self.__map[location[0]][location[1]] = val
+            if self.__shared is not None:
+                self.__shared[location[0] * self.ARENA_SIZE + location[1]] = 0
+            self.__tile_changed(location[0], location[1])
             return
         self._invalid_coordinates(location)
 
@@ -75,6 +175,102 @@ class GameMap:
                 grid[x].append([])
         return grid
 
+    def __tile_changed(self, x, y):
+        if self.in_arena_bounds([x, y]):
+            self.__blocked[x * self.ARENA_SIZE + y] = any(unit.stationary for unit in self.__map[x][y])
+            self.version += 1
+            self.__dirty.add((x, y))
+            for subscriber in self.__subscribers:
+                subscriber.update_location(x, y)
+
+    def __own_tile(self, x, y, units_too):
+        if self.__shared is None:
+            return
+        index = x * self.ARENA_SIZE + y
+        shared = self.__shared[index]
+        if shared == 2 and not units_too:
+            self.__map[x][y] = list(self.__map[x][y])
+            self.__shared[index] = 1
+        elif shared and units_too:
+            self.__map[x][y] = [unit.copy() for unit in self.__map[x][y]]
+            self.__shared[index] = 0
+
+    def copy(self, share_units=True):
+        """Makes a copy of this map that is cheap to create
+
+        Args:
+            share_units: If false, every unit is copied right away, so units of the copy can be modified directly
+
+        Returns:
+            A new GameMap holding the same units. Unless share_units is false, tiles and units are shared
+            between the two maps and only copied when one of them changes them through GameMap functions.
+        """
+        game_map = GameMap.__new__(GameMap)
+        game_map.__dict__.update(self.__dict__)
+        game_map.__blocked = bytearray(self.__blocked)
+        game_map.__start = [13,0]
+        game_map.__dirty = set(self.__dirty)
+        # Subscribers follow this map only. The remembered targets are units of this map, so the copy chooses its own
+        game_map.__subscribers = []
+        game_map.__targeting = None
+        game_map.__region_scores = {}
+        if not share_units:
+            game_map.__map = [[[unit.copy() for unit in units] if units else [] for units in column] for column in self.__map]
+            game_map.__shared = None
+            # The indexes hold references to units, so the copy builds its own when they are first needed
+            game_map.__threat_map = None
+            game_map.__board_arrays = None
+            return game_map
+
+        game_map.__map = [list(column) for column in self.__map]
+        self.__shared = bytearray([2]) * (self.ARENA_SIZE * self.ARENA_SIZE)
+        game_map.__shared = bytearray(self.__shared)
+        if self.__threat_map is not None:
+            game_map.__threat_map = self.__threat_map.copy(game_map)
+            game_map.subscribe(game_map.__threat_map)
+        if self.__board_arrays is not None:
+            game_map.__board_arrays = self.__board_arrays.copy(game_map)
+            game_map.subscribe(game_map.__board_arrays)
+        return game_map
+
+    def subscribe(self, subscriber):
+        """Has a subscriber told about every change made to the map through GameMap functions
+
+        Args:
+            subscriber: An object with an update_location(x, y) method, called with the location of each changed tile
+                after the change, in the order subscribed. It is not carried over to copies of the map.
+
+        """
+        if subscriber not in self.__subscribers:
+            self.__subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber):
+        """Stops telling a subscriber about changes to the map
+
+        Args:
+            subscriber: A subscriber added with subscribe
+
+        """
+        if subscriber in self.__subscribers:
+            self.__subscribers.remove(subscriber)
+
+    def checkpoint(self):
+        """Starts tracking changed tiles afresh, see get_dirty_tiles
+
+        Returns:
+            The version of the map at the checkpoint
+        """
+        self.__dirty = set()
+        return self.version
+
+    def get_dirty_tiles(self):
+        """Gets the tiles changed since the last checkpoint, or since the map was created if there was none
+
+        Returns:
+            A set of (x, y) tuples. It is owned by the map and must not be modified.
+        """
+        return self.__dirty
+
     def _invalid_coordinates(self, location):
         self.warn("{} is out of bounds.".format(str(location)))
 
@@ -89,6 +285,10 @@ class GameMap:
         
         """
         x, y = location
+        if type(x) is int and type(y) is int:
+            size = self.ARENA_SIZE
+            return 0 <= x < size and 0 <= y < size and self.__bounds[x * size + y]
+
         half_board = self.HALF_ARENA
 
         row_size = y + 1
@@ -117,8 +317,19 @@ class GameMap:
             self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(quadrant_description))
             return
 
-        edges = self.get_edges()
-        return edges[quadrant_description]
+        return [list(location) for location in self.geometry.edges[quadrant_description]]
+
+    def get_edge_location_set(self, quadrant_description):
+        """Takes in an edge description and returns its locations as a set, for fast membership tests.
+
+        Args:
+            quadrant_description: A constant corresponding to one of the 4 edges. See game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, and similar constants.
+
+        Returns:
+            A frozenset of (x, y) tuples along the requested edge
+
+        """
+        return self.geometry.edge_sets[quadrant_description]
 
     def get_edges(self):
         """Gets all of the edges and their edge locations
@@ -127,27 +338,7 @@ class GameMap:
             A list with four lists inside of it of locations corresponding to the four edges.
             [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right.
         """
-        top_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = self.ARENA_SIZE - 1 - num
-            top_right.append([int(x), int(y)])
-        top_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = self.ARENA_SIZE - 1 - num
-            top_left.append([int(x), int(y)])
-        bottom_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = num
-            bottom_left.append([int(x), int(y)])
-        bottom_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = num
-            bottom_right.append([int(x), int(y)])
-        return [top_right, top_left, bottom_left, bottom_right]
+        return [[list(location) for location in edge] for edge in self.geometry.edges]
     
     def add_unit(self, unit_type, location, player_index=0):
         """Add a single GameUnit to the map at the given location.
@@ -166,12 +357,50 @@ class GameMap:
         if player_index < 0 or player_index > 1:
             self.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
 
-        x, y = location
         new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
-        if not new_unit.stationary:
-            self.__map[x][y].append(new_unit)
+        self.place_unit(new_unit)
+
+    def place_unit(self, unit):
+        """Add an existing GameUnit to the map at its own x, y location.
+
+        Args:
+            unit: The GameUnit to add. A structure replaces any units already at its location.
+
+        Like add_unit, this only changes the data stored in GameMap.
+        """
+        x, y = unit.x, unit.y
+        if not unit.stationary:
+            self.__own_tile(x, y, False)
+            self.__map[x][y].append(unit)
         else:
-            self.__map[x][y] = [new_unit]
+            self.__map[x][y] = [unit]
+            if self.__shared is not None:
+                self.__shared[x * self.ARENA_SIZE + y] = 0
+        self.__tile_changed(x, y)
+
+    def upgrade_unit(self, location):
+        """Upgrade the structure at the given location.
+
+        Args:
+            location: The location of the structure to upgrade
+
+        Returns:
+            The upgraded structure, or None if there is no structure at the location
+
+        Like add_unit, this only changes the data stored in GameMap. Use GameState.attempt_upgrade to upgrade as part of your turn.
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return None
+
+        x, y = location
+        self.__own_tile(x, y, True)
+        for unit in self.__map[x][y]:
+            if unit.stationary:
+                unit.upgrade()
+                self.__tile_changed(x, y)
+                return unit
+        return None
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -187,6 +416,90 @@ class GameMap:
         
         x, y = location
         self.__map[x][y] = []
+        if self.__shared is not None:
+            self.__shared[x * self.ARENA_SIZE + y] = 0
+        self.__tile_changed(x, y)
+
+    def get_all_units(self):
+        """Gets every unit on the map
+
+        Returns:
+            A list of all GameUnits on the map, ordered by x, then y, then their order within their location
+        """
+        return [unit for column in self.__map for units in column for unit in units]
+
+    def get_blocked_mask(self):
+        """Gets the tiles holding structures
+
+        Returns:
+            A bytearray indexed by x * ARENA_SIZE + y that is 1 for every tile holding a structure.
+            It is owned by the map and must not be modified.
+        """
+        return self.__blocked
+
+    def get_threat_map(self):
+        """Gets the index of the units threatening each location, building it on first use
+
+        Returns:
+            The ThreatMap of this map
+        """
+        if self.__threat_map is None:
+            self.__threat_map = ThreatMap(self)
+            self.subscribe(self.__threat_map)
+        return self.__threat_map
+
+    def adopt_threat_map(self, threat_map):
+        """Uses the threat map of another map instead of building one, when both hold the same units apart from their health
+
+        Args:
+            threat_map: The ThreatMap of a map with units of the same types, owners and upgrades at the same locations
+
+        """
+        if self.__threat_map is not None:
+            self.unsubscribe(self.__threat_map)
+        self.__threat_map = threat_map.rebind(self)
+        self.subscribe(self.__threat_map)
+
+    def get_targeting(self):
+        """Gets the memoized target selection of this map, creating it on first use
+
+        Returns:
+            The Targeting of this map
+        """
+        if self.__targeting is None:
+            self.__targeting = Targeting(self)
+            self.subscribe(self.__targeting)
+        return self.__targeting
+
+    def get_region_scores(self, score):
+        """Gets the region scores of this map for a scoring function, creating them on first use
+
+        Args:
+            score: A function giving the contribution of a GameUnit to the score of its region.
+                Pass the same function every time to reuse the scores already summed.
+
+        Returns:
+            The RegionScores of this map for the scoring function
+        """
+        region_scores = self.__region_scores.get(score)
+        if region_scores is None:
+            region_scores = self.__region_scores[score] = RegionScores(self, score)
+            self.subscribe(region_scores)
+        return region_scores
+
+    def get_board_arrays(self):
+        """Gets NumPy arrays describing every location of the map, building them on first use
+
+        Returns:
+            The BoardArrays of this map, or None if NumPy is not installed
+        """
+        if self.__board_arrays is None:
+            if not numpy_available():
+                self.warn("NumPy is not installed, board arrays are unavailable.")
+                return None
+            self.__board_arrays = BoardArrays(self)
+            self.subscribe(self.__board_arrays)
+        return self.__board_arrays
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -205,6 +518,17 @@ class GameMap:
             self._invalid_coordinates(location)
 
         x, y = location
+        if type(x) is int and type(y) is int:
+            size = self.ARENA_SIZE
+            bounds = self.__bounds
+            locations = []
+            for dx, dy in self.geometry.stencil(radius):
+                i = x + dx
+                j = y + dy
+                if 0 <= i < size and 0 <= j < size and bounds[i * size + j]:
+                    locations.append([i, j])
+            return locations
+
         locations = []
         search_radius = math.ceil(radius)
         getHitRadius = self.config["unitInformation"][0]['getHitRadius']
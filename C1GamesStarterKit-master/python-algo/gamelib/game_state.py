@@ -1,9 +1,11 @@
 import math
 import json
 import sys
+import time
 
 from .navigation import ShortestPathFinder
-from .util import send_command, debug_write
+from .util import send_command, debug_write, decode_json
+from . import log
 from .unit import GameUnit
 from .game_map import GameMap
 
@@ -44,19 +46,22 @@ class GameState:
         * my_time (int): The time you took to submit your previous turn
         * enemy_health (int): Your opponents current remaining health
         * enemy_time (int): Your opponents current remaining time
+        * parse_time (float): The time in seconds taken to build this GameState from the serialized state, kept by its forks
+        * parent (:obj: GameState): The state this one was forked from, or None
 
     """
-
     def __init__(self, config, serialized_string):
         """ Setup a turns variables using arguments passed
 
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * serialized_string (string): A string containing information about the game state at the start of this turn, or the already decoded json object
 
         """
+        start_time = time.perf_counter()
         self.serialized_string = serialized_string
         self.config = config
+        self.parent = None
         self.enable_warnings = True
 
         global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE, STRUCTURE_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
@@ -97,13 +102,14 @@ class GameState:
                 {'SP': 0, 'MP': 0},  # player 0, which is you
                 {'SP': 0, 'MP': 0}]  # player 1, which is the opponent
         self.__parse_state(serialized_string)
+        self.parse_time = time.perf_counter() - start_time
 
     def __parse_state(self, state_line):
         """
         Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        state_line is the game state as a json string or the object decoded from it.
         """
-        state = json.loads(state_line)
+        state = state_line if isinstance(state_line, dict) else decode_json(state_line)
 
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
@@ -132,11 +138,11 @@ class GameState:
         """
         typedef = self.config.get("unitInformation")
         for i, unit_types in enumerate(units):
+            unit_type = typedef[i].get("shorthand")
             for uinfo in unit_types:
-                unit_type = typedef[i].get("shorthand")
-                sx, sy, shp = uinfo[:3]
-                x, y = map(int, [sx, sy])
-                hp = float(shp)
+                x = int(uinfo[0])
+                y = int(uinfo[1])
+                hp = float(uinfo[2])
                 # This depends on RM and UP always being the last types to be processed
                 if unit_type == REMOVE:
                     # Quick fix will deploy engine fix soon
@@ -144,10 +150,10 @@ class GameState:
                         self.game_map[x,y][0].pending_removal = True
                 elif unit_type == UPGRADE:
                     if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].upgrade()
+                        self.game_map.upgrade_unit([x,y])
                 else:
                     unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                    self.game_map[x,y].append(unit)
+                    self.game_map.place_unit(unit)
 
     def __resource_required(self, unit_type):
         return self.SP if is_stationary(unit_type) else self.MP
@@ -179,6 +185,42 @@ class GameState:
         deploy_string = json.dumps(self._deploy_stack)
         send_command(build_string)
         send_command(deploy_string)
+        # The debug output of the turn is only written once the engine has the turn
+        log.flush()
+
+    def fork(self, share_units=True):
+        """Makes a cheap copy of this state to try out moves on, without affecting this state.
+        The map of the fork shares its tiles and units with this state until one of them
+        changes them through GameMap or GameState functions, so forking is much faster than a deep copy.
+
+        Args:
+            share_units: If false, the units are copied right away, so units of the fork can be modified directly
+
+        Returns:
+            A new GameState with the same map, resources and pending commands as this one
+        """
+        state = GameState.__new__(GameState)
+        state.__dict__.update(self.__dict__)
+        state.parent = self
+        state.game_map = self.game_map.copy(share_units)
+        state._shortest_path_finder = ShortestPathFinder(self._shortest_path_finder.field_cache)
+        state._build_stack = list(self._build_stack)
+        state._deploy_stack = list(self._deploy_stack)
+        state._player_resources = [dict(resources) for resources in self._player_resources]
+        state.__fork_point = (len(self._build_stack), len(self._deploy_stack))
+        return state
+
+    def diff(self):
+        """Gets the commands issued on this fork since it was forked
+
+        Returns:
+            A list of two lists of (unit_type, x, y) commands, the build commands followed by the deploy commands,
+            in the format submit_turn sends. Both are empty if this state is not a fork.
+        """
+        if self.parent is None:
+            return [[], []]
+        build_point, deploy_point = self.__fork_point
+        return [self._build_stack[build_point:], self._deploy_stack[deploy_point:]]
 
     def get_resource(self, resource_type, player_index = 0):
         """Gets a players resources
@@ -333,7 +375,9 @@ class GameState:
         stationary = is_stationary(unit_type)
         blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        edge_location = tuple(location)
+        on_edge = (edge_location in self.game_map.get_edge_location_set(self.game_map.BOTTOM_LEFT) or
+                   edge_location in self.game_map.get_edge_location_set(self.game_map.BOTTOM_RIGHT))
 
         if self.enable_warnings:
             fail_reason = ""
@@ -445,7 +489,7 @@ class GameState:
                     if resources[SP] >= costs[SP] and resources[MP] >= costs[MP]:
                         self.__set_resource(SP, 0 - costs[SP])
                         self.__set_resource(MP, 0 - costs[MP])
-                        existing_unit.upgrade()
+                        self.game_map.upgrade_unit([x, y])
                         self._build_stack.append((UPGRADE, x, y))
                         spawned_units += 1
             else:
@@ -498,6 +542,40 @@ class GameState:
         end_points = self.game_map.get_edge_locations(target_edge)
         return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
 
+    def find_paths_to_edges(self, start_locations, target_edge=None):
+        """Gets the paths units at several locations would take.
+        Much faster than calling find_path_to_edge for each location, as the map is only scanned
+        once and starts heading for the same edge share their searches.
+
+        Args:
+            start_locations: A list of locations of hypothetical units
+            target_edge: The edge every unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from each start location if None.
+
+        Returns:
+            A dict mapping each start location, as an (x, y) tuple, to the path a unit there would take.
+            Blocked start locations map to None.
+
+        """
+        paths = {}
+        starts_by_edge = {}
+        for start_location in start_locations:
+            if self.contains_stationary_unit(start_location):
+                self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+                paths[tuple(start_location)] = None
+                continue
+            edge = self.get_target_edge(start_location) if target_edge is None else target_edge
+            starts_by_edge.setdefault(edge, []).append(start_location)
+
+        if not starts_by_edge:
+            return paths
+
+        self._shortest_path_finder.initialize_map(self)
+        for edge, starts in starts_by_edge.items():
+            end_points = self.game_map.get_edge_locations(edge)
+            for start_location, path in zip(starts, self._shortest_path_finder.navigate_from_starts(starts, end_points)):
+                paths[tuple(start_location)] = path
+        return paths
+
     def contains_stationary_unit(self, location):
         """Check if a location is blocked, return structures unit if it is
 
@@ -542,6 +620,8 @@ class GameState:
         Their targeting priority is as follows:
             Infantry > Nearest Unit > Lowest Health > Lowest Y position > Closest to edge (Highest distance of X from the boards center, 13.5)
 
+        Choices are remembered until units on the map change, see Targeting.
+
         Args:
             attacking_unit: A GameUnit
 
@@ -555,6 +635,10 @@ class GameState:
             return
 
         attacker_location = [attacking_unit.x, attacking_unit.y]
+        if type(attacking_unit.x) is int and type(attacking_unit.y) is int and self.game_map.in_arena_bounds(attacker_location):
+            # Chooses the same target as the scan below, from precomputed candidates and remembered choices
+            return self.game_map.get_targeting().get_target(attacking_unit)
+
         possible_locations = self.game_map.get_locations_in_range(attacker_location, attacking_unit.attackRange)
         target = None
         target_stationary = True
@@ -631,6 +715,10 @@ class GameState:
         if not self.game_map.in_arena_bounds(location):
             self.warn("Location {} is not in the arena bounds.".format(location))
 
+        attackers = self.game_map.get_threat_map().get_attackers(location, player_index)
+        if attackers is not None:
+            return attackers
+
         attackers = []
         """
         Get locations in the range of TURRET units
@@ -645,3 +733,33 @@ class GameState:
                 if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and self.game_map.distance_between_locations(location, location_unit) <= unit.attackRange:
                     attackers.append(unit)
         return attackers
+
+    def get_damage_per_frame(self, location, player_index):
+        """Gets the damage a mobile unit at a location would take from its attackers each frame
+
+        Args:
+            location: The location of a hypothetical defender
+            player_index: The index corresponding to the defending player, 0 for you 1 for the enemy
+
+        Returns:
+            The total damage to mobile units dealt each frame by the units returned by get_attackers
+
+        """
+        damage = self.game_map.get_threat_map().get_damage_per_frame(location, player_index)
+        if damage is None:
+            damage = sum(unit.damage_i for unit in self.get_attackers(location, player_index))
+        return damage
+
+    def get_region_score(self, region, score):
+        """Sums the scores of the units inside a region of the board
+
+        Scores are kept by the GameMap and only summed again for regions whose units changed, see RegionScores.
+
+        Args:
+            region: A Region, usually defined once in on_game_start
+            score: A function giving the score of a GameUnit. Pass the same function every time to reuse earlier sums.
+
+        Returns:
+            The sum of score(unit) over every unit inside the region
+        """
+        return self.game_map.get_region_scores(score).get_score(region)
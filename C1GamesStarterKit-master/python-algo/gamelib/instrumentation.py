@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import time
+import threading
+import functools
+
+from .game_state import GameState
+
+# The GameState functions timed while instrumentation is enabled, and the timer names they are recorded under
+INSTRUMENTED_FUNCTIONS = {
+    "__init__": "parse",
+    "find_path_to_edge": "find_path_to_edge",
+    "find_paths_to_edges": "find_paths_to_edges",
+    "get_target": "get_target",
+    "get_attackers": "get_attackers",
+    "attempt_spawn": "attempt_spawn",
+    "submit_turn": "submit_turn",
+}
+
+_enabled = False
+_output = None
+_originals = {}
+_timers = {}
+_counters = {}
+_main_thread = threading.main_thread()
+
+
+class Timer:
+    """Measures the time spent in a block of code and the number of times it ran.
+
+    Use the Timer returned by timer(name) as a context manager or as a decorator. Only the main thread is measured,
+    and time spent in recursive calls is only counted once. While instrumentation is disabled it does nothing,
+    and functions decorated while it is disabled are returned unchanged, so they are never timed.
+
+    Attributes :
+        * name (str): The name the timer is recorded under
+        * calls (int): The number of times the timed code ran this turn
+        * seconds (float): The time spent in the timed code this turn
+
+    """
+    __slots__ = ("name", "calls", "seconds", "_depth", "_start")
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0
+        self._depth = 0
+        self._start = 0
+
+    def __enter__(self):
+        if _enabled and threading.current_thread() is _main_thread:
+            self.calls += 1
+            if self._depth == 0:
+                self._start = time.perf_counter()
+            self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._depth and threading.current_thread() is _main_thread:
+            self._depth -= 1
+            if self._depth == 0:
+                self.seconds += time.perf_counter() - self._start
+        return False
+
+    def __call__(self, function):
+        if not _enabled:
+            return function
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            with self:
+                return function(*args, **kwargs)
+        return timed
+
+
+def timer(name):
+    """Gets the timer with a name, creating it on first use
+
+    Args:
+        name: The name the time is recorded under, such as "strategy.defense"
+
+    Returns:
+        A Timer to use as a context manager, with timer("name"): ..., or as a decorator, @timer("name").
+        Decorators only time functions decorated while instrumentation is enabled, so to time the functions of a module
+        set the GAMELIB_INSTRUMENTATION environment variable, or call enable before importing it.
+    """
+    named = _timers.get(name)
+    if named is None:
+        named = _timers[name] = Timer(name)
+    return named
+
+
+def count(name, amount=1):
+    """Adds to a counter of this turn
+
+    Args:
+        name: The name of the counter
+        amount: The amount to add
+
+    """
+    if _enabled:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def is_enabled():
+    """
+        Returns:
+            True if instrumentation is enabled
+    """
+    return _enabled
+
+
+def enable(output=None):
+    """Starts measuring, and times the GameState functions in INSTRUMENTED_FUNCTIONS.
+    Every submit_turn then writes a record of the turn, see turn_record.
+
+    Args:
+        output: A file path to append the records to, a file object to write them to, or None to write them to stderr
+
+    """
+    global _enabled, _output
+    _output = output
+    _enabled = True
+    if not _originals:
+        for function_name, timer_name in INSTRUMENTED_FUNCTIONS.items():
+            _originals[function_name] = getattr(GameState, function_name)
+            setattr(GameState, function_name, timer(timer_name)(_originals[function_name]))
+        timed_submit = GameState.submit_turn
+
+        @functools.wraps(timed_submit)
+        def submit_turn(game_state):
+            timed_submit(game_state)
+            emit(game_state.turn_number)
+        GameState.submit_turn = submit_turn
+
+
+def disable():
+    """Stops measuring and restores the original GameState functions, so instrumentation costs nothing
+    """
+    global _enabled
+    _enabled = False
+    for function_name, function in _originals.items():
+        setattr(GameState, function_name, function)
+    _originals.clear()
+    reset()
+
+
+def reset():
+    """Forgets the measurements of the current turn
+    """
+    for named in _timers.values():
+        named.calls = 0
+        named.seconds = 0
+    _counters.clear()
+
+
+def turn_record(turn_number=None):
+    """
+        Args:
+            turn_number: The turn the measurements belong to
+
+        Returns:
+            A dict with the turn number, a [calls, milliseconds] pair for every timer that ran and the value of every counter
+    """
+    return {
+        "turn": turn_number,
+        "timers": {named.name: [named.calls, round(1000 * named.seconds, 3)] for named in _timers.values() if named.calls},
+        "counters": dict(_counters),
+    }
+
+
+def emit(turn_number=None):
+    """Writes the record of the turn as a line of JSON, then resets the measurements.
+    Called by GameState.submit_turn while instrumentation is enabled.
+
+    Args:
+        turn_number: The turn the measurements belong to
+
+    """
+    line = json.dumps(turn_record(turn_number), separators=(",", ":")) + "\n"
+    reset()
+    if isinstance(_output, str):
+        with open(_output, "a") as output:
+            output.write(line)
+    else:
+        output = sys.stderr if _output is None else _output
+        output.write(line)
+        output.flush()
+
+
+# Set to a file path to append the records to, or to "-" to write them to stderr, before gamelib is imported
+if os.environ.get("GAMELIB_INSTRUMENTATION"):
+    enable(None if os.environ["GAMELIB_INSTRUMENTATION"] == "-" else os.environ["GAMELIB_INSTRUMENTATION"])
@@ -0,0 +1,186 @@
+import os
+import sys
+import atexit
+import threading
+from collections import deque
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+
+class LogBuffer:
+    """Holds the debug output of a turn in memory, so it is written to stderr in one go when the turn is submitted.
+
+    Only the newest max_bytes of messages, counted in UTF-8 bytes, are kept. Older messages are dropped as newer
+    ones arrive, and the number dropped is reported when the buffer is flushed. A forked process, such as an
+    EvaluationPool worker, starts with an empty buffer of its own and must flush it itself.
+
+    Attributes :
+        * max_bytes (int): The most bytes of messages, newlines included, written per flush
+        * dropped (int): The number of messages dropped since the last flush
+
+    """
+    def __init__(self, max_bytes=32 * 1024):
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self.__lines = deque()
+        self.__size = 0
+        self.__lock = threading.Lock()
+
+    def write(self, line):
+        """Adds a line of output
+
+        Args:
+            line: The text to write, without a trailing newline
+
+        """
+        size = len(line.encode("utf-8", "replace")) + 1
+        if size > self.max_bytes:
+            line = line.encode("utf-8", "replace")[:max(self.max_bytes - 1, 0)].decode("utf-8", "ignore")
+            size = len(line.encode("utf-8")) + 1
+        with self.__lock:
+            self.__lines.append((line, size))
+            self.__size += size
+            while self.__size > self.max_bytes:
+                self.__size -= self.__lines.popleft()[1]
+                self.dropped += 1
+
+    def flush(self):
+        """Writes the buffered lines to stderr and empties the buffer
+        """
+        with self.__lock:
+            lines, self.__lines = self.__lines, deque()
+            dropped, self.dropped = self.dropped, 0
+            self.__size = 0
+        if not lines and not dropped:
+            return
+        lines = [line for line, _ in lines]
+        if dropped:
+            lines.insert(0, "({} earlier log messages dropped)".format(dropped))
+        sys.stderr.write("\n".join(lines) + "\n")
+        sys.stderr.flush()
+
+    def _after_fork(self):
+        # The lines belong to the parent, which writes them, and its lock may have been held by another thread
+        self.__lines = deque()
+        self.__size = 0
+        self.dropped = 0
+        self.__lock = threading.Lock()
+
+
+_BUFFER = LogBuffer()
+atexit.register(_BUFFER.flush)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_BUFFER._after_fork)
+
+
+def get_buffer():
+    """
+        Returns:
+            The LogBuffer shared by debug_write and every Logger
+    """
+    return _BUFFER
+
+
+def flush():
+    """Writes out everything logged since the last flush. Called by GameState.submit_turn.
+    """
+    _BUFFER.flush()
+
+
+class Logger:
+    """Writes leveled messages for one module to the shared LogBuffer.
+
+    Messages are written with str.format, and only once the level of the message is known to be enabled,
+    so arguments that are expensive to print cost nothing while their level is disabled:
+
+        log.debug("Chunk: {}", chunk)
+
+    Attributes :
+        * name (str): The name of the module logging
+        * level (int): Messages below this level are ignored. One of DEBUG, INFO, WARNING, ERROR or OFF.
+
+    """
+    def __init__(self, name, level=INFO):
+        self.name = name
+        self.level = level
+
+    def log(self, level, message, *args):
+        """Logs a message
+
+        Args:
+            level: The level of the message
+            message: The message, formatted with args by str.format if any are given
+            args: The values to format into the message
+
+        """
+        if level < self.level:
+            return
+        _BUFFER.write(message.format(*args) if args else str(message))
+
+    def debug(self, message, *args):
+        """Logs a message at the DEBUG level, see log
+        """
+        if self.level > DEBUG:
+            return
+        _BUFFER.write(message.format(*args) if args else str(message))
+
+    def info(self, message, *args):
+        """Logs a message at the INFO level, see log
+        """
+        if self.level > INFO:
+            return
+        _BUFFER.write(message.format(*args) if args else str(message))
+
+    def warning(self, message, *args):
+        """Logs a message at the WARNING level, see log
+        """
+        if self.level > WARNING:
+            return
+        _BUFFER.write(message.format(*args) if args else str(message))
+
+    def error(self, message, *args):
+        """Logs a message at the ERROR level, see log
+        """
+        if self.level > ERROR:
+            return
+        _BUFFER.write(message.format(*args) if args else str(message))
+
+
+_loggers = {}
+_default_level = INFO
+
+
+def get_logger(name):
+    """Gets the logger of a module, creating it on first use
+
+    Args:
+        name: The name of the module, such as "algo_strategy"
+
+    Returns:
+        The Logger of that module
+    """
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers[name] = Logger(name, _default_level)
+    return logger
+
+
+def set_level(level, name=None):
+    """Sets the level of one module, or of every module
+
+    Args:
+        level: DEBUG, INFO, WARNING, ERROR, or OFF to disable logging
+        name: The module to set the level of, or None to set it for every module, including ones not logging yet
+
+    """
+    global _default_level
+    if name is not None:
+        get_logger(name).level = level
+        return
+    _default_level = level
+    for logger in _loggers.values():
+        logger.level = level
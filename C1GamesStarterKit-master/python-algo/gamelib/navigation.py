@@ -1,24 +1,231 @@
-import heapq
-import math
 import sys
-import queue
+import heapq
+import threading
+from array import array
+from collections import deque, OrderedDict
 from .util import debug_write
 
-class Node:
-    """A path-finding node
+ARENA_SIZE = 28
+HALF_ARENA = ARENA_SIZE // 2
+GRID_SIZE = ARENA_SIZE * ARENA_SIZE
+
+
+def _build_grid_tables():
+    """Builds the static lookup tables shared by every ShortestPathFinder.
+
+    Tiles are addressed by a flat index, x * ARENA_SIZE + y.
+
+    Returns:
+        (in_bounds, neighbors, xs, ys, idealness) where neighbors[i] holds the in-bounds
+        neighbors of tile i in the order [x, y + 1], [x, y - 1], [x + 1, y], [x - 1, y] and
+        idealness maps a (dx, dy) edge direction to the idealness of every tile.
+    """
+    in_bounds = bytearray(GRID_SIZE)
+    for y in range(ARENA_SIZE):
+        row_size = y + 1 if y < HALF_ARENA else ARENA_SIZE - y
+        startx = HALF_ARENA - row_size
+        for x in range(startx, startx + 2 * row_size):
+            in_bounds[x * ARENA_SIZE + y] = 1
+
+    neighbors = []
+    for index in range(GRID_SIZE):
+        x, y = divmod(index, ARENA_SIZE)
+        adjacent = []
+        for nx, ny in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+            if 0 <= nx < ARENA_SIZE and 0 <= ny < ARENA_SIZE and in_bounds[nx * ARENA_SIZE + ny]:
+                adjacent.append(nx * ARENA_SIZE + ny)
+        neighbors.append(tuple(adjacent))
+
+    xs = tuple(index // ARENA_SIZE for index in range(GRID_SIZE))
+    ys = tuple(index % ARENA_SIZE for index in range(GRID_SIZE))
+
+    idealness = {}
+    for dx in (-1, 1):
+        for dy in (-1, 1):
+            table = []
+            for index in range(GRID_SIZE):
+                x, y = xs[index], ys[index]
+                value = 28 * y if dy == 1 else 28 * (27 - y)
+                value += x if dx == 1 else (27 - x)
+                table.append(value)
+            idealness[(dx, dy)] = tuple(table)
+
+    return bytes(in_bounds), tuple(neighbors), xs, ys, idealness
+
+
+IN_BOUNDS, NEIGHBORS, XS, YS, IDEALNESS = _build_grid_tables()
+_UNVISITED = array('h', [-1]) * GRID_SIZE
+_CLEAR = bytes(GRID_SIZE)
+
+
+def _repair_added_block(pathlength, blocked, tile):
+    """Updates a distance field in place after a structure was placed on tile.
+
+    Only tiles whose every shortest route ran through tile are reset and searched again.
+    """
+    if pathlength[tile] != 0:
+        pathlength[tile] = -1
+    # Find the tiles that lost all of their shortest routes, in order of distance
+    affected = {tile}
+    current = deque(tile_neighbor for tile_neighbor in NEIGHBORS[tile] if pathlength[tile_neighbor] > 0)
+    while current:
+        location = current.popleft()
+        length = pathlength[location]
+        if location in affected or length <= 0 or blocked[location]:
+            continue
+        supported = False
+        for neighbor in NEIGHBORS[location]:
+            if pathlength[neighbor] == length - 1 and not blocked[neighbor] and neighbor not in affected:
+                supported = True
+                break
+        if supported:
+            continue
+        affected.add(location)
+        for neighbor in NEIGHBORS[location]:
+            if pathlength[neighbor] == length + 1:
+                current.append(neighbor)
+
+    affected.discard(tile)
+    for location in affected:
+        pathlength[location] = -1
+
+    # Search the affected tiles again, starting from the distances around them
+    frontier = []
+    for location in affected:
+        best = -1
+        for neighbor in NEIGHBORS[location]:
+            length = pathlength[neighbor]
+            if length >= 0 and not blocked[neighbor] and (best == -1 or length + 1 < best):
+                best = length + 1
+        if best != -1:
+            frontier.append((best, location))
+    heapq.heapify(frontier)
+    while frontier:
+        length, location = heapq.heappop(frontier)
+        if pathlength[location] != -1:
+            continue
+        pathlength[location] = length
+        for neighbor in NEIGHBORS[location]:
+            if neighbor in affected and pathlength[neighbor] == -1:
+                heapq.heappush(frontier, (length + 1, neighbor))
+
+
+def _repair_removed_block(pathlength, blocked, tile):
+    """Updates a distance field in place after the structure on tile was removed.
+    """
+    if pathlength[tile] != 0:
+        best = -1
+        for neighbor in NEIGHBORS[tile]:
+            length = pathlength[neighbor]
+            if length >= 0 and not blocked[neighbor] and (best == -1 or length + 1 < best):
+                best = length + 1
+        if best == -1:
+            return
+        pathlength[tile] = best
+
+    current = deque((tile,))
+    while current:
+        location = current.popleft()
+        next_pathlength = pathlength[location] + 1
+        for neighbor in NEIGHBORS[location]:
+            if blocked[neighbor]:
+                continue
+            length = pathlength[neighbor]
+            if length == -1 or length > next_pathlength:
+                pathlength[neighbor] = next_pathlength
+                current.append(neighbor)
+
+
+class DistanceFieldCache:
+    """Caches validated distance fields keyed by the blocked mask and the tiles the search started from.
+
+    When no field is cached for a mask, but one of the latest fields for the same start tiles was computed
+    on a board that differs by a single structure, that field is repaired instead of searching from scratch.
 
     Attributes :
-        * visited_idealness (bool): Have we visited this node during the idealness search step?
-        * visited_validate (bool): Have we visited this node during the validation step?
-        * blocked (bool): Is there a structures at this node's location
-        * pathlength: The distance between this node and the target location
+        * max_size (int): The number of fields to keep
+        * hits (int): Lookups answered from the cache
+        * repairs (int): Lookups answered by repairing a field
+        * misses (int): Lookups that needed a full search
 
     """
-    def __init__(self):
-        self.visited_idealness = False
-        self.visited_validate = False
-        self.blocked = False
-        self.pathlength = -1
+    def __init__(self, max_size=256, recent_size=8):
+        self.max_size = max_size
+        self.recent_size = recent_size
+        self.hits = 0
+        self.repairs = 0
+        self.misses = 0
+        self._fields = OrderedDict()
+        self._recent = {}
+        # Fields may be looked up from a background thread, see speculation.py
+        self._lock = threading.Lock()
+
+    def get(self, blocked, seeds, compute):
+        """Gets the distance field for a board
+
+        Args:
+            * blocked: The blocked mask of the board, as bytes
+            * seeds: A frozenset of the tile indices the search starts from
+            * compute: Called with no arguments to search from scratch on a miss
+
+        Returns:
+            The distance field, which must not be modified
+        """
+        with self._lock:
+            return self.__get(blocked, seeds, compute)
+
+    def __get(self, blocked, seeds, compute):
+        key = (blocked, seeds)
+        field = self._fields.get(key)
+        if field is not None:
+            self._fields.move_to_end(key)
+            self.hits += 1
+            return field
+
+        mask = int.from_bytes(blocked, 'big')
+        recent = self._recent.get(seeds)
+        if recent is None:
+            recent = self._recent[seeds] = deque(maxlen=self.recent_size)
+        for entry in reversed(recent):
+            changed = entry[0] ^ mask
+            if not changed:
+                # The field of this board was evicted from the cache, but is still one of the latest
+                field = entry[1]
+                self.hits += 1
+                recent.remove(entry)
+                break
+            # Masks hold one byte per tile, so a single set bit means a single changed tile
+            if not changed & (changed - 1):
+                tile = GRID_SIZE - 1 - (changed.bit_length() - 1) // 8
+                field = array('h', entry[1])
+                if blocked[tile]:
+                    _repair_added_block(field, blocked, tile)
+                else:
+                    _repair_removed_block(field, blocked, tile)
+                self.repairs += 1
+                # Keep the base board of a what-if search around while its variations come and go
+                recent.remove(entry)
+                recent.append(entry)
+                break
+        if field is None:
+            field = compute()
+            self.misses += 1
+
+        self._fields[key] = field
+        if len(self._fields) > self.max_size:
+            self._fields.popitem(last=False)
+        recent.append((mask, field))
+        return field
+
+    def clear(self):
+        """Forgets every cached field
+        """
+        with self._lock:
+            self._fields.clear()
+            self._recent.clear()
+
+
+_FIELD_CACHE = DistanceFieldCache()
 
 """
 This class helps with pathfinding. We guarantee the results will
@@ -28,18 +235,31 @@ code to maximise time efficiency
 class ShortestPathFinder:
     """Handles path-finding
 
+    Search state lives in flat, preallocated arrays indexed by x * 28 + y, so a
+    query only needs a bulk reset of each array instead of allocating a grid of nodes.
+
     Attributes :
         * HORIZONTAL (int): A constant representing a horizontal movement
         * VERTICAL (int): A constant representing a vertical movement
 
         * game_state (:obj: GameState): The current gamestate
-        * game_map (:obj: GameMap): The current gamemap
+        * blocked (bytearray): 1 for every tile holding a structure
+        * pathlength (array): The distance between each tile and the target location, -1 if unreached
+        * field_cache (:obj: DistanceFieldCache): Distance fields from earlier searches. Shared by every
+          path finder unless one is passed in, as fields are keyed by the full board layout.
 
     """
-    def __init__(self):
+    def __init__(self, field_cache=None):
         self.HORIZONTAL = 1
         self.VERTICAL = 2
         self.initialized = False
+        self.field_cache = _FIELD_CACHE if field_cache is None else field_cache
+        self.game_state = None
+        self.blocked = bytearray(GRID_SIZE)
+        self.pathlength = array('h', _UNVISITED)
+        self._visited = bytearray(GRID_SIZE)
+        self._end_set = frozenset()
+        self._direction = (1, 1)
 
     def initialize_map(self, game_state):
         """Initializes the map
@@ -47,10 +267,16 @@ class ShortestPathFinder:
         Args:
             game_state: A GameState object representing the gamestate we want to traverse
         """
-        #Initialize map 
+        #Initialize map
         self.initialized = True
         self.game_state = game_state
-        self.game_map = [[Node() for x in range(self.game_state.ARENA_SIZE)] for y in range(self.game_state.ARENA_SIZE)]
+        self.pathlength[:] = _UNVISITED
+        self._fill_blocked(game_state)
+
+    def _fill_blocked(self, game_state):
+        """Marks every tile holding a structure as blocked
+        """
+        self.blocked[:] = game_state.game_map.get_blocked_mask()
 
     def navigate_multiple_endpoints(self, start_point, end_points, game_state):
         """Finds the path a unit would take to reach a set of endpoints
@@ -68,223 +294,229 @@ class ShortestPathFinder:
         if game_state.contains_stationary_unit(start_point):
             return
 
-        #Initialize map 
+        #Initialize map
         self.initialize_map(game_state)
-        #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
+        self._set_endpoints(end_points)
         #Do pathfinding
-        ideal_endpoints = self._idealness_search(start_point, end_points)
-        self._validate(ideal_endpoints, end_points)
+        start = int(start_point[0]) * ARENA_SIZE + int(start_point[1])
+        ideal_tile = self._idealness_search(start, end_points)
+        self.pathlength[:] = self._distance_field(ideal_tile, end_points)
         return self._get_path(start_point, end_points)
 
+    def navigate_from_starts(self, start_points, end_points):
+        """Finds the paths units at several start points would take to reach the same set of endpoints
+
+        Uses the map loaded by the last call to initialize_map, so the obstacle mask is only built once.
+        Starts that share a pocket of pathable space share the idealness search, and starts that share
+        the same ideal endpoints share a single distance field.
+
+        Args:
+            * start_points: The starting locations of the units, none of which may be blocked
+            * end_points: The end points of the units, should be a list of edge locations
+
+        Returns:
+            A list with the path for each start point, in the same order as start_points
+
+        """
+        self._set_endpoints(end_points)
+        starts = [int(x) * ARENA_SIZE + int(y) for x, y in start_points]
+
+        ideal_tiles = [None] * len(starts)
+        for i, start in enumerate(starts):
+            if ideal_tiles[i] is not None:
+                continue
+            ideal_tile = self._idealness_search(start, end_points)
+            # Every later start reached by this search is in the same pocket
+            for j in range(i, len(starts)):
+                if ideal_tiles[j] is None and self._visited[starts[j]]:
+                    ideal_tiles[j] = ideal_tile
+
+        paths = []
+        for start_point, ideal_tile in zip(start_points, ideal_tiles):
+            field = self._distance_field(ideal_tile, end_points)
+            paths.append(self._get_path(start_point, end_points, field))
+        return paths
+
+    def _distance_field(self, ideal_tile, end_points):
+        """Gets the validated distance field for an ideal tile from the cache, searching on a miss
+        """
+        seeds = self._end_set if ideal_tile in self._end_set else frozenset((ideal_tile,))
+        return self.field_cache.get(bytes(self.blocked), seeds,
+                lambda: self._validate(ideal_tile, end_points, array('h', _UNVISITED)))
+
+    def _set_endpoints(self, end_points):
+        """Caches the endpoint indices and edge direction used by the search steps
+        """
+        self._end_set = frozenset(int(x) * ARENA_SIZE + int(y) for x, y in end_points)
+        self._direction = self._get_direction_from_endpoints(end_points)
+
     def _idealness_search(self, start, end_points):
         """
-        Finds the most ideal tile in our 'pocket' of pathable space. 
+        Finds the most ideal tile in our 'pocket' of pathable space.
         The edge if it is available, or the best self destruct location otherwise
         """
-        current = queue.Queue()
-        current.put(start)
-        best_idealness = self._get_idealness(start, end_points)
-        self.game_map[start[0]][start[1]].visited_idealness = True
+        blocked = self.blocked
+        visited = self._visited
+        visited[:] = _CLEAR
+        end_set = self._end_set
+        idealness = IDEALNESS[self._direction]
+
+        current = deque((start,))
+        best_idealness = sys.maxsize if start in end_set else idealness[start]
+        visited[start] = 1
         most_ideal = start
 
-        while not current.empty():
-            search_location = current.get()
-            for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        while current:
+            search_location = current.popleft()
+            for neighbor in NEIGHBORS[search_location]:
+                # A tile we have already seen can never beat the best idealness found so far
+                if blocked[neighbor] or visited[neighbor]:
                     continue
 
-                x, y = neighbor
-                current_idealness = self._get_idealness(neighbor, end_points)
-
+                current_idealness = sys.maxsize if neighbor in end_set else idealness[neighbor]
                 if current_idealness > best_idealness:
                     best_idealness = current_idealness
                     most_ideal = neighbor
 
-                if not self.game_map[x][y].visited_idealness and not self.game_map[x][y].blocked:
-                    self.game_map[x][y].visited_idealness = True
-                    current.put(neighbor)
+                visited[neighbor] = 1
+                current.append(neighbor)
 
         return most_ideal
 
-    def _get_neighbors(self, location):
-        """Get the locations adjacent to a location
-        """
-        x, y = location
-        return [[x, y + 1], [x, y - 1], [x + 1, y], [x - 1, y]]
-
     def _get_direction_from_endpoints(self, end_points):
         """Prints a message to the games debug output
 
         Args:
-            * end_points: A set of endpoints, should be an edge 
+            * end_points: A set of endpoints, should be an edge
 
         Returns:
-            A direction [x,y] representing the edge. For example, [1,1] for the top right and [-1, 1] for the top left
+            A direction (x, y) representing the edge. For example, (1, 1) for the top right and (-1, 1) for the top left
 
         """
-        point = end_points[0]
-        x, y = point
-        direction = [1, 1]
-        if x < self.game_state.HALF_ARENA:
-           direction[0] = -1
-        if y < self.game_state.HALF_ARENA:
-            direction[1] = -1
-        return direction
-
-    def _get_idealness(self, location, end_points):
-        """Get the idealness of a tile, the reachable tile the unit most wants to path to.
-        Better self destruct locations are more ideal. The endpoints are perfectly ideal. 
-
-        Returns:
-            A location the unit will attempt to reach
-        """
-        if location in end_points:
-            return sys.maxsize
+        x, y = end_points[0]
+        return (-1 if x < HALF_ARENA else 1, -1 if y < HALF_ARENA else 1)
 
-        direction = self._get_direction_from_endpoints(end_points)
+    def _validate(self, ideal_tile, end_points, pathlength=None):
+        """Breadth first search of the grid, setting the pathlengths of each tile
 
-        idealness = 0
-        if direction[1] == 1:
-            idealness += 28 * location[1]
-        else: 
-            idealness += 28 * (27 - location[1])
-        if direction[0] == 1:
-            idealness += location[0]
-        else: 
-            idealness += (27 - location[0])
-
-        return idealness
-
-    def _validate(self, ideal_tile, end_points):
-        """Breadth first search of the grid, setting the pathlengths of each node
+        Args:
+            * ideal_tile: The index of the tile found by _idealness_search
+            * end_points: The end points of the unit
+            * pathlength: The array to fill in, self.pathlength if None
 
         """
-        #VALIDATION
+        if pathlength is None:
+            pathlength = self.pathlength
+        pathlength[:] = _UNVISITED
+        blocked = self.blocked
+
         #Add our most ideal tiles to current
-        current = queue.Queue()
-        if ideal_tile in end_points:
-            for location in end_points:
-               current.put(location)
-               #Set current pathlength to 0
-               self.game_map[location[0]][location[1]].pathlength = 0
-               self.game_map[location[0]][location[1]].visited_validate = True
+        if ideal_tile in self._end_set:
+            current = deque(int(x) * ARENA_SIZE + int(y) for x, y in end_points)
         else:
-            current.put(ideal_tile)
-            self.game_map[ideal_tile[0]][ideal_tile[1]].pathlength = 0
-            self.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
+            current = deque((ideal_tile,))
+        for location in current:
+            pathlength[location] = 0
 
         #While current is not empty
-        while not current.empty():
-            current_location = current.get()
-            current_node = self.game_map[current_location[0]][current_location[1]]
-            for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        while current:
+            current_location = current.popleft()
+            # Blocked endpoints are still targets but cannot be walked through
+            if blocked[current_location]:
+                continue
+            next_pathlength = pathlength[current_location] + 1
+            for neighbor in NEIGHBORS[current_location]:
+                if blocked[neighbor] or pathlength[neighbor] != -1:
                     continue
+                pathlength[neighbor] = next_pathlength
+                current.append(neighbor)
+        return pathlength
 
-                neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
-                if not neighbor_node.visited_validate and not current_node.blocked:
-                    neighbor_node.pathlength = current_node.pathlength + 1
-                    neighbor_node.visited_validate = True
-                    current.put(neighbor)
-
-        #debug_write("Print after validate")
-        #self.print_map()
-        return
-
-    def _get_path(self, start_point, end_points):
-        """Once all nodes are validated, and a target is found, the unit can path to its target
+    def _get_path(self, start_point, end_points, pathlength=None):
+        """Once all tiles are validated, and a target is found, the unit can path to its target
 
         """
+        if pathlength is None:
+            pathlength = self.pathlength
         #GET THE PATH
         path = [start_point]
-        current = start_point
+        current = int(start_point[0]) * ARENA_SIZE + int(start_point[1])
         move_direction = 0
 
-        while not self.game_map[current[0]][current[1]].pathlength == 0:
-            #debug_write("current tile {} has cost {}".format(current, self.game_map[current[0]][current[1]].pathlength))
-            next_move = self._choose_next_move(current, move_direction, end_points)
-            #debug_write(next_move)
+        while not pathlength[current] == 0:
+            next_move = self._choose_next_move(current, move_direction, end_points, pathlength)
 
-            if current[0] == next_move[0]:
+            if XS[current] == XS[next_move]:
                 move_direction = self.VERTICAL
             else:
                 move_direction = self.HORIZONTAL
-            path.append(next_move)
+            path.append([XS[next_move], YS[next_move]])
             current = next_move
-        
-        #debug_write(path)
+
         return path
-  
-    def _choose_next_move(self, current_point, previous_move_direction, end_points):
+
+    def _choose_next_move(self, current_point, previous_move_direction, end_points, pathlength=None):
         """Given the current location and adjacent locations, return the best 'next step' for a given unit to take
         """
-        neighbors = self._get_neighbors(current_point)
-        #debug_write("Unit at {} previously moved {} and has these neighbors {}".format(current_point, previous_move_direction, neighbors))
+        if pathlength is None:
+            pathlength = self.pathlength
+        blocked = self.blocked
 
         ideal_neighbor = current_point
-        best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
-        for neighbor in neighbors:
-            #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        best_pathlength = pathlength[current_point]
+        for neighbor in NEIGHBORS[current_point]:
+            if blocked[neighbor]:
                 continue
 
-            new_best = False
-            x, y = neighbor
-            current_pathlength = self.game_map[x][y].pathlength
+            current_pathlength = pathlength[neighbor]
 
             #Filter by pathlength
             if current_pathlength > best_pathlength:
                 continue
-            elif current_pathlength < best_pathlength:
-                #debug_write("Contender has better pathlength at {} vs champs {}".format(current_pathlength, best_pathlength))
-                new_best = True
-
             #Filter by direction based on prev move
-            if not new_best and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, end_points):
+            if current_pathlength == best_pathlength and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, end_points):
                 continue
 
             ideal_neighbor = neighbor
             best_pathlength = current_pathlength
 
-        #debug_write("Gave unit at {} new tile {}".format(current_point, ideal_neighbor))
         return ideal_neighbor
 
     def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, end_points):
         """Compare two tiles and return True if the unit would rather move to the new one
 
         """
+        prev_x, prev_y = XS[prev_tile], YS[prev_tile]
+        new_x, new_y = XS[new_tile], YS[new_tile]
+        best_x, best_y = XS[prev_best], YS[prev_best]
         #True if we are moving in a different direction than prev move and prev is not
         #If we previously moved horizontal, and now one of our options has a different x position then the other (the two options are not up/down)
-        if previous_move_direction == self.HORIZONTAL and not new_tile[0] == prev_best[0]:
+        if previous_move_direction == self.HORIZONTAL and not new_x == best_x:
             #We want to go up now. If we have not changed our y, we are not going up
-            if prev_tile[1] == new_tile[1]:
-                return False 
+            if prev_y == new_y:
+                return False
             return True
-        if previous_move_direction == self.VERTICAL and not new_tile[1] == prev_best[1]:
-            if prev_tile[0] == new_tile[0]:
-                #debug_write("contender {} has the same x coord as prev tile {} so we will keep best move {}".format(new_tile, prev_tile, prev_best))
+        if previous_move_direction == self.VERTICAL and not new_y == best_y:
+            if prev_x == new_x:
                 return False
             return True
-        if previous_move_direction == 0: 
-            if prev_tile[1] == new_tile[1]: 
+        if previous_move_direction == 0:
+            if prev_y == new_y:
                 return False
             return True
-        
-        #To make it here, both moves are on the same axis 
-        direction = self._get_direction_from_endpoints(end_points)
-        if new_tile[1] == prev_best[1]: #If they both moved horizontal...
-            if direction[0] == 1 and new_tile[0] > prev_best[0]: #If we moved right and right is our direction, we moved towards our direction
-                return True 
-            if direction[0] == -1 and new_tile[0] < prev_best[0]: #If we moved left and left is our direction, we moved towards our direction
-                return True 
-            return False 
-        if new_tile[0] == prev_best[0]: #If they both moved vertical...
-            if direction[1] == 1 and new_tile[1] > prev_best[1]: #If we moved up and up is our direction, we moved towards our direction
+
+        #To make it here, both moves are on the same axis
+        direction = self._direction
+        if new_y == best_y: #If they both moved horizontal...
+            if direction[0] == 1 and new_x > best_x: #If we moved right and right is our direction, we moved towards our direction
+                return True
+            if direction[0] == -1 and new_x < best_x: #If we moved left and left is our direction, we moved towards our direction
+                return True
+            return False
+        if new_x == best_x: #If they both moved vertical...
+            if direction[1] == 1 and new_y > best_y: #If we moved up and up is our direction, we moved towards our direction
                 return True
-            if direction[1] == -1 and new_tile[1] < prev_best[1]: #If we moved down and down is our direction, we moved towards our direction
+            if direction[1] == -1 and new_y < best_y: #If we moved down and down is our direction, we moved towards our direction
                 return True
             return False
         return True
@@ -299,9 +531,9 @@ class ShortestPathFinder:
 
         for y in range(28):
             for x in range(28):
-                node = self.game_map[x][28 - y - 1]
-                if not node.blocked and not node.pathlength == -1:
-                    self._print_justified(node.pathlength)
+                index = x * ARENA_SIZE + (28 - y - 1)
+                if not self.blocked[index] and not self.pathlength[index] == -1:
+                    self._print_justified(self.pathlength[index])
                 else:
                     sys.stderr.write("   ")
             debug_write("")
@@ -313,4 +545,4 @@ class ShortestPathFinder:
         if number < 10 and number > -1:
             sys.stderr.write(" ")
         sys.stderr.write(str(number))
-        sys.stderr.write(" ")
\ No newline at end of file
+        sys.stderr.write(" ")
@@ -0,0 +1,118 @@
+class Region:
+    """A fixed area of the board, compiled once from the corners of a convex polygon into the locations it covers.
+
+    Regions are meant to be defined once, for example in on_game_start, and then scored every turn
+    with GameState.get_region_score.
+
+    Attributes :
+        * name (str): A name for the region
+        * vertices (list): The [x, y] corners of the polygon, in order around it
+        * tiles (tuple): The (x, y) locations inside the polygon, ordered by x then y
+        * tile_set (frozenset): The same locations, for membership tests
+
+    """
+    def __init__(self, name, vertices, arena_size=28):
+        """Finds the locations inside a polygon
+
+        Args:
+            name: A name for the region
+            vertices: The [x, y] corners of the polygon, in order around it. A location is inside when it lies
+                strictly on the same side of every edge, as with BoardArrays.polygon_mask.
+            arena_size: The size of the arena
+
+        """
+        self.name = name
+        self.vertices = [list(vertex) for vertex in vertices]
+        edges = [(vertices[i], vertices[(i + 1) % len(vertices)]) for i in range(len(vertices))]
+        tiles = []
+        for x in range(arena_size):
+            for y in range(arena_size):
+                sides = [(x - x2) * (y1 - y2) - (x1 - x2) * (y - y2) < 0.0 for (x1, y1), (x2, y2) in edges]
+                if all(side == sides[0] for side in sides):
+                    tiles.append((x, y))
+        self.tiles = tuple(tiles)
+        self.tile_set = frozenset(tiles)
+
+    def __repr__(self):
+        return "Region({}, {} tiles)".format(self.name, len(self.tiles))
+
+
+class RegionScores:
+    """Keeps the score of regions of a GameMap, summed over the units inside them, up to date as the map changes.
+
+    The score of every location inside a region is remembered. When units are added, removed or upgraded
+    through GameMap functions, only the changed locations are scored again, and the difference is added to
+    the totals of the regions holding them, so getting a score costs time in the number of changed locations.
+    Totals are kept as float sums, so they may differ from a fresh sum by rounding when scores are not integers.
+    Code that changes the health of units directly must call clear afterwards.
+    Use GameMap.get_region_scores to get the one belonging to a map and a scoring function.
+
+    Attributes :
+        * game_map (:obj: GameMap): The map being scored
+        * score (function): Gives the contribution of a GameUnit to the score of its region
+
+    """
+    def __init__(self, game_map, score):
+        self.game_map = game_map
+        self.score = score
+        self.__totals = {}
+        self.__tile_scores = {}
+        # The regions containing each location, for the regions scored so far
+        self.__regions_at = {}
+        # Locations inside scored regions that changed since the totals were last brought up to date
+        self.__changed = set()
+
+    def update_location(self, x, y):
+        """Marks a location as changed. Called by GameMap whenever its units change.
+
+        Args:
+            x: The x coordinate of the changed location
+            y: The y coordinate of the changed location
+
+        """
+        if (x, y) in self.__regions_at:
+            self.__changed.add((x, y))
+
+    def clear(self):
+        """Scores every location again. Call it after changing the health of units directly.
+        """
+        self.__changed.update(self.__regions_at)
+
+    def __score_tile(self, location):
+        score = self.score
+        return sum(score(unit) for unit in self.game_map[location])
+
+    def get_score(self, region):
+        """Gets the score of a region
+
+        Args:
+            region: A Region
+
+        Returns:
+            The sum of the scores of the units inside the region
+        """
+        totals = self.__totals
+        if self.__changed:
+            tile_scores = self.__tile_scores
+            for location in self.__changed:
+                tile_score = self.__score_tile(location)
+                delta = tile_score - tile_scores[location]
+                if delta:
+                    tile_scores[location] = tile_score
+                    for other in self.__regions_at[location]:
+                        totals[other] += delta
+            self.__changed.clear()
+        total = totals.get(region)
+        if total is not None:
+            return total
+        total = 0
+        game_map = self.game_map
+        for location in region.tiles:
+            if not game_map.in_arena_bounds(location):
+                continue
+            self.__regions_at.setdefault(location, []).append(region)
+            if location not in self.__tile_scores:
+                self.__tile_scores[location] = self.__score_tile(location)
+            total += self.__tile_scores[location]
+        totals[region] = total
+        return total
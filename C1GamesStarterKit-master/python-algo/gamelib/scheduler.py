@@ -0,0 +1,154 @@
+import time
+import heapq
+import types
+import traceback
+
+from .util import debug_write
+from . import log
+
+_log = log.get_logger("scheduler")
+
+
+class TurnScheduler:
+    """Runs the analysis of a turn within a time budget, keeping the best plan found so far.
+
+    Tasks are run one at a time, highest priority first, until they are all done or the budget runs out.
+    A task is called with the scheduler. It can be a plain function, which always runs to completion,
+    or a generator function, which is stopped at its next yield once the budget runs out.
+    Tasks offer plans with propose, or by yielding a (plan, score) pair, and may add further tasks.
+
+    A plan is a GameState holding the commands to submit, usually a fork of the turn's state, and is not changed
+    once proposed. Until a plan is proposed, the best plan is the turn's state itself.
+
+    A task that raises an exception is logged as an error and the remaining tasks still run. Its changes are
+    not submitted: the best plan stays the last one proposed, or the turn's state without the commands tasks
+    added to it, and submit raises the exception once the turn is submitted.
+
+    Attributes :
+        * DEFAULT_BUDGET_FRACTION (float): The share of the config's waitTimeBotSoft used when no budget is given
+        * game_state (:obj: GameState): The state of this turn
+        * start_time (float): The time.perf_counter() time the turn started at
+        * deadline (float): The time.perf_counter() time at which tasks stop being run
+        * best_plan (:obj: GameState): The best plan proposed so far
+        * best_score (float): The score of best_plan, None if no plan was proposed
+        * task_times (dict): The seconds each task has run for, by task name
+        * skipped (list): The names of the tasks that did not get to run or finish before the deadline
+        * errors (list): A (name, exception) pair for each task that raised an exception
+
+    """
+    DEFAULT_BUDGET_FRACTION = 0.8
+
+    def __init__(self, game_state, budget=None, start_time=None):
+        """Sets up the schedule of a turn
+
+        Args:
+            game_state: The GameState of this turn
+            budget: The seconds available for the turn. Defaults to a share of the config's waitTimeBotSoft.
+            start_time: The time.perf_counter() time the turn started at. Defaults to now.
+
+        """
+        self.game_state = game_state
+        if budget is None:
+            soft_limit = game_state.config.get("timingAndReplay", {}).get("waitTimeBotSoft", 5000)
+            budget = soft_limit / 1000 * self.DEFAULT_BUDGET_FRACTION
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        self.deadline = self.start_time + budget
+        self.best_plan = game_state
+        self.best_score = None
+        self.task_times = {}
+        self.skipped = []
+        self.errors = []
+        self.__commands = (len(game_state._build_stack), len(game_state._deploy_stack))
+        self.__tasks = []
+        self.__added = 0
+
+    def time_left(self):
+        """
+            Returns:
+                The seconds left before the deadline, negative once it has passed
+        """
+        return self.deadline - time.perf_counter()
+
+    def add_task(self, task, priority=0, name=None):
+        """Schedules a task
+
+        Args:
+            task: A function or generator function taking the scheduler
+            priority: Tasks with higher priorities run first. Tasks with equal priorities run in the order they were added.
+            name: The name its time is recorded under in task_times. Defaults to the name of the function.
+
+        """
+        if name is None:
+            name = getattr(task, "__name__", repr(task))
+        heapq.heappush(self.__tasks, (-priority, self.__added, name, task))
+        self.__added += 1
+
+    def propose(self, plan, score):
+        """Offers a plan, which becomes the best plan if it scores higher than the current one
+
+        Args:
+            plan: A GameState holding the commands to submit
+            score: How good the plan is, higher is better
+
+        Returns:
+            True if the plan is now the best plan
+        """
+        if self.best_score is None or score > self.best_score:
+            self.best_plan = plan
+            self.best_score = score
+            return True
+        return False
+
+    def run(self):
+        """Runs tasks until they are all done or the deadline passes
+
+        Returns:
+            The best plan
+        """
+        while self.__tasks:
+            _, _, name, task = heapq.heappop(self.__tasks)
+            if self.time_left() <= 0:
+                self.skipped.append(name)
+                continue
+            started = time.perf_counter()
+            try:
+                result = task(self)
+                if isinstance(result, types.GeneratorType):
+                    for proposal in result:
+                        if proposal is not None:
+                            self.propose(*proposal)
+                        if self.time_left() <= 0:
+                            result.close()
+                            self.skipped.append(name)
+                            break
+            except Exception as error:
+                self.errors.append((name, error))
+                _log.error("Task {} failed:\n{}", name, traceback.format_exc())
+                if self.best_plan is self.game_state:
+                    # The task may have added commands to the turn's state before failing
+                    self.best_plan = self.game_state.fork()
+                    del self.best_plan._build_stack[self.__commands[0]:]
+                    del self.best_plan._deploy_stack[self.__commands[1]:]
+            self.task_times[name] = self.task_times.get(name, 0) + time.perf_counter() - started
+        return self.best_plan
+
+    def submit(self):
+        """Runs the remaining tasks and submits the best plan as this turn. If a task failed, its exception is raised
+        once the plan is submitted.
+
+        Returns:
+            The plan that was submitted
+        """
+        plan = self.run()
+        plan.submit_turn()
+        if self.errors:
+            raise self.errors[0][1]
+        return plan
+
+    def report(self):
+        """Prints the time each task took and the tasks that were cut short
+        """
+        for name, seconds in sorted(self.task_times.items(), key=lambda item: -item[1]):
+            debug_write("{}: {:.1f} ms".format(name, 1000 * seconds))
+        if self.skipped:
+            debug_write("Out of time before finishing: {}".format(", ".join(self.skipped)))
@@ -0,0 +1,320 @@
+import math
+
+from .unit import GameUnit
+
+
+class SimulationResult:
+    """The outcome of an action phase simulated by a Simulator.
+    Lists with two entries are indexed by player, 0 for you 1 for the enemy.
+
+    Attributes :
+        * game_state (:obj: GameState): The simulated state after the action phase
+        * frames (int): The number of frames simulated
+        * breaches (list): An (x, y, unit_type, player_index) tuple for every unit that scored, in the order they scored
+        * player_damage ([float, float]): The damage each player dealt to the other's health by scoring
+        * structure_damage ([float, float]): The damage each player dealt to enemy structures
+        * structures_destroyed (list): The structures destroyed, in the order they were removed
+        * structure_points_destroyed ([float, float]): The SP cost of the enemy structures each player destroyed
+        * mobile_units_lost ([int, int]): The number of mobile units each player lost without scoring
+
+    """
+    def __init__(self, game_state):
+        self.game_state = game_state
+        self.frames = 0
+        self.breaches = []
+        self.player_damage = [0, 0]
+        self.structure_damage = [0, 0]
+        self.structures_destroyed = []
+        self.structure_points_destroyed = [0, 0]
+        self.mobile_units_lost = [0, 0]
+
+
+class _Walker:
+    __slots__ = ("unit", "edge", "path", "index", "frames_per_move", "wait", "steps", "shielded_by")
+
+    def __init__(self, unit, edge):
+        self.unit = unit
+        self.edge = edge
+        self.path = None
+        self.index = 0
+        self.frames_per_move = max(1, round(1 / unit.speed)) if unit.speed > 0 else 0
+        self.wait = self.frames_per_move
+        self.steps = 0
+        self.shielded_by = set()
+
+
+class Simulator:
+    """Simulates the action phase of a turn frame by frame.
+
+    The simulation runs on a fork of the given state with its own copies of the units, so the state
+    passed in is never changed. Every mobile unit on its board takes part, along with any added by add_unit.
+    Each frame:
+        1. Supports shield every friendly mobile unit that comes into their range, once per unit
+        2. Mobile units take a step along their path when their speed allows. A unit at the end of its path
+           scores if it is on its target edge and self destructs otherwise
+        3. Mobile units, then structures, attack the target GameState.get_target chooses for them. Units destroyed
+           by an attack are taken off the board at once, so later attacks of the frame choose another target
+        4. Units with no health left are removed, and paths are recomputed if a structure was destroyed
+
+    The rules follow the game documentation, but the results are an estimate and may differ from the engine's.
+
+    Attributes :
+        * game_state (:obj: GameState): The simulated state
+        * frame (int): The number of frames simulated so far
+        * record_events (bool): If true, the events of each frame are kept in events
+        * events (list): The events of the last frame simulated, as (event_type, unit, value) tuples. The event type is
+          "breach" with the damage dealt, "damage" with the damage taken, "selfDestruct" with None, or "death" with None
+
+    """
+    def __init__(self, game_state, record_events=False):
+        """Sets up a simulation of the action phase following a state
+
+        Args:
+            game_state: The state at the start of the action phase, usually after deploying units on a fork
+            record_events: If true, the events of each frame are kept in events, as a game engine would report them
+
+        """
+        self.game_state = game_state.fork(share_units=False)
+        self.frame = 0
+        self.record_events = record_events
+        self.events = []
+        self.__config = game_state.config
+        self.__type_config = {unit["shorthand"]: unit for unit in self.__config["unitInformation"]}
+        self.__hit_radius = self.__config["unitInformation"][0]['getHitRadius']
+        self.__result = SimulationResult(self.game_state)
+        self.__walkers = []
+        self.__structures = []
+        self.__paths_changed = True
+        # Health is changed directly, so remembered targets are forgotten after every change
+        self.__targeting = self.game_state.game_map.get_targeting()
+
+        for unit in self.game_state.game_map.get_all_units():
+            if unit.stationary:
+                self.__structures.append(unit)
+            else:
+                self.__add_walker(unit)
+
+    def __add_walker(self, unit):
+        edge = self.game_state.get_target_edge([unit.x, unit.y])
+        self.__walkers.append(_Walker(unit, edge))
+        self.__paths_changed = True
+
+    def add_unit(self, unit_type, location, num=1, player_index=0):
+        """Adds mobile units to the simulated board, as if they had just been deployed. No resources are spent.
+
+        Args:
+            unit_type: The type of the units
+            location: The location to deploy the units at
+            num: The number of units to deploy
+            player_index: The index corresponding to the player controlling the units, 0 for you 1 for the enemy
+
+        """
+        x, y = location
+        for _ in range(num):
+            unit = GameUnit(unit_type, self.__config, player_index, None, x, y)
+            self.game_state.game_map.place_unit(unit)
+            self.__add_walker(unit)
+
+    def run(self, max_frames=1000):
+        """Simulates frames until every mobile unit has scored or been destroyed
+
+        Args:
+            max_frames: The most frames to simulate
+
+        Returns:
+            The SimulationResult of the action phase
+        """
+        while self.__walkers and self.frame < max_frames:
+            self.step()
+        self.__result.frames = self.frame
+        return self.__result
+
+    @property
+    def running(self):
+        """True while mobile units remain on the board"""
+        return bool(self.__walkers)
+
+    def step(self):
+        """Simulates a single frame
+        """
+        self.frame += 1
+        self.events = []
+        if self.__paths_changed:
+            self.__update_paths()
+        self.__shield()
+        self.__move()
+        self.__attack()
+        self.__remove_destroyed()
+
+    def __update_paths(self):
+        by_edge = {}
+        for walker in self.__walkers:
+            by_edge.setdefault(walker.edge, {})[walker.unit.x, walker.unit.y] = None
+        paths = {}
+        for edge, starts in by_edge.items():
+            for start, path in self.game_state.find_paths_to_edges([list(start) for start in starts], edge).items():
+                paths[edge, start] = path
+        for walker in self.__walkers:
+            walker.path = paths[walker.edge, (walker.unit.x, walker.unit.y)]
+            walker.index = 0
+        self.__paths_changed = False
+
+    def __shield(self):
+        for support in self.__structures:
+            if support.shieldPerUnit <= 0 or support.health <= 0:
+                continue
+            reach = support.shieldRange + self.__hit_radius
+            bonus_y = support.y if support.player_index == 0 else self.game_state.ARENA_SIZE - 1 - support.y
+            shield = support.shieldPerUnit + support.shieldBonusPerY * bonus_y
+            for walker in self.__walkers:
+                unit = walker.unit
+                if unit.player_index != support.player_index or id(support) in walker.shielded_by:
+                    continue
+                if math.sqrt((unit.x - support.x)**2 + (unit.y - support.y)**2) < reach:
+                    unit.health += shield
+                    walker.shielded_by.add(id(support))
+                    self.__targeting.clear()
+
+    def __move(self):
+        game_map = self.game_state.game_map
+        remaining = []
+        # Units leaving and entering each location, applied once per location after every unit has moved
+        leaving = {}
+        entering = {}
+        for walker in self.__walkers:
+            unit = walker.unit
+            walker.wait -= 1
+            if walker.wait > 0 or walker.frames_per_move == 0:
+                remaining.append(walker)
+                continue
+            walker.wait = walker.frames_per_move
+
+            location = (unit.x, unit.y)
+            leaving.setdefault(location, set()).add(id(unit))
+            if walker.path is None or walker.index >= len(walker.path) - 1:
+                if location in game_map.get_edge_location_set(walker.edge):
+                    self.__breach(unit)
+                else:
+                    self.__self_destruct(walker)
+                continue
+
+            walker.index += 1
+            walker.steps += 1
+            unit.x, unit.y = walker.path[walker.index]
+            entering.setdefault((unit.x, unit.y), []).append(unit)
+            remaining.append(walker)
+        self.__walkers = remaining
+
+        for location in leaving.keys() | entering.keys():
+            left = leaving.get(location, ())
+            game_map[location] = [unit for unit in game_map[location] if id(unit) not in left] + entering.get(location, [])
+
+    def __breach(self, unit):
+        damage = self.__type_config[unit.unit_type].get("playerBreachDamage", 1)
+        result = self.__result
+        result.breaches.append((unit.x, unit.y, unit.unit_type, unit.player_index))
+        if self.record_events:
+            self.events.append(("breach", unit, damage))
+        result.player_damage[unit.player_index] += damage
+        if unit.player_index == 0:
+            self.game_state.enemy_health -= damage
+        else:
+            self.game_state.my_health -= damage
+        resources = self.game_state._player_resources[unit.player_index]
+        resources['SP'] += damage * self.__config["resources"].get("coresForPlayerDamage", 0)
+
+    def __self_destruct(self, walker):
+        unit = walker.unit
+        unit.health = 0
+        self.__result.mobile_units_lost[unit.player_index] += 1
+        if self.record_events:
+            self.events.append(("selfDestruct", unit, None))
+            self.events.append(("death", unit, None))
+        type_config = self.__type_config[unit.unit_type]
+        if walker.steps < type_config.get("selfDestructStepsRequired", 0):
+            return
+        game_map = self.game_state.game_map
+        for location in game_map.get_locations_in_range([unit.x, unit.y], type_config.get("selfDestructRange", 0)):
+            for target in game_map[location]:
+                if target.player_index == unit.player_index:
+                    continue
+                if target.stationary:
+                    self.__damage(unit, target, type_config.get("selfDestructDamageTower", 0))
+                else:
+                    self.__damage(unit, target, type_config.get("selfDestructDamageWalker", 0))
+
+    def __damage(self, attacker, target, damage):
+        target.health -= damage
+        self.__targeting.clear()
+        if self.record_events:
+            self.events.append(("damage", target, damage))
+        if target.stationary:
+            self.__result.structure_damage[attacker.player_index] += damage
+
+    def __attack(self):
+        game_state = self.game_state
+        # Consecutive units of a stack attack the same target, as only their own attacks change the board in between,
+        # until it is destroyed
+        stack = None
+        target = None
+        for walker in self.__walkers:
+            unit = walker.unit
+            if unit.health <= 0:
+                continue
+            key = (unit.x, unit.y, unit.unit_type, unit.player_index)
+            if key != stack:
+                stack = key
+                target = game_state.get_target(unit)
+            if target is not None:
+                self.__damage(unit, target, unit.damage_f if target.stationary else unit.damage_i)
+                if target.health <= 0:
+                    self.__take_off_board(target)
+                    stack = None
+
+        occupied = ({(walker.unit.x, walker.unit.y) for walker in self.__walkers if walker.unit.player_index == 0},
+                    {(walker.unit.x, walker.unit.y) for walker in self.__walkers if walker.unit.player_index == 1})
+        for structure in self.__structures:
+            if structure.health <= 0 or structure.damage_i <= 0:
+                continue
+            enemies = occupied[1 - structure.player_index]
+            reach = structure.attackRange + self.__hit_radius
+            if not any(math.sqrt((x - structure.x)**2 + (y - structure.y)**2) < reach for x, y in enemies):
+                continue
+            target = game_state.get_target(structure)
+            if target is not None:
+                self.__damage(structure, target, structure.damage_i)
+                if target.health <= 0:
+                    self.__take_off_board(target)
+
+    def __take_off_board(self, unit):
+        # Destroyed units cannot be targeted for the rest of the frame. They are counted in __remove_destroyed.
+        game_map = self.game_state.game_map
+        game_map[unit.x, unit.y] = [other for other in game_map[unit.x, unit.y] if other is not unit]
+
+    def __remove_destroyed(self):
+        game_map = self.game_state.game_map
+        result = self.__result
+        remaining = []
+        for walker in self.__walkers:
+            unit = walker.unit
+            if unit.health > 0:
+                remaining.append(walker)
+                continue
+            result.mobile_units_lost[unit.player_index] += 1
+            if self.record_events:
+                self.events.append(("death", unit, None))
+            game_map[unit.x, unit.y] = [other for other in game_map[unit.x, unit.y] if other is not unit]
+        self.__walkers = remaining
+
+        structures = []
+        for structure in self.__structures:
+            if structure.health > 0:
+                structures.append(structure)
+                continue
+            result.structures_destroyed.append(structure)
+            if self.record_events:
+                self.events.append(("death", structure, None))
+            result.structure_points_destroyed[1 - structure.player_index] += structure.cost[0]
+            game_map.remove_unit([structure.x, structure.y])
+            self.__paths_changed = True
+        self.__structures = structures
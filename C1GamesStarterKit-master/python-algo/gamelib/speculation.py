@@ -0,0 +1,129 @@
+import threading
+import traceback
+
+from .game_state import GameState
+from .events import decode_field
+from .util import debug_write
+
+
+def is_final_frame(state, config):
+    """Checks whether an action frame is the last one of its action phase
+
+    Args:
+        state: The decoded action frame, or the action frame as received from the game engine. Only the unit lists
+            of a received frame are decoded, stopping at the first player with mobile units left.
+        config: The game config
+
+    Returns:
+        True if no mobile unit is left on the board, which ends the action phase
+    """
+    mobile_indexes = [index for index, unit in enumerate(config["unitInformation"]) if unit.get("unitCategory") == 1]
+    for name in ("p1Units", "p2Units"):
+        units = decode_field(state, name) if isinstance(state, str) else state[name]
+        if any(units[index] for index in mobile_indexes):
+            return False
+    return True
+
+
+def board_signature(game_state):
+    """
+        Returns:
+            A tuple describing the type, owner, upgrade and location of every unit of a GameState, but not their health.
+            States with the same signature have the same pathing and threat maps.
+    """
+    return tuple((unit.x, unit.y, unit.unit_type, unit.player_index, unit.upgraded) for unit in game_state.game_map.get_all_units())
+
+
+class Speculation:
+    """Prepares the analysis of the next turn on a background thread while the engine plays out the action phase.
+
+    Once the final action frame of a round arrives, a provisional GameState is built from it, and the thread fills
+    the shared path cache with paths from every edge location, builds the threat map, and then calls the precompute
+    function. When the real turn arrives, reconcile reuses the threat map and the result of precompute if the board
+    did not change in between. The path cache is keyed by the board, so it is reused whenever the structures match.
+
+    The provisional state has the units, health and resources of the final frame. Structures marked for removal
+    and the resources gained at the start of the turn are only in the real turn state, so precompute should
+    only depend on the board. It runs on another thread, so it must not print to stdout or change shared objects.
+
+    Attributes :
+        * config (JSON): Contains information about the game
+        * precompute (function): Called on the thread with the provisional GameState, its return value is kept for reconcile
+        * game_state (:obj: GameState): The provisional state of the running or finished speculation, None before the first one
+        * hits (int): Turns that reused a speculation
+        * misses (int): Turns where the board had changed since the speculation, or it was not finished in time
+
+    """
+    def __init__(self, config, precompute=None):
+        """Sets up speculation for a game
+
+        Args:
+            config: The game config
+            precompute: A function taking the provisional GameState, or None to only fill the caches
+
+        """
+        self.config = config
+        self.precompute = precompute
+        self.game_state = None
+        self.hits = 0
+        self.misses = 0
+        self.__thread = None
+        self.__signature = None
+        self.__result = None
+
+    def start(self, state):
+        """Starts speculating from the final frame of an action phase
+
+        Args:
+            state: The decoded final action frame
+
+        """
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+        self.game_state = None
+        self.__signature = None
+        self.__result = None
+        self.__thread = threading.Thread(target=self.__run, args=(state,), daemon=True)
+        self.__thread.start()
+
+    def __run(self, state):
+        try:
+            game_state = GameState(self.config, state)
+            game_state.suppress_warnings(True)
+            starts = [location for edge in game_state.game_map.get_edges() for location in edge
+                      if not game_state.contains_stationary_unit(location)]
+            game_state.find_paths_to_edges(starts)
+            game_state.game_map.get_threat_map()
+            self.game_state = game_state
+            self.__signature = board_signature(game_state)
+            if self.precompute is not None:
+                self.__result = self.precompute(game_state)
+        except Exception:
+            self.__signature = None
+            debug_write("Speculation failed:\n{}".format(traceback.format_exc()))
+
+    def reconcile(self, game_state, timeout=None):
+        """Reuses the speculation for the real state of the turn, if the board matches
+
+        Args:
+            game_state: The GameState of the turn
+            timeout: The most seconds to wait for the speculation to finish, or None to wait until it does
+
+        Returns:
+            The value precompute returned, or None if there is nothing to reuse.
+            The threat map of game_state is taken over from the provisional state when the boards match.
+        """
+        if self.__thread is None:
+            return None
+        self.__thread.join(timeout)
+        if self.__thread.is_alive():
+            # Kept, so no other speculation starts while this one still runs
+            self.misses += 1
+            return None
+        self.__thread = None
+        if self.__signature is None or self.__signature != board_signature(game_state):
+            self.misses += 1
+            return None
+        self.hits += 1
+        game_state.game_map.adopt_threat_map(self.game_state.game_map.get_threat_map())
+        return self.__result
@@ -0,0 +1,122 @@
+from collections import namedtuple
+
+# A structure to keep standing. upgrade is 1 (or True) if it should be upgraded
+RegisteredStructure = namedtuple("RegisteredStructure", ["x", "y", "unit_type", "upgrade", "priority"])
+
+
+class StructureRegistry:
+    """The structures you intend to keep standing on your half of the board, so the ones destroyed can be rebuilt.
+
+    Each location holds one entry. Entries are ordered by priority, lowest first, and then in the order they
+    were first added. missing compares the tiles holding structures, which GameMap keeps up to date, to those
+    of its previous call, and only checks again the entries whose tiles changed, the entries it found missing
+    and the entries added since. Between two calls, a structure can only be spawned, upgraded, removed or destroyed,
+    so the rest are still standing. This holds from one turn to the next, so every entry is checked again when
+    the turn number jumps.
+
+    """
+    def __init__(self):
+        self.__entries = {}
+        self.__ordered = None
+        self.__ranks = None
+        # The missing entries found by the last call to missing, by location, and the entries to check at the next one
+        self.__missing = {}
+        self.__unchecked = set()
+        self.__last_blocked = None
+        self.__last_turn = None
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, location):
+        return tuple(location) in self.__entries
+
+    def __iter__(self):
+        return iter(self.entries())
+
+    def add(self, x, y, unit_type, upgrade=0, priority=0):
+        """Records a structure to keep standing
+
+        Adding a location again with the same type keeps its place in the order, the lowest priority and the upgrade
+        once asked for. Another type replaces the entry.
+
+        Args:
+            x, y: The location of the structure
+            unit_type: The type of the structure
+            upgrade: 1 (or True) if the structure should be upgraded
+            priority: Entries with a lower priority come first
+
+        """
+        entry = self.__entries.get((x, y))
+        if entry is not None and entry.unit_type == unit_type:
+            upgrade = upgrade or entry.upgrade
+            priority = min(priority, entry.priority)
+        elif entry is not None:
+            del self.__entries[(x, y)]
+        self.__entries[(x, y)] = RegisteredStructure(x, y, unit_type, upgrade, priority)
+        self.__unchecked.add((x, y))
+        self.__ordered = None
+
+    def remove(self, x, y):
+        """Stops keeping a structure standing
+
+        Args:
+            x, y: The location of the structure
+
+        """
+        if self.__entries.pop((x, y), None) is not None:
+            self.__missing.pop((x, y), None)
+            self.__unchecked.discard((x, y))
+            self.__ordered = None
+
+    def entries(self):
+        """
+            Returns:
+                Every RegisteredStructure, in priority order
+        """
+        if self.__ordered is None:
+            # Dicts keep the order entries were first added, and sorted is stable
+            self.__ordered = sorted(self.__entries.values(), key=lambda entry: entry.priority)
+            self.__ranks = {(entry.x, entry.y): rank for rank, entry in enumerate(self.__ordered)}
+        return self.__ordered
+
+    def missing(self, game_state):
+        """Finds the registered structures that are destroyed or lost their upgrade
+
+        Args:
+            game_state: The GameState of the turn
+
+        Returns:
+            A list of (entry, spawn) tuples in priority order, spawn being True if the structure has to be built again
+            and False if only its upgrade is missing
+        """
+        game_map = game_state.game_map
+        blocked = game_map.get_blocked_mask()
+        size = game_map.ARENA_SIZE
+        if self.__last_blocked is None or game_state.turn_number - self.__last_turn not in (0, 1):
+            check = set(self.__entries)
+        else:
+            check = self.__unchecked | self.__missing.keys()
+            # Each tile is a byte holding 0 or 1, so the tiles that changed are the bits set by the xor of the masks
+            changed = int.from_bytes(blocked, "little") ^ int.from_bytes(self.__last_blocked, "little")
+            while changed:
+                bit = changed & -changed
+                changed ^= bit
+                location = divmod((bit.bit_length() - 1) >> 3, size)
+                if location in self.__entries:
+                    check.add(location)
+        for location in check:
+            entry = self.__entries[location]
+            if not blocked[entry.x * size + entry.y]:
+                self.__missing[location] = True
+            elif entry.upgrade and any(unit.stationary and unit.unit_type == entry.unit_type and not unit.upgraded
+                    for unit in game_map[entry.x, entry.y]):
+                self.__missing[location] = False
+            else:
+                self.__missing.pop(location, None)
+        self.__last_blocked = bytes(blocked)
+        self.__last_turn = game_state.turn_number
+        self.__unchecked = set()
+
+        self.entries()
+        return [(self.__entries[location], self.__missing[location]) for location in sorted(self.__missing, key=self.__ranks.get)]
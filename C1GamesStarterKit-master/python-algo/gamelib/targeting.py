@@ -0,0 +1,123 @@
+import math
+
+_RINGS = {}
+_NOT_FOUND = object()
+
+
+def target_rings(geometry, x, y, radius, player_index):
+    """Gets the locations a unit could attack, in the order GameState.get_target prefers them
+
+    Args:
+        geometry: The ArenaGeometry of the map
+        x, y: The location of the attacking unit
+        radius: The attackRange of the attacking unit
+        player_index: The player controlling the attacking unit, 0 or 1
+
+    Returns:
+        A tuple of rings of locations at the same distance, nearest first. The locations of a ring are ordered by the
+        tie-breaks of get_target that only depend on the location: lowest y first (highest for player 1), then furthest
+        from the center of the board, then the order of GameMap.get_locations_in_range. The result is shared and cached.
+    """
+    key = (geometry.size, geometry.hit_radius, x, y, radius, player_index)
+    rings = _RINGS.get(key)
+    if rings is None:
+        size = geometry.size
+        center = size // 2 - 0.5
+        candidates = []
+        for order, (dx, dy) in enumerate(geometry.stencil(radius)):
+            i = x + dx
+            j = y + dy
+            if 0 <= i < size and 0 <= j < size and geometry.bounds[i * size + j]:
+                distance = math.sqrt((i - x)**2 + (j - y)**2)
+                candidates.append((distance, j if player_index == 0 else -j, -abs(center - i), order, (i, j)))
+        candidates.sort()
+        grouped = []
+        for candidate in candidates:
+            if not grouped or grouped[-1][0] != candidate[0]:
+                grouped.append((candidate[0], []))
+            grouped[-1][1].append(candidate[4])
+        rings = _RINGS[key] = tuple(tuple(locations) for _, locations in grouped)
+    return rings
+
+
+class Targeting:
+    """Chooses the targets of attacking units for a GameMap, remembering each choice until the map changes.
+
+    Candidates are searched ring by ring from precomputed target_rings, so the search ends at the first ring
+    holding a mobile target, or a structure for units that cannot hit mobile units. The choices are the same
+    as the full scan in GameState.get_target. The remembered choices are forgotten whenever units are added,
+    moved, removed or upgraded through GameMap functions. Code that changes the health of units directly,
+    like Simulator, must call clear afterwards. Use GameMap.get_targeting to get the one belonging to a map.
+
+    Attributes :
+        * game_map (:obj: GameMap): The map targets are chosen on
+        * hits (int): The number of choices answered from memory
+        * misses (int): The number of choices searched for
+
+    """
+    def __init__(self, game_map):
+        self.game_map = game_map
+        self.hits = 0
+        self.misses = 0
+        self.__geometry = game_map.geometry
+        self.__chosen = {}
+
+    def update_location(self, x, y):
+        """Forgets the remembered choices, as the units at a location changed. Called by GameMap whenever they change.
+        """
+        if self.__chosen:
+            self.__chosen.clear()
+
+    def clear(self):
+        """Forgets the remembered choices. Call it after changing the health of units directly.
+        """
+        self.__chosen.clear()
+
+    def get_target(self, attacking_unit):
+        """Gets the unit an attacking unit would attack, see GameState.get_target
+
+        Args:
+            attacking_unit: A GameUnit at a location inside the arena, with integer coordinates
+
+        Returns:
+            The GameUnit it would attack, or None
+        """
+        stats = attacking_unit.stats
+        player_index = attacking_unit.player_index
+        key = (attacking_unit.x, attacking_unit.y, player_index, stats.attackRange, stats.damage_f != 0, stats.damage_i != 0)
+        target = self.__chosen.get(key, _NOT_FOUND)
+        if target is not _NOT_FOUND:
+            self.hits += 1
+            return target
+        self.misses += 1
+        target = self.__search(key)
+        self.__chosen[key] = target
+        return target
+
+    def __search(self, key):
+        x, y, player_index, radius, hits_structures, hits_mobile = key
+        game_map = self.game_map
+        structure = None
+        for ring in target_rings(self.__geometry, x, y, radius, player_index):
+            mobile = None
+            mobile_health = 0
+            ring_structure = None
+            structure_health = 0
+            for location in ring:
+                for unit in game_map[location]:
+                    if unit.player_index == player_index:
+                        continue
+                    if unit.stationary:
+                        if hits_structures and structure is None and (ring_structure is None or unit.health < structure_health):
+                            ring_structure = unit
+                            structure_health = unit.health
+                    elif hits_mobile and (mobile is None or unit.health < mobile_health):
+                        mobile = unit
+                        mobile_health = unit.health
+            if mobile is not None:
+                return mobile
+            if structure is None:
+                structure = ring_structure
+                if structure is not None and not hits_mobile:
+                    return structure
+        return structure
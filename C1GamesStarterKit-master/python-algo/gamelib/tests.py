@@ -1,9 +1,177 @@
+import io
+import os
+import sys
+import time
 import unittest
 import json
+import math
+import queue
+import random
+import tempfile
+import contextlib
+import multiprocessing
 import gamelib
+from .board_arrays import numpy_available
 from .game_state import GameState
+from .simulator import Simulator
+from .algocore import AlgoCore
+from .evaluation_pool import EvaluationPool, encode_state
+from .speculation import Speculation, is_final_frame
+from .events import FrameEvents, BreachEvent, DeathEvent, RoundEndEvent, decode_field
+from .command_reader import CommandReader, classify, has_events, CONFIG, TURN, ACTION_FRAME, END
+from .scheduler import TurnScheduler
+from . import log
+from . import instrumentation
 from .unit import GameUnit
 
+
+class ReferencePathFinder:
+    """The original node based pathfinder, kept to check the array based one against"""
+
+    def navigate(self, start, end_points, game_state):
+        game_map = game_state.game_map
+        self.game_map = game_map
+        self.blocked = {tuple(location) for location in game_map if game_state.contains_stationary_unit(location)}
+        self.pathlength = {}
+        self.direction = [-1 if end_points[0][0] < 14 else 1, -1 if end_points[0][1] < 14 else 1]
+        ideal = self.idealness_search(start, end_points)
+        self.validate(ideal, end_points)
+        return self.get_path(start, end_points)
+
+    def open(self, location):
+        return self.game_map.in_arena_bounds(location) and tuple(location) not in self.blocked
+
+    def neighbors(self, location):
+        x, y = location
+        return [[x, y + 1], [x, y - 1], [x + 1, y], [x - 1, y]]
+
+    def idealness(self, location, end_points):
+        if location in end_points:
+            return 10 ** 9
+        x, y = location
+        value = 28 * y if self.direction[1] == 1 else 28 * (27 - y)
+        return value + (x if self.direction[0] == 1 else 27 - x)
+
+    def idealness_search(self, start, end_points):
+        current = queue.Queue()
+        current.put(start)
+        visited = {tuple(start)}
+        best, most_ideal = self.idealness(start, end_points), start
+        while not current.empty():
+            for neighbor in self.neighbors(current.get()):
+                if not self.open(neighbor):
+                    continue
+                if self.idealness(neighbor, end_points) > best:
+                    best, most_ideal = self.idealness(neighbor, end_points), neighbor
+                if tuple(neighbor) not in visited:
+                    visited.add(tuple(neighbor))
+                    current.put(neighbor)
+        return most_ideal
+
+    def validate(self, ideal_tile, end_points):
+        current = queue.Queue()
+        for location in (end_points if ideal_tile in end_points else [ideal_tile]):
+            current.put(location)
+            self.pathlength[tuple(location)] = 0
+        while not current.empty():
+            location = current.get()
+            if tuple(location) in self.blocked:
+                continue
+            for neighbor in self.neighbors(location):
+                if self.open(neighbor) and tuple(neighbor) not in self.pathlength:
+                    self.pathlength[tuple(neighbor)] = self.pathlength[tuple(location)] + 1
+                    current.put(neighbor)
+
+    def get_path(self, start, end_points):
+        path, current, move_direction = [start], start, 0
+        while self.pathlength[tuple(current)] != 0:
+            best, best_length = current, self.pathlength[tuple(current)]
+            for neighbor in self.neighbors(current):
+                if not self.open(neighbor):
+                    continue
+                length = self.pathlength.get(tuple(neighbor), -1)
+                if length > best_length:
+                    continue
+                if length == best_length and not self.better_direction(current, neighbor, best, move_direction):
+                    continue
+                best, best_length = neighbor, length
+            move_direction = 2 if current[0] == best[0] else 1
+            path.append(best)
+            current = best
+        return path
+
+    def better_direction(self, prev_tile, new_tile, prev_best, move_direction):
+        if move_direction == 1 and new_tile[0] != prev_best[0]:
+            return prev_tile[1] != new_tile[1]
+        if move_direction == 2 and new_tile[1] != prev_best[1]:
+            return prev_tile[0] != new_tile[0]
+        if move_direction == 0:
+            return prev_tile[1] != new_tile[1]
+        if new_tile[1] == prev_best[1]:
+            return (new_tile[0] - prev_best[0]) * self.direction[0] > 0
+        if new_tile[0] == prev_best[0]:
+            return (new_tile[1] - prev_best[1]) * self.direction[1] > 0
+        return True
+
+
+class ReferenceTargeting:
+    """The original linear scan over the locations in range, kept to check the ring based targeting against"""
+
+    def get_target(self, game_state, attacking_unit):
+        game_map = game_state.game_map
+        reach = attacking_unit.attackRange + game_state.config["unitInformation"][0]["getHitRadius"]
+        search_radius = math.ceil(attacking_unit.attackRange)
+        target = None
+        target_stationary = True
+        target_distance = sys.maxsize
+        target_health = sys.maxsize
+        target_y = game_state.ARENA_SIZE
+        target_x_distance = 0
+        for x in range(attacking_unit.x - search_radius, attacking_unit.x + search_radius + 1):
+            for y in range(attacking_unit.y - search_radius, attacking_unit.y + search_radius + 1):
+                unit_distance = math.sqrt((x - attacking_unit.x) ** 2 + (y - attacking_unit.y) ** 2)
+                if not game_map.in_arena_bounds([x, y]) or unit_distance >= reach:
+                    continue
+                for unit in game_map[x, y]:
+                    if unit.player_index == attacking_unit.player_index or (attacking_unit.damage_f == 0 and unit.stationary) or \
+                            (attacking_unit.damage_i == 0 and not unit.stationary):
+                        continue
+                    new_target = False
+                    unit_x_distance = abs(game_state.HALF_ARENA - 0.5 - unit.x)
+                    if target_stationary and not unit.stationary:
+                        new_target = True
+                    elif not target_stationary and unit.stationary:
+                        continue
+                    if target_distance > unit_distance:
+                        new_target = True
+                    elif target_distance < unit_distance and not new_target:
+                        continue
+                    if target_health > unit.health:
+                        new_target = True
+                    elif target_health < unit.health and not new_target:
+                        continue
+                    if attacking_unit.player_index == 0:
+                        if target_y > unit.y:
+                            new_target = True
+                        elif target_y < unit.y and not new_target:
+                            continue
+                    else:
+                        if target_y < unit.y:
+                            new_target = True
+                        elif target_y > unit.y and not new_target:
+                            continue
+                    if target_x_distance < unit_x_distance:
+                        new_target = True
+                    if new_target:
+                        target = unit
+                        target_stationary = unit.stationary
+                        target_distance = unit_distance
+                        target_health = unit.health
+                        target_y = unit.y
+                        target_x_distance = unit_x_distance
+        return target
+
+
 class BasicTests(unittest.TestCase):
 
     def make_turn_0_map(self):
@@ -241,6 +409,42 @@ class BasicTests(unittest.TestCase):
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "We should be in 0 range of ourself")
         self.assertEqual(37, len(game.game_map.get_locations_in_range([13,13], 3.5)), "Wrong number of tiles in range")
 
+    def test_arena_geometry(self):
+        game_map = self.make_turn_0_map().game_map
+        geometry = game_map.geometry
+        size = game_map.ARENA_SIZE
+        half = game_map.HALF_ARENA
+        # The edges, bounds and ranges as they were computed before ArenaGeometry
+        edges = [[[half + num, size - 1 - num] for num in range(half)],
+                 [[half - 1 - num, size - 1 - num] for num in range(half)],
+                 [[half - 1 - num, num] for num in range(half)],
+                 [[half + num, num] for num in range(half)]]
+        self.assertEqual(edges, game_map.get_edges())
+        for quadrant, edge in enumerate(edges):
+            self.assertEqual(edge, game_map.get_edge_locations(quadrant))
+            self.assertEqual({tuple(location) for location in edge}, game_map.get_edge_location_set(quadrant))
+
+        # Changing the returned locations must not change the geometry shared by every map
+        game_map.get_edges()[0][0].append(1)
+        game_map.get_edge_locations(game_map.BOTTOM_LEFT)[0][0] = -1
+        self.assertEqual(edges, game_map.get_edges())
+        self.assertEqual(edges[2], game_map.get_edge_locations(game_map.BOTTOM_LEFT))
+
+        for x in range(-1, size + 1):
+            for y in range(-1, size + 1):
+                row_size = y + 1 if y < half else size - y
+                expected = 0 <= y < size and half - row_size <= x < half + row_size
+                self.assertEqual(expected, game_map.in_arena_bounds([x, y]), (x, y))
+                if 0 <= x < size and 0 <= y < size:
+                    self.assertEqual(expected, geometry.bounds[x * size + y])
+
+        hit_radius = geometry.hit_radius
+        for radius in (0, 1, 1.5, 2.5, 3.5, 4.5):
+            search_radius = math.ceil(radius)
+            expected = [(dx, dy) for dx in range(-search_radius, search_radius + 1) for dy in range(-search_radius, search_radius + 1)
+                        if math.sqrt(dx ** 2 + dy ** 2) < radius + hit_radius]
+            self.assertEqual(expected, list(geometry.stencil(radius)))
+
     def _test_get_attackers(self):
         game = self.make_turn_0_map()
         
@@ -276,3 +480,847 @@ class BasicTests(unittest.TestCase):
         actual = game.project_future_MP(turns)
         self.assertAlmostEqual(actual, expected, 0, "Expected {} MP {} turns from now, got {}".format(expected, turns, actual))
 
+    def test_pathing_matches_reference(self):
+        rng = random.Random(2024)
+        reference = ReferencePathFinder()
+        for _ in range(25):
+            game = self.make_turn_0_map()
+            locations = [location for location in game.game_map]
+            for location in rng.sample(locations, rng.randint(0, 250)):
+                game.game_map.add_unit("FF", location, rng.randint(0, 1))
+            open_locations = [location for location in locations if not game.contains_stationary_unit(location)]
+            for start in rng.sample(open_locations, 8):
+                for edge in range(4):
+                    end_points = game.game_map.get_edge_locations(edge)
+                    expected = reference.navigate(start, end_points, game)
+                    self.assertEqual(expected, game.find_path_to_edge(start, edge), "Path from {} to edge {} changed".format(start, edge))
+
+    def test_batched_paths(self):
+        rng = random.Random(28)
+        game = self.make_turn_0_map()
+        locations = [location for location in game.game_map]
+        for location in rng.sample(locations, 200):
+            game.game_map.add_unit("FF", location, 0)
+        starts = [location for location in locations if not game.contains_stationary_unit(location)][::5]
+        blocked = next(location for location in locations if game.contains_stationary_unit(location))
+        paths = game.find_paths_to_edges(starts + [blocked])
+        for start in starts:
+            self.assertEqual(game.find_path_to_edge(start), paths[tuple(start)], "Batched path from {} differs".format(start))
+        self.assertIsNone(paths[tuple(blocked)], "Blocked locations have no path")
+
+    def test_repaired_paths_match_reference(self):
+        rng = random.Random(3)
+        reference = ReferencePathFinder()
+        game = self.make_turn_0_map()
+        cache = game._shortest_path_finder.field_cache
+        repairs = cache.repairs
+        locations = [location for location in game.game_map]
+        for location in rng.sample(locations, 120):
+            game.game_map.add_unit("FF", location, 0)
+        for _ in range(60):
+            location = rng.choice(locations)
+            if game.contains_stationary_unit(location):
+                game.game_map.remove_unit(location)
+            else:
+                game.game_map.add_unit("FF", location, 1)
+            for start in [[13, 0], [14, 0], [0, 13], [27, 14]]:
+                if game.contains_stationary_unit(start):
+                    continue
+                edge = game.get_target_edge(start)
+                expected = reference.navigate(start, game.game_map.get_edge_locations(edge), game)
+                self.assertEqual(expected, game.find_path_to_edge(start), "Path from {} changed after editing {}".format(start, location))
+        self.assertGreater(cache.repairs, repairs, "Single structure changes should repair cached fields")
+
+    def test_base_board_after_many_forks(self):
+        rng = random.Random(12)
+        reference = ReferencePathFinder()
+        game = self.make_turn_0_map()
+        cache = game._shortest_path_finder.field_cache
+        cache.clear()
+        locations = [location for location in game.game_map]
+        starts = [[13, 0], [14, 0]]
+        for location in rng.sample([location for location in locations if location not in starts], 60):
+            game.game_map.add_unit("FF", location, 0)
+        for start in starts:
+            game.find_path_to_edge(start)
+        open_locations = [location for location in locations if not game.contains_stationary_unit(location) and location not in starts]
+        # More what-if boards than the cache holds, so the base board's fields are evicted while still among the latest
+        for location in rng.sample(open_locations, cache.max_size + 40):
+            fork = game.fork()
+            fork.game_map.add_unit("FF", location, 0)
+            fork.find_path_to_edge(starts[0])
+        for start in starts:
+            expected = reference.navigate(start, game.game_map.get_edge_locations(game.get_target_edge(start)), game)
+            self.assertEqual(expected, game.find_path_to_edge(start))
+        cache.clear()
+
+    def scan_attackers(self, game, location, player_index):
+        attackers = []
+        for location_unit in game.game_map.get_locations_in_range(location, 4.5):
+            for unit in game.game_map[location_unit]:
+                if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and game.game_map.distance_between_locations(location, location_unit) <= unit.attackRange:
+                    attackers.append(unit)
+        return attackers
+
+    def test_attackers_follow_board_changes(self):
+        rng = random.Random(5)
+        game = self.make_turn_0_map()
+        locations = [location for location in game.game_map]
+        for step in range(150):
+            location = rng.choice(locations)
+            action = rng.randint(0, 3)
+            if action == 0:
+                game.game_map.add_unit(rng.choice(["DF", "DF", "FF", "EF"]), location, rng.randint(0, 1))
+            elif action == 1:
+                game.game_map.remove_unit(location)
+            elif action == 2:
+                game.game_map.upgrade_unit(location)
+            else:
+                game.game_map.add_unit(rng.choice(["PI", "SI"]), location, rng.randint(0, 1))
+            if step % 10 == 0:
+                for target in rng.sample(locations, 20):
+                    for player_index in (0, 1):
+                        expected = self.scan_attackers(game, target, player_index)
+                        self.assertEqual(expected, game.get_attackers(target, player_index), "Wrong attackers of {}".format(target))
+                        self.assertEqual(sum(unit.damage_i for unit in expected), game.get_damage_per_frame(target, player_index))
+
+    def test_targets_follow_board_changes(self):
+        rng = random.Random(7)
+        game = self.make_turn_0_map()
+        config = game.config
+        locations = [location for location in game.game_map]
+        for step in range(120):
+            location = rng.choice(locations)
+            action = rng.randint(0, 3)
+            if action == 0:
+                game.game_map.place_unit(GameUnit(rng.choice(["DF", "FF", "EF"]), config, rng.randint(0, 1), rng.choice([10, 20, 30]), *location))
+            elif action == 1:
+                game.game_map.remove_unit(location)
+            elif action == 2:
+                game.game_map.upgrade_unit(location)
+            else:
+                game.game_map.place_unit(GameUnit(rng.choice(["PI", "SI"]), config, rng.randint(0, 1), rng.choice([5, 10]), *location))
+            if step % 10 == 0:
+                for x, y in rng.sample(locations, 20):
+                    for unit_type in ["PI", "EI", "SI", "DF"]:
+                        for player_index in (0, 1):
+                            attacker = GameUnit(unit_type, config, player_index, None, x, y)
+                            expected = ReferenceTargeting().get_target(game, attacker)
+                            self.assertIs(expected, game.get_target(attacker), "Wrong target from {}".format([x, y]))
+                            self.assertIs(expected, game.get_target(attacker))
+        targeting = game.game_map.get_targeting()
+        self.assertGreater(targeting.hits, 0, "Repeated choices should be remembered")
+
+        for location in locations:
+            game.game_map.remove_unit(location)
+        game.game_map.add_unit("FF", [13, 13], 1)
+        scout = GameUnit("PI", config, 0, None, 13, 11)
+        self.assertEqual([13, 13], [game.get_target(scout).x, game.get_target(scout).y])
+        game.game_map.add_unit("SI", [13, 14], 1)
+        self.assertEqual("SI", game.get_target(scout).unit_type, "Adding a unit should change the remembered choice")
+
+    @unittest.skipUnless(numpy_available(), "NumPy is not installed")
+    def test_board_arrays_follow_board_changes(self):
+        rng = random.Random(6)
+        game = self.make_turn_0_map()
+        board = game.game_map.get_board_arrays()
+        locations = [location for location in game.game_map]
+        trapezoid = [[0, 13], [8, 13], [8, 10], [3, 10]]
+        mask = board.polygon_mask(trapezoid)
+        for step in range(100):
+            location = rng.choice(locations)
+            action = rng.randint(0, 2)
+            if action == 0:
+                game.game_map.add_unit(rng.choice(["DF", "FF", "EF"]), location, rng.randint(0, 1))
+            elif action == 1:
+                game.game_map.remove_unit(location)
+            else:
+                game.game_map.upgrade_unit(location)
+            if step % 10 == 0:
+                for target in rng.sample(locations, 20):
+                    for player_index in (0, 1):
+                        self.assertEqual(game.get_damage_per_frame(target, player_index), board.damage_heatmap(player_index)[target[0], target[1]])
+                score = 0
+                for x, y in locations:
+                    if mask[x, y]:
+                        score += sum(unit.cost[0] * unit.health + unit.damage_i for unit in game.game_map[x, y])
+                self.assertEqual(score, board.region_sum(mask, board.cost[0] * board.health + board.damage_i))
+
+    def test_region_scores_follow_board_changes(self):
+        rng = random.Random(8)
+        game = self.make_turn_0_map()
+        locations = [location for location in game.game_map]
+        regions = [gamelib.Region("L", [[0, 13], [8, 13], [8, 10], [3, 10]]),
+                   gamelib.Region("C", [[10, 7], [18, 7], [18, 13], [10, 13]])]
+        self.assertIn((5, 11), regions[0].tile_set)
+        self.assertNotIn((2, 11), regions[0].tile_set)
+
+        def score(unit):
+            return unit.cost[0] * unit.health + unit.damage_i
+
+        for step in range(200):
+            location = rng.choice([location for location in locations if tuple(location) in regions[step % 2].tile_set] + [rng.choice(locations)])
+            action = rng.randint(0, 2)
+            if action == 0:
+                game.game_map.add_unit(rng.choice(["DF", "FF", "EF"]), location, rng.randint(0, 1))
+            elif action == 1:
+                game.game_map.remove_unit(location)
+            else:
+                game.attempt_upgrade(location)
+            if step % 7 == 0:
+                game = game.fork()
+            for region in regions:
+                expected = sum(score(unit) for x, y in region.tiles if game.game_map.in_arena_bounds([x, y]) for unit in game.game_map[x, y])
+                self.assertAlmostEqual(expected, game.get_region_score(region, score))
+
+        units = [unit for x, y in regions[1].tiles for unit in game.game_map[x, y]]
+        units[0].health -= 1
+        game.game_map.get_region_scores(score).clear()
+        expected = sum(score(unit) for x, y in regions[1].tiles for unit in game.game_map[x, y])
+        self.assertAlmostEqual(expected, game.get_region_score(regions[1], score))
+
+    def test_build_plan(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("FF", [3, 12], 0)
+        game.game_map.add_unit("DF", [5, 10], 0)
+        plan = gamelib.BuildPlan()
+        plan.add_stage("first", {"L": [[3, 12, "FF", 0], [5, 10, "FF", 0], [4, 12, "DF", 1]], "R": [[22, 12, "DF", 1], [5, 20, "FF", 0]]})
+        plan.add_stage("second", [[10, 10, "EF", 0], [11, 10, "EF", 0], [12, 10, "EF", 0], [13, 10, "EF", 0]])
+        plan.add_stage("third", [[14, 10, "FF", 0]])
+        with self.assertRaises(ValueError):
+            plan.add_stage("third", [])
+
+        result = plan.build(game, group_order=["R", "L"], min_resource=2)
+        self.assertEqual(["first", "second"], result.stages)
+        self.assertEqual([(22, 12), (4, 12), (10, 10), (11, 10), (12, 10)], [(item.x, item.y) for item in result.built])
+        self.assertEqual([(13, 10), (14, 10)], [(item.x, item.y) for item in result.deferred])
+        self.assertEqual([(5, 20), (3, 12), (5, 10)], [(item.x, item.y) for item in result.blocked])
+        self.assertTrue(game.game_map[4, 12][0].upgraded)
+        self.assertEqual(1, game.get_resource(0))
+        self.assertEqual(["first", "second", "third"], plan.pending_stages())
+        self.assertEqual([(3, 12), (5, 10), (5, 20)], [(item.x, item.y) for item in plan.get_pending("first")])
+
+        game.game_map.remove_unit([5, 10])
+        result = plan.build(game, ["first"])
+        self.assertEqual([(5, 10)], [(item.x, item.y) for item in result.built])
+        self.assertEqual("FF", game.game_map[5, 10][0].unit_type)
+
+    def test_build_plan_cycle(self):
+        game = self.make_turn_0_map()
+        plan = gamelib.BuildPlan()
+        plan.add_stage("priority", [[13, 2, "EF", 0]])
+        plan.add_stage("a", [[10, 10, "DF", 0], [11, 10, "EF", 0]])
+        plan.add_stage("b", [[12, 10, "FF", 0]])
+        plan.add_stage("c", [[13, 10, "FF", 0], [14, 10, "DF", 1]])
+
+        game = game.fork()
+        game._player_resources[0]["SP"] = 8
+        result = plan.build_cycle(game, before=["priority"], min_resource=1)
+        self.assertEqual(["priority", "a", "b", "c"], result.stages)
+        self.assertEqual([("EF", 13, 2), ("DF", 10, 10), ("FF", 12, 10), ("FF", 13, 10)], game.diff()[0])
+        self.assertEqual([(11, 10), (14, 10)], [(item.x, item.y) for item in result.deferred])
+        self.assertEqual(0, plan.cursor)
+
+        # The unfinished stage comes first again, until resources are below min_resource
+        game = game.fork()
+        game._player_resources[0]["SP"] = 0
+        self.assertEqual([], plan.build_cycle(game, before=["priority"], min_resource=1).stages)
+        game._player_resources[0]["SP"] = 4
+        result = plan.build_cycle(game, before=["priority"], min_resource=1)
+        self.assertEqual(["priority", "a"], result.stages)
+        self.assertEqual([("EF", 11, 10)], game.diff()[0])
+        self.assertEqual(1, plan.cursor)
+
+        # A stage built first is off cycle, so the cursor does not move
+        game = game.fork()
+        game._player_resources[0]["SP"] = 2
+        result = plan.build_cycle(game, first="c", before=["priority"], min_resource=1)
+        self.assertEqual(["priority", "c"], result.stages)
+        self.assertEqual([("DF", 14, 10)], game.diff()[0])
+        self.assertEqual(1, plan.cursor)
+        game._player_resources[0]["SP"] = 10
+        result = plan.build_cycle(game, before=["priority"], min_resource=1)
+        self.assertEqual(["priority", "b", "c"], result.stages)
+        self.assertEqual([("DF", 14, 10), ("UP", 14, 10)], game.diff()[0])
+        self.assertEqual(3, plan.cursor)
+        self.assertEqual([], plan.build_cycle(game, before=["priority"]).stages)
+
+    def test_defense_build_order(self):
+        # The defense of algo_strategy.py, played over turns on the same board
+        import algo_strategy
+        game = self.make_turn_0_map()
+        builds = []
+        with contextlib.redirect_stderr(io.StringIO()):
+            strategy = algo_strategy.AlgoStrategy()
+            strategy.on_game_start(game.config)
+            # Structure points, and the enemy's mobile points: from 8.5 the enemy is stockpiling and turrets come first
+            for turn, (structure_points, enemy_mobile_points) in enumerate([(4, 5), (9, 5), (7, 12), (30, 5), (12, 5), (20, 12), (6, 5)], 1):
+                game = game.fork()
+                game.turn_number = turn
+                game._player_resources[0]["SP"] = structure_points
+                game._player_resources[1]["MP"] = enemy_mobile_points
+                for _ in strategy.execute_defense(game):
+                    pass
+                builds.append(game.diff()[0])
+            log.flush()
+        self.assertEqual([
+            [("EF", 13, 2)],
+            [("EF", 14, 2), ("DF", 5, 12), ("DF", 5, 11)],
+            [("DF", 13, 11), ("UP", 13, 11)],
+            [("DF", 15, 11), ("UP", 15, 11), ("DF", 22, 12), ("UP", 22, 12), ("DF", 22, 11), ("UP", 22, 11), ("UP", 5, 12), ("UP", 5, 11),
+                ("FF", 2, 13), ("FF", 1, 13), ("FF", 4, 13), ("FF", 6, 13)],
+            [("FF", 6, 12), ("FF", 25, 13), ("FF", 26, 13), ("FF", 23, 13), ("FF", 20, 13), ("FF", 20, 12), ("FF", 9, 12), ("DF", 13, 10), ("DF", 14, 10)],
+            [("UP", 13, 10), ("UP", 14, 10), ("DF", 15, 10), ("UP", 15, 10), ("FF", 6, 11), ("FF", 5, 13), ("FF", 21, 11), ("FF", 21, 13), ("FF", 22, 13)],
+            [("FF", 13, 12), ("UP", 13, 12), ("FF", 15, 12), ("UP", 15, 12), ("DF", 5, 10)],
+        ], builds)
+        self.assertEqual(("WALL", 2), [stage for stage in strategy.defense_plan.names if stage != "PRIORITY_SUPPORT"][strategy.defense_plan.cursor])
+        self.assertIn((13, 12, "FF", 1), [tuple(entry)[:4] for entry in strategy.built_structures])
+
+    def test_structure_registry(self):
+        game = self.make_turn_0_map()
+        registry = gamelib.StructureRegistry()
+        registry.add(13, 12, "FF")
+        registry.add(4, 12, "DF", 1)
+        registry.add(10, 10, "EF", priority=-1)
+        registry.add(13, 12, "FF", 1)
+        registry.add(5, 10, "FF")
+        registry.add(5, 10, "DF")
+        self.assertEqual([(10, 10), (13, 12), (4, 12), (5, 10)], [(entry.x, entry.y) for entry in registry])
+        self.assertEqual([1, 1, "DF"], [registry.entries()[1].upgrade, registry.entries()[2].upgrade, registry.entries()[3].unit_type])
+
+        game.attempt_spawn("FF", [13, 12])
+        game.attempt_spawn("DF", [4, 12])
+        game.attempt_upgrade([4, 12])
+        game.attempt_spawn("EF", [10, 10])
+        self.assertEqual([((13, 12), False), ((5, 10), True)], [((entry.x, entry.y), spawn) for entry, spawn in registry.missing(game)])
+        registry.remove(5, 10)
+        self.assertNotIn([5, 10], registry)
+        game.game_map.remove_unit([10, 10])
+        game.attempt_upgrade([13, 12])
+        self.assertEqual([((10, 10), True)], [((entry.x, entry.y), spawn) for entry, spawn in registry.missing(game)])
+
+        # Only the entries on tiles that changed, or missing last time, are checked on the next turn
+        game = game.fork()
+        game.turn_number += 1
+        game.attempt_spawn("EF", [10, 10])
+        game.game_map.remove_unit([13, 12])
+        game.game_map[4, 12][0].upgraded = False
+        self.assertEqual([((13, 12), True)], [((entry.x, entry.y), spawn) for entry, spawn in registry.missing(game)])
+        registry.add(20, 10, "FF")
+        self.assertEqual([((13, 12), True), ((20, 10), True)], [((entry.x, entry.y), spawn) for entry, spawn in registry.missing(game)])
+        # Every entry is checked again once turns were skipped
+        game.turn_number += 2
+        self.assertEqual([((13, 12), True), ((4, 12), False), ((20, 10), True)],
+                [((entry.x, entry.y), spawn) for entry, spawn in registry.missing(game)])
+
+    def test_parse_decoded_state(self):
+        game = self.make_turn_0_map()
+        state = {"p2Units": [[[5, 16, 60.0, "7"]], [], [], [], [], [], [], [[5, 16, 60.0, "8"]]], "turnInfo": [0, 4, -1],
+            "p1Stats": [24.0, 11.0, 7.0, 0], "p1Units": [[[13, 0, 30.0, "1"]], [], [[12, 3, 40.0, "2"]], [], [], [], [], []],
+            "p2Stats": [28.0, 9.0, 3.0, 0], "events": {}}
+        from_dict = GameState(game.config, state)
+        from_string = GameState(game.config, json.dumps(state))
+        self.assertEqual(4, from_dict.turn_number)
+        for location in from_dict.game_map:
+            self.assertEqual(str(from_string.game_map[location]), str(from_dict.game_map[location]))
+        self.assertTrue(from_dict.game_map[5, 16][0].upgraded)
+        self.assertEqual(40.0, from_dict.game_map[12, 3][0].health)
+        self.assertEqual(11.0, from_dict.get_resource(0))
+
+        class Turns(AlgoCore):
+            def on_turn(self, turn_state):
+                received.append(turn_state)
+                game_state = GameState(self.config, turn_state)
+                game_state.parse_time = 0.125
+                # States built afterwards, such as by speculation, do not change what is reported
+                GameState(self.config, json.dumps(state))
+                return game_state
+        received = []
+        algo = Turns()
+        algo.report_turn_time = True
+        algo.handle_message(CONFIG, json.dumps(game.config))
+        output = io.StringIO()
+        with contextlib.redirect_stderr(output):
+            algo.handle_message(TURN, json.dumps(state))
+            log.flush()
+        self.assertEqual([state], received, "on_turn should be given the decoded turn")
+        self.assertIn("125.0 ms building the game state", output.getvalue(), "The parse time of the state on_turn returned should be reported")
+
+    def test_unit_stats(self):
+        game = self.make_turn_0_map()
+        turret = GameUnit("DF", game.config, 0, None, 13, 5)
+        other = GameUnit("DF", game.config, 1, None, 14, 22)
+        self.assertIs(turret.stats, other.stats, "Units of a type should share their stats")
+        self.assertFalse(hasattr(turret, "__dict__"))
+        upgrade = game.config["unitInformation"][2]["upgrade"]
+        turret.upgrade()
+        self.assertTrue(turret.upgraded)
+        self.assertEqual(upgrade.get("attackRange", other.attackRange), turret.attackRange)
+        self.assertEqual(other.cost[0] + upgrade.get("cost1", 0), turret.cost[0])
+        self.assertEqual(other.health, turret.health, "Upgrading should not change health")
+        copy = turret.copy()
+        copy.health = 1
+        self.assertEqual(str(turret), str(copy).replace("health: 1 ", "health: {} ".format(turret.health)))
+
+    def snapshot(self, game):
+        return [str(game.game_map[location]) for location in game.game_map]
+
+    def test_fork(self):
+        rng = random.Random(9)
+        game = self.make_turn_0_map()
+        locations = [location for location in game.game_map]
+        for location in rng.sample(locations, 60):
+            game.game_map.add_unit(rng.choice(["DF", "FF", "EF"]), location, 0 if location[1] < 14 else 1)
+        game.get_attackers([13, 13], 0)
+        game.find_path_to_edge([13, 0])
+        before = self.snapshot(game)
+        paths = game.find_paths_to_edges(game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT))
+
+        fork = game.fork()
+        self.assertIs(game, fork.parent)
+        self.assertEqual(2, fork.attempt_spawn("DF", [[10, 10], [11, 10]]))
+        fork.attempt_spawn("PI", [13, 0], 3)
+        fork.game_map.remove_unit([12, 12])
+        for location in locations:
+            if location[1] < 14 and fork.contains_stationary_unit(location):
+                fork.attempt_upgrade(location)
+        self.assertEqual(before, self.snapshot(game), "Changing a fork should not change its parent")
+        self.assertEqual(paths, game.find_paths_to_edges(game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT)))
+        build, deploy = fork.diff()
+        self.assertEqual([("DF", 10, 10), ("DF", 11, 10)], build[:2])
+        self.assertTrue(len(build) > 2 and all(command[0] == "UP" for command in build[2:]))
+        self.assertEqual([("PI", 13, 0)] * 3, deploy)
+        self.assertEqual([[], []], game.diff())
+
+        fork_before = self.snapshot(fork)
+        game.game_map.add_unit("PI", [13, 0], 0)
+        game.game_map.upgrade_unit(locations[0])
+        for location in rng.sample(locations, 20):
+            game.game_map.remove_unit(location)
+        self.assertEqual(fork_before, self.snapshot(fork), "Changing a parent should not change its forks")
+        for state in (game, fork):
+            for target in rng.sample(locations, 40):
+                self.assertEqual(self.scan_attackers(state, target, 0), state.get_attackers(target, 0))
+                self.assertEqual(bool(state.contains_stationary_unit(target)), bool(state.game_map.get_blocked_mask()[target[0] * 28 + target[1]]))
+
+    def test_change_tracking(self):
+        class Recorder:
+            def __init__(self):
+                self.locations = []
+
+            def update_location(self, x, y):
+                self.locations.append((x, y))
+
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        recorder = Recorder()
+        game_map.subscribe(recorder)
+        self.assertEqual(0, game_map.checkpoint())
+        game_map.add_unit("DF", [13, 5])
+        game.attempt_upgrade([13, 5])
+        game_map.remove_unit([13, 5])
+        game_map[3, 10] = [GameUnit("PI", game.config, 0, None, 3, 10)]
+        self.assertEqual(4, game_map.version)
+        self.assertEqual({(13, 5), (3, 10)}, game_map.get_dirty_tiles())
+        self.assertEqual([(13, 5)] * 3 + [(3, 10)], recorder.locations)
+
+        fork = game.fork()
+        fork.game_map.remove_unit([3, 10])
+        self.assertEqual(5, fork.game_map.version)
+        self.assertEqual(4, game_map.version, "Changing a fork should not change its parent's version")
+        self.assertEqual(4, len(recorder.locations), "Subscribers should not follow forks")
+
+        self.assertEqual(4, game_map.checkpoint())
+        self.assertEqual(set(), game_map.get_dirty_tiles())
+        game_map.unsubscribe(recorder)
+        game_map.remove_unit([3, 10])
+        self.assertEqual({(3, 10)}, game_map.get_dirty_tiles())
+        self.assertEqual(4, len(recorder.locations))
+
+    def test_simulator(self):
+        game = self.make_turn_0_map()
+        game.attempt_spawn("PI", [13, 0], 5)
+        result = Simulator(game).run()
+        self.assertEqual(5, len(result.breaches), "Unopposed scouts should all score")
+        self.assertEqual([5, 0], result.player_damage)
+        self.assertEqual(game.enemy_health - 5, result.game_state.enemy_health)
+        self.assertEqual(len(game.find_path_to_edge([13, 0])), result.frames, "Scouts should score one frame after reaching the edge")
+
+        before = self.snapshot(game)
+        for location in [[23, 14], [24, 14], [24, 15], [25, 15], [24, 16], [25, 16]]:
+            game.game_map.add_unit("DF", location, 1)
+            game.game_map.upgrade_unit(location)
+        before = self.snapshot(game)
+        result = Simulator(game).run()
+        self.assertEqual(5, result.mobile_units_lost[0], "Scouts should not get past upgraded turrets guarding their edge")
+        self.assertEqual([], result.breaches)
+        self.assertEqual(before, self.snapshot(game), "Simulating should not change the simulated state")
+
+        blocked = self.make_turn_0_map()
+        for location in blocked.game_map.get_edge_locations(blocked.game_map.TOP_RIGHT):
+            blocked.game_map.add_unit("FF", location, 1)
+        blocked.attempt_spawn("PI", [13, 0], 2)
+        result = Simulator(blocked).run()
+        self.assertEqual([2, 0], result.mobile_units_lost, "Scouts that cannot reach their edge should self destruct")
+        self.assertGreaterEqual(result.structure_damage[0], 2 * 15, "Self destructing scouts should damage the walls next to them")
+
+        recorded = Simulator(blocked, record_events=True)
+        events = []
+        while recorded.running:
+            recorded.step()
+            events += [(name, unit.unit_type) for name, unit, _ in recorded.events]
+        self.assertEqual(2, events.count(("selfDestruct", "PI")))
+        self.assertEqual(2, events.count(("death", "PI")))
+        self.assertIn(("damage", "FF"), events)
+
+    def test_simulator_stack_switches_target(self):
+        game = self.make_turn_0_map()
+        config = game.config
+        game.game_map.place_unit(GameUnit("FF", config, 1, 10, 13, 2))
+        game.game_map.place_unit(GameUnit("FF", config, 1, 75, 12, 3))
+        simulator = Simulator(game, record_events=True)
+        simulator.add_unit("EI", [13, 0], 4)
+        simulator.step()
+        # Two attacks destroy the nearest wall, so the other two of the stack hit the next one
+        damage = [((unit.x, unit.y), value) for name, unit, value in simulator.events if name == "damage"]
+        self.assertEqual([((13, 2), 6), ((13, 2), 6), ((12, 3), 6), ((12, 3), 6)], damage)
+        self.assertEqual([(13, 2)], [(unit.x, unit.y) for unit in simulator.run().structures_destroyed[:1]])
+        self.assertEqual(10, game.game_map[13, 2][0].health, "Simulating should not change the simulated state")
+
+    def test_scheduler(self):
+        game = self.make_turn_0_map()
+        scheduler = TurnScheduler(game, budget=0.05)
+        ran = []
+
+        def build(scheduler):
+            ran.append("build")
+            plan = scheduler.game_state.fork()
+            plan.attempt_spawn("DF", [13, 10])
+            scheduler.propose(plan, 1)
+
+        def search(scheduler):
+            ran.append("search")
+            for score in range(2, 5):
+                plan = scheduler.game_state.fork()
+                plan.attempt_spawn("PI", [13, 0], score)
+                yield plan, score
+            while True:
+                yield
+
+        scheduler.add_task(lambda scheduler: ran.append("late"), priority=-1, name="late")
+        scheduler.add_task(search)
+        scheduler.add_task(build, priority=1)
+        self.assertIs(game, scheduler.best_plan, "The turn's state should be the plan until one is proposed")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            plan = scheduler.submit()
+        self.assertEqual(["build", "search"], ran, "Tasks should run by priority until the budget runs out")
+        self.assertEqual(4, scheduler.best_score)
+        self.assertEqual(["search", "late"], scheduler.skipped)
+        self.assertEqual({"build", "search"}, set(scheduler.task_times))
+        self.assertGreaterEqual(scheduler.task_times["search"], 0.04)
+        self.assertEqual([json.dumps(plan._build_stack), json.dumps(plan._deploy_stack)], output.getvalue().splitlines())
+        self.assertEqual([("PI", 13, 0)] * 4, plan._deploy_stack)
+        self.assertFalse(scheduler.propose(game, 3), "Worse plans should not replace the best one")
+
+    def test_scheduler_task_failure(self):
+        ran = []
+
+        def broken(scheduler):
+            scheduler.game_state.attempt_spawn("DF", [13, 10])
+            raise ValueError("broken")
+
+        def search(scheduler):
+            plan = scheduler.best_plan.fork()
+            plan.attempt_spawn("PI", [13, 0])
+            yield plan, 1
+            plan = plan.fork()
+            plan.attempt_spawn("PI", [14, 0])
+            raise KeyError("search")
+
+        for tasks, submitted in [([broken], [[["FF", 13, 12]], []]), ([search, broken], [[["FF", 13, 12]], [["PI", 13, 0]]])]:
+            game = self.make_turn_0_map()
+            game.attempt_spawn("FF", [13, 12])
+            scheduler = TurnScheduler(game, budget=1)
+            for priority, task in enumerate(reversed(tasks)):
+                scheduler.add_task(task, priority)
+            scheduler.add_task(lambda scheduler: ran.append("after"), priority=-1, name="after")
+            output = io.StringIO()
+            errors = io.StringIO()
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(errors):
+                with self.assertRaises(Exception) as raised:
+                    scheduler.submit()
+            self.assertIs(scheduler.errors[0][1], raised.exception, "The first failure should be raised once the turn is submitted")
+            self.assertEqual([task.__name__ for task in tasks], [name for name, _ in scheduler.errors])
+            self.assertEqual([json.dumps(commands) for commands in submitted], output.getvalue().splitlines(),
+                    "The commands of failed tasks should not be submitted")
+            self.assertIn("Task {} failed".format(tasks[0].__name__), errors.getvalue())
+        self.assertEqual(["after", "after"], ran, "Tasks should still run after a failure")
+
+    def test_speculation(self):
+        game = self.make_turn_0_map()
+        rng = random.Random(12)
+        for location in rng.sample([location for location in game.game_map], 60):
+            game.game_map.add_unit(rng.choice(["DF", "EF", "FF"]), location, 0 if location[1] < 14 else 1)
+        game.game_map.upgrade_unit(location)
+        frame = json.loads(encode_state(game))
+        frame["turnInfo"] = [1, 3, 40]
+        self.assertTrue(is_final_frame(frame, game.config))
+        self.assertTrue(is_final_frame(json.dumps(frame), game.config))
+        frame["p1Units"][3].append([13, 0, 15.0, ""])
+        self.assertFalse(is_final_frame(frame, game.config), "Frames with mobile units left are not final")
+        self.assertFalse(is_final_frame(json.dumps(frame), game.config))
+        frame["p1Units"][3] = []
+        frame["p2Units"][5].append([13, 27, 40.0, ""])
+        self.assertFalse(is_final_frame(json.dumps(frame), game.config))
+        frame["p2Units"][5] = []
+
+        speculation = Speculation(game.config, lambda provisional: len(provisional.game_map.get_all_units()))
+        self.assertIsNone(speculation.reconcile(game))
+        speculation.start(frame)
+        turn = json.loads(encode_state(game))
+        for units in turn["p1Units"][:3]:
+            for unit in units:
+                unit[2] = 1.0
+        game = GameState(game.config, turn)
+        self.assertEqual(60, speculation.reconcile(game), "An unchanged board should reuse the speculation")
+        self.assertEqual(1, speculation.hits)
+        for target in game.game_map:
+            for player_index in (0, 1):
+                expected = self.scan_attackers(game, target, player_index)
+                self.assertEqual(expected, game.get_attackers(target, player_index))
+                for attacker, unit in zip(game.get_attackers(target, player_index), expected):
+                    self.assertIs(unit, attacker, "Attackers should be the units of the turn, not of the frame")
+
+        speculation.start(frame)
+        game.game_map.remove_unit(location)
+        self.assertIsNone(speculation.reconcile(game), "A changed board should not reuse the speculation")
+        self.assertEqual(1, speculation.misses)
+
+    def test_command_reader(self):
+        def frame(number, breach=False):
+            events = {"breach": [[[13, 27], 1, 3, "9", 1]] if breach else [], "death": [], "spawn": []}
+            return json.dumps({"p2Units": [[]], "turnInfo": [1, 2, number], "p1Units": [[]], "events": events})
+
+        turn = json.dumps({"turnInfo": [0, 3, -1], "events": {"breach": [], "death": []}})
+        lines = ['{"replaySave": 1}', frame(0), frame(1), frame(2, True), frame(3), frame(4), turn, frame(0), frame(1), "garbage",
+                 '{"turnInfo" : [ 2, 3]}']
+        self.assertEqual([CONFIG, ACTION_FRAME, ACTION_FRAME, ACTION_FRAME, ACTION_FRAME, ACTION_FRAME, TURN, ACTION_FRAME, ACTION_FRAME, None, END],
+                         [classify(line) for line in lines])
+        self.assertTrue(has_events(frame(2, True), ["breach"]))
+        self.assertFalse(has_events(frame(2), ["breach", "death", "attack"]))
+        self.assertFalse(has_events(turn, ["breach"]))
+
+        for coalesce, expected in ((False, lines), (True, [lines[0], frame(2, True), frame(4), turn, frame(1), "garbage", lines[-1]])):
+            reader = CommandReader(io.StringIO("\n".join(lines) + "\n"), max_queued=4)
+            reader.start()
+            received = []
+            # Slower than the reader, so frames pile up behind each other
+            while len(received) < len(expected):
+                time.sleep(0.01)
+                kind, message, _ = reader.get(coalesce)
+                received.append(message.strip())
+            self.assertEqual(expected, received)
+            self.assertEqual(len(lines) - len(expected), reader.dropped)
+            with contextlib.redirect_stderr(io.StringIO()):
+                self.assertRaises(SystemExit, reader.get)
+                log.flush()
+
+    def test_frame_events(self):
+        game = self.make_turn_0_map()
+        events = {"selfDestruct": [], "breach": [[[13, 27], 1.0, 3, "41", 1], [[2, 11], 1.0, 4, "42", 2]], "damage": [[[5, 5], 3.0, 0, "7", 1]],
+                  "death": [[[5, 5], 0, "7", 1, False]], "spawn": [], "attack": [[[5, 6], [5, 5], 3.0, 5, "9", "7", 2]]}
+        moving = json.dumps({"p2Units": [[], [], [], [[3, 14, 15.0, "43"]], [], [], []], "turnInfo": [1, 6, 12],
+                             "p1Units": [[], [], [], [], [], [], []], "events": events})
+        last = json.dumps({"p2Units": [[], [], [], [], [], [], []], "turnInfo": [1, 6, 13],
+                           "p1Units": [[[5, 5, 20.0, "8"]], [], [], [], [], [], []], "events": dict(events, breach=[], death=[])})
+        self.assertEqual([[5, 5], 0, "7", 1, False], decode_field(moving, "death")[0])
+        self.assertIsNone(decode_field(moving, "shield"))
+
+        received = []
+        frame_events = FrameEvents(game.config, {"breach": received.append, "death": received.append, "round_end": received.append})
+        frame_events.dispatch(moving)
+        self.assertEqual([BreachEvent(13, 27, 1.0, "PI", "41", 0), BreachEvent(2, 11, 1.0, "EI", "42", 1),
+                          DeathEvent(5, 5, "FF", "7", 0, False)], received)
+        del received[:]
+        frame_events.dispatch(last)
+        self.assertEqual([RoundEndEvent(6, 13)], received, "Only the last frame of a round should end it")
+
+        class Breaches(AlgoCore):
+            def on_breach(self, breach):
+                received.append(breach)
+        algo = Breaches()
+        del received[:]
+        self.assertTrue(algo.handle_message(CONFIG, json.dumps(game.config)))
+        self.assertTrue(algo.handle_message(ACTION_FRAME, moving))
+        self.assertEqual(2, len(received), "Messages handled without start should reach the event functions")
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertFalse(algo.handle_message(END, '{"turnInfo": [2, 6, -1]}'))
+
+    def test_log(self):
+        class Expensive:
+            formatted = 0
+            def __str__(self):
+                Expensive.formatted += 1
+                return "expensive"
+
+        logger = log.get_logger("tests")
+        game = self.make_turn_0_map()
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stderr(output), contextlib.redirect_stdout(io.StringIO()):
+                log.flush()
+                logger.debug("Hidden {}", Expensive())
+                logger.info("Shown {}", Expensive())
+                gamelib.debug_write("Written", 1)
+                self.assertEqual("", output.getvalue(), "Output should wait for the turn to be submitted")
+                game.submit_turn()
+                self.assertEqual("Shown expensive\nWritten, 1\n", output.getvalue())
+                self.assertEqual(1, Expensive.formatted, "Disabled messages should not be formatted")
+
+                log.set_level(log.DEBUG, "tests")
+                logger.debug("Now shown")
+                log.set_level(log.OFF)
+                logger.error("Hidden")
+                log.flush()
+                self.assertTrue(output.getvalue().endswith("Now shown\n"))
+
+                buffer = log.get_buffer()
+                max_bytes, buffer.max_bytes = buffer.max_bytes, 100
+                output.truncate(0)
+                output.seek(0)
+                for index in range(30):
+                    gamelib.debug_write("Line {:03}".format(index))
+                log.flush()
+                buffer.max_bytes = max_bytes
+                lines = output.getvalue().splitlines()
+                self.assertEqual("(19 earlier log messages dropped)", lines[0])
+                self.assertEqual(["Line {:03}".format(index) for index in range(19, 30)], lines[1:], "Only the newest 100 bytes should be kept")
+
+                buffer.max_bytes = 20
+                output.truncate(0)
+                output.seek(0)
+                for line in ["\u00e9" * 4, "\u00e9" * 4, "\u00e9" * 20]:
+                    gamelib.debug_write(line)
+                log.flush()
+                buffer.max_bytes = max_bytes
+                # Each line of 4 accented letters takes 9 bytes with its newline, and a longer line is cut to fit
+                self.assertEqual(["(2 earlier log messages dropped)", "\u00e9" * 9], output.getvalue().splitlines())
+        finally:
+            log.set_level(log.INFO)
+
+    def test_instrumentation(self):
+        original = GameState.find_path_to_edge
+        output = io.StringIO()
+        instrumentation.enable(output)
+        try:
+            game = self.make_turn_0_map()
+            game.find_path_to_edge([13, 0])
+            game.find_path_to_edge([14, 0])
+            game.get_attackers([13, 13], 0)
+            game.attempt_spawn("PI", [13, 0])
+            instrumentation.count("candidates", 3)
+
+            @instrumentation.timer("recursive")
+            def recursive(depth):
+                return recursive(depth - 1) if depth else 0
+            recursive(3)
+            with contextlib.redirect_stdout(io.StringIO()):
+                game.submit_turn()
+        finally:
+            instrumentation.disable()
+        self.assertIs(original, GameState.find_path_to_edge, "Disabling should restore the original functions")
+
+        record = json.loads(output.getvalue())
+        self.assertEqual(0, record["turn"])
+        self.assertEqual({"candidates": 3}, record["counters"])
+        for name, calls in (("parse", 1), ("find_path_to_edge", 2), ("get_attackers", 1), ("attempt_spawn", 1), ("submit_turn", 1), ("recursive", 4)):
+            self.assertEqual(calls, record["timers"][name][0], "Wrong number of calls of {}".format(name))
+        self.assertGreater(record["timers"]["find_path_to_edge"][1], 0)
+        self.assertEqual({}, instrumentation.turn_record()["timers"], "Emitting a record should start a new turn")
+        recursive(1)
+        instrumentation.count("candidates")
+        self.assertEqual({"turn": None, "timers": {}, "counters": {}}, instrumentation.turn_record(), "Disabled instrumentation should not measure")
+
+        def untimed():
+            return 0
+        self.assertIs(untimed, instrumentation.timer("untimed")(untimed), "Decorating while disabled should leave the function as it is")
+
+    def test_evaluation_pool(self):
+        game = self.make_turn_0_map()
+        rng = random.Random(11)
+        for location in rng.sample([location for location in game.game_map], 80):
+            game.game_map.add_unit(rng.choice(["DF", "FF"]), location, 0 if location[1] < 14 else 1)
+        game.game_map.upgrade_unit(location)
+        candidates = [location for location in game.game_map if not game.contains_stationary_unit(location)]
+        expected = [_damage_at(game.fork(), location) for location in candidates]
+        for processes in (0, 2):
+            pool = EvaluationPool(game.config, processes)
+            try:
+                pool.publish(game)
+                self.assertEqual(expected, pool.map_evaluate(_damage_at, candidates), "Wrong results with {} processes".format(processes))
+                self.assertRaises(ZeroDivisionError, pool.map_evaluate, _fail, candidates[:3])
+                self.assertEqual([None] * 3, pool.map_evaluate(_damage_at, candidates[:3], timeout=0))
+                self.assertEqual(expected[:5], pool.map_evaluate(_damage_at, candidates[:5]))
+            finally:
+                pool.close()
+
+    def test_evaluation_pool_worker_logs(self):
+        game = self.make_turn_0_map()
+        saved = os.dup(2)
+        # Workers write to the stderr file they inherit, so it is redirected before they are forked
+        with tempfile.TemporaryFile() as stderr:
+            sys.stderr.flush()
+            os.dup2(stderr.fileno(), 2)
+            try:
+                gamelib.debug_write("Logged before forking")
+                pool = EvaluationPool(game.config, 1)
+                try:
+                    pool.publish(game)
+                    self.assertEqual([0, 0], pool.map_evaluate(_log_in_worker, [[13, 0], [14, 0]], timeout=None))
+                finally:
+                    pool.close()
+                log.flush()
+            finally:
+                sys.stderr.flush()
+                os.dup2(saved, 2)
+                os.close(saved)
+            stderr.seek(0)
+            written = stderr.read().decode()
+        self.assertIn("Evaluated [13, 0]", written, "Messages logged in workers should be written")
+        self.assertIn("Evaluated [14, 0]", written)
+        self.assertEqual(1, written.count("Logged before forking"), "Workers should not write the messages of the parent")
+
+    def test_evaluation_pool_worker_dies(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 12], 0)
+        candidates = [[x, 10] for x in range(8, 20)]
+        expected = [_damage_at(game.fork(), location) for location in candidates]
+        pool = EvaluationPool(game.config, 2)
+        try:
+            pool.publish(game)
+            # Candidates lost with a dead worker are evaluated in this process instead
+            self.assertEqual(expected, pool.map_evaluate(_die_in_worker, candidates, timeout=None))
+            self.assertLess(pool.processes, 2)
+            self.assertEqual(expected, pool.map_evaluate(_damage_at, candidates, timeout=None))
+        finally:
+            pool.close()
+
+
+def _damage_at(game_state, location):
+    return game_state.get_damage_per_frame(location, 0), len(game_state.find_path_to_edge(location) or [])
+
+
+def _fail(game_state, location):
+    return 1 / 0
+
+
+def _log_in_worker(game_state, location):
+    gamelib.debug_write("Evaluated {}".format(location))
+    return 0
+
+
+def _die_in_worker(game_state, location):
+    if multiprocessing.parent_process() is not None:
+        os._exit(1)
+    return _damage_at(game_state, location)
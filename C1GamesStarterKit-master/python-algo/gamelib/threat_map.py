@@ -0,0 +1,154 @@
+import math
+from bisect import insort
+
+
+class ThreatMap:
+    """Indexes, for every location, the units that would attack a unit standing there.
+
+    A ThreatMap is built once from a GameMap and then kept up to date by it as units are added,
+    removed or upgraded through GameMap functions, which turns GameState.get_attackers into a lookup.
+    Use GameMap.get_threat_map to get the one belonging to a map.
+
+    Attributes :
+        * game_map (:obj: GameMap): The map being indexed
+        * max_range (float): The longest attackRange of any unit type. Like get_attackers, only units
+          closer than this (plus the getHitRadius) are considered.
+
+    """
+    def __init__(self, game_map):
+        """Builds the index from the units currently on the map
+
+        Args:
+            game_map: The GameMap to index
+
+        """
+        self.game_map = game_map
+        self.max_range = 0
+        for unit in game_map.config["unitInformation"]:
+            if unit.get('attackRange', 0) >= self.max_range:
+                self.max_range = unit.get('attackRange', 0)
+
+        geometry = game_map.geometry
+        self.__size = geometry.size
+        self.__bounds = geometry.bounds
+        self.__stencil = tuple((dx, dy, math.sqrt(dx**2 + dy**2)) for dx, dy in geometry.stencil(self.max_range))
+
+        grid_size = self.__size * self.__size
+        # Sorted (source index, position in source tile, unit) entries, so lookups keep the scan order of get_attackers
+        self.__attackers = [[] for _ in range(grid_size)]
+        self.__damage = ([0] * grid_size, [0] * grid_size)
+        self.__covered = {}
+
+        for index in range(grid_size):
+            if self.__bounds[index]:
+                self.update_location(index // self.__size, index % self.__size)
+
+    def copy(self, game_map):
+        """Copies this index for a copy of its map
+
+        Args:
+            game_map: The copy of the indexed map, holding the same units
+
+        Returns:
+            A new ThreatMap indexing game_map
+        """
+        threat_map = ThreatMap.__new__(ThreatMap)
+        threat_map.__dict__.update(self.__dict__)
+        threat_map.game_map = game_map
+        threat_map.__attackers = [list(entries) for entries in self.__attackers]
+        threat_map.__damage = (list(self.__damage[0]), list(self.__damage[1]))
+        threat_map.__covered = dict(self.__covered)
+        return threat_map
+
+    def rebind(self, game_map):
+        """Copies this index for another map holding the same units, apart from their health
+
+        Args:
+            game_map: A map with units of the same types, owners and upgrades, in the same order at the same locations
+
+        Returns:
+            A new ThreatMap indexing the units of game_map
+        """
+        threat_map = self.copy(game_map)
+        size = self.__size
+        threat_map.__attackers = [[(source, position, game_map[source // size, source % size][position])
+                for source, position, _ in entries] if entries else [] for entries in self.__attackers]
+        return threat_map
+
+    def update_location(self, x, y):
+        """Re-indexes the units at a location. Called by GameMap whenever they change.
+
+        Args:
+            x: The x coordinate of the changed location
+            y: The y coordinate of the changed location
+
+        """
+        size = self.__size
+        source = x * size + y
+        changed = set()
+        for index in self.__covered.pop(source, ()):
+            self.__attackers[index] = [entry for entry in self.__attackers[index] if entry[0] != source]
+            changed.add(index)
+
+        covered = set()
+        for position, unit in enumerate(self.game_map[x, y]):
+            stats = unit.stats
+            if stats.damage_i + stats.damage_f <= 0:
+                continue
+            attack_range = stats.attackRange
+            for dx, dy, distance in self.__stencil:
+                i = x + dx
+                j = y + dy
+                if distance <= attack_range and 0 <= i < size and 0 <= j < size and self.__bounds[i * size + j]:
+                    index = i * size + j
+                    insort(self.__attackers[index], (source, position, unit))
+                    covered.add(index)
+        if covered:
+            self.__covered[source] = covered
+        changed |= covered
+
+        for index in changed:
+            for player_index in (0, 1):
+                self.__damage[player_index][index] = sum(unit.damage_i for _, _, unit in self.__attackers[index] if unit.player_index != player_index)
+
+    def __index(self, location):
+        x, y = location
+        if type(x) is int and type(y) is int and 0 <= x < self.__size and 0 <= y < self.__size:
+            index = x * self.__size + y
+            if self.__bounds[index]:
+                return index
+        return None
+
+    def get_attackers(self, location, player_index):
+        """Gets the units threatening a given location
+
+        Args:
+            location: The location of a hypothetical defender
+            player_index: The index corresponding to the defending player, 0 for you 1 for the enemy
+
+        Returns:
+            A list of units that would attack a unit controlled by the given player at the given location,
+            or None if the location is not an integer location on the board
+
+        """
+        index = self.__index(location)
+        if index is None:
+            return None
+        return [unit for _, _, unit in self.__attackers[index] if unit.player_index != player_index]
+
+    def get_damage_per_frame(self, location, player_index):
+        """Gets the damage a mobile unit at a location would take each frame
+
+        Args:
+            location: The location of a hypothetical defender
+            player_index: The index corresponding to the defending player, 0 for you 1 for the enemy
+
+        Returns:
+            The total damage to mobile units dealt by every attacker of the location,
+            or None if the location is not an integer location on the board
+
+        """
+        index = self.__index(location)
+        if index is None or player_index not in (0, 1):
+            return None
+        return self.__damage[player_index][index]
@@ -1,3 +1,7 @@
+from collections import namedtuple
+from operator import attrgetter
+
+
 def is_stationary(unit_type, structure_types):
     """
         Args:
@@ -9,9 +13,61 @@ def is_stationary(unit_type, structure_types):
     return unit_type in structure_types
 
 
+UnitStats = namedtuple("UnitStats", ["stationary", "speed", "damage_f", "damage_i", "attackRange", "shieldRange",
+    "max_health", "shieldPerUnit", "shieldBonusPerY", "cost"])
+UnitStats.__doc__ = """The stats shared by every unit of one type, either upgraded or not. cost is a (SP, MP) tuple."""
+
+_unit_stats = (None, None)
+
+def get_unit_stats(config):
+    """Gets the stats of every unit type in a config, computing them on the first call
+
+    Args:
+        config: A game config
+
+    Returns:
+        A dict mapping (unit_type, upgraded) to the UnitStats of that unit type.
+        The last config seen is remembered, so every unit of a game shares one dict.
+    """
+    global _unit_stats
+    stats_config, unit_stats = _unit_stats
+    if stats_config is not config:
+        unit_stats = {}
+        for type_config in config["unitInformation"]:
+            unit_type = type_config.get("shorthand")
+            base = UnitStats(
+                type_config.get("unitCategory") == 0,
+                type_config.get("speed", 0),
+                type_config.get("attackDamageTower", 0),
+                type_config.get("attackDamageWalker", 0),
+                type_config.get("attackRange", 0),
+                type_config.get("shieldRange", 0),
+                type_config.get("startHealth", 0),
+                type_config.get("shieldPerUnit", 0),
+                type_config.get("shieldBonusPerY", 0),
+                (type_config.get("cost1", 0), type_config.get("cost2", 0)))
+            upgrade = type_config.get("upgrade", {})
+            unit_stats[unit_type, False] = base
+            unit_stats[unit_type, True] = base._replace(
+                speed=upgrade.get("speed", base.speed),
+                damage_f=upgrade.get("attackDamageTower", base.damage_f),
+                damage_i=upgrade.get("attackDamageWalker", base.damage_i),
+                attackRange=upgrade.get("attackRange", base.attackRange),
+                shieldRange=upgrade.get("shieldRange", base.shieldRange),
+                max_health=upgrade.get("startHealth", base.max_health),
+                shieldPerUnit=upgrade.get("shieldPerUnit", base.shieldPerUnit),
+                shieldBonusPerY=upgrade.get("shieldBonusPerY", base.shieldBonusPerY),
+                cost=(upgrade.get("cost1", 0) + base.cost[0], upgrade.get("cost2", 0) + base.cost[1]))
+        _unit_stats = (config, unit_stats)
+    return unit_stats
+
+
 class GameUnit:
     """Holds information about a Unit. 
 
+    The stats of a unit are read from a UnitStats record shared by all units of its type,
+    so they cannot be assigned to. Only health, location, player_index and the flags belong to the unit.
+
     Attributes :
         * unit_type (string): This unit's type
         * config (JSON): Contains information about the game
@@ -26,12 +82,15 @@ class GameUnit:
         * shieldRange (float): The effective range of this unit for shielding
         * max_health (float): The starting health of this unit. Note than 'health' can be increased beyond this value by shielding in some game configurations.
         * health (float): The current health of this unit
-        * cost ([int, int]): The resource costs of this unit first is SP second is MP
+        * cost ((int, int)): The resource costs of this unit first is SP second is MP
         * shieldPerUnit (float): how much shield is given per unit
         * pending_removal (boolean): If this unit is marked for removal by its owner
         * upgraded (boolean): If this unit is upgraded
+        * stats (:obj: UnitStats): The shared stats of this unit
 
     """
+    __slots__ = ("unit_type", "config", "player_index", "pending_removal", "upgraded", "x", "y", "health", "stats")
+
     def __init__(self, unit_type, config, player_index=None, health=None, x=-1, y=-1):
         """ Initialize unit variables using args passed
 
@@ -43,38 +102,40 @@ class GameUnit:
         self.upgraded = False
         self.x = x
         self.y = y
-        self.__serialize_type()
-        self.health = self.max_health if not health else health
-
-    def __serialize_type(self):
-        from .game_state import STRUCTURE_TYPES, UNIT_TYPE_TO_INDEX, SUPPORT
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        self.stationary = type_config["unitCategory"] == 0
-        self.speed = type_config.get("speed", 0)
-        self.damage_f = type_config.get("attackDamageTower", 0)
-        self.damage_i = type_config.get("attackDamageWalker", 0)
-        self.attackRange = type_config.get("attackRange", 0)
-        self.shieldRange = type_config.get("shieldRange", 0)
-        self.max_health = type_config.get("startHealth", 0)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", 0)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", 0)
-        self.cost = [type_config.get("cost1", 0), type_config.get("cost2", 0)]
+        self.stats = get_unit_stats(config)[unit_type, False]
+        self.health = self.stats.max_health if not health else health
 
+    stationary = property(attrgetter("stats.stationary"))
+    speed = property(attrgetter("stats.speed"))
+    damage_f = property(attrgetter("stats.damage_f"))
+    damage_i = property(attrgetter("stats.damage_i"))
+    attackRange = property(attrgetter("stats.attackRange"))
+    shieldRange = property(attrgetter("stats.shieldRange"))
+    max_health = property(attrgetter("stats.max_health"))
+    shieldPerUnit = property(attrgetter("stats.shieldPerUnit"))
+    shieldBonusPerY = property(attrgetter("stats.shieldBonusPerY"))
+    cost = property(attrgetter("stats.cost"))
 
     def upgrade(self):
-        from .game_state import UNIT_TYPE_TO_INDEX
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]].get("upgrade", {})
-        self.speed = type_config.get("speed", self.speed)
-        self.damage_f = type_config.get("attackDamageTower", self.damage_f)
-        self.damage_i = type_config.get("attackDamageWalker", self.damage_i)
-        self.attackRange = type_config.get("attackRange", self.attackRange)
-        self.shieldRange = type_config.get("shieldRange", self.shieldRange)
-        self.max_health = type_config.get("startHealth", self.max_health)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", self.shieldPerUnit)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", self.shieldBonusPerY)
-        self.cost = [type_config.get("cost1", 0) + self.cost[0], type_config.get("cost2", 0) + self.cost[1]]
+        self.stats = get_unit_stats(self.config)[self.unit_type, True]
         self.upgraded = True
 
+    def copy(self):
+        """
+            Returns:
+                A new GameUnit with the same type, stats, health, location and flags as this one.
+        """
+        unit = GameUnit.__new__(GameUnit)
+        unit.unit_type = self.unit_type
+        unit.config = self.config
+        unit.player_index = self.player_index
+        unit.pending_removal = self.pending_removal
+        unit.upgraded = self.upgraded
+        unit.x = self.x
+        unit.y = self.y
+        unit.stats = self.stats
+        unit.health = self.health
+        return unit
 
     def __toString(self):
         owner = "Friendly" if self.player_index == 0 else "Enemy"
@@ -1,5 +1,12 @@
 import sys
+import json
 
+from .log import get_buffer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
 
@@ -21,6 +28,19 @@ def get_command():
         exit()
     return ret
 
+def decode_json(message):
+    """Decodes a JSON message from the game engine.
+    Uses orjson when it is installed and the json module otherwise.
+
+    Args:
+        message: The JSON string to decode
+
+    Returns:
+        The decoded object
+
+    """
+    return orjson.loads(message) if orjson is not None else json.loads(message)
+
 def send_command(cmd):
     """Sends your turn to standard output.
     Should usually only be called by 'GameState.submit_turn()'
@@ -30,12 +50,12 @@ def send_command(cmd):
     sys.stdout.flush()
 
 def debug_write(*msg):
-    """Prints a message to the games debug output
+    """Prints a message to the games debug output.
+    Messages are buffered and written together when the turn is submitted, see log.py
 
     Args:
         msg: The message to output
 
     """
     #Printing to STDERR is okay and printed out by the game but doesn't effect turns.
-    sys.stderr.write(", ".join(map(str, msg)).strip() + "\n")
-    sys.stderr.flush()
+    get_buffer().write(", ".join(map(str, msg)).strip())
@@ -0,0 +1,430 @@
+#!/usr/bin/env python
+"""
+A stand-in for engine.jar written in Python, for quick local matches without Java.
+
+    python scripts/local_engine.py                                  # python-algo against itself
+    python scripts/local_engine.py my-algo python-algo              # two algo folders, each run through its run.sh
+    python scripts/local_engine.py my-algo python-algo --in-process --games 20 --no-replay
+
+The algos are sent the config, turn states, action frames and end state the game engine sends, and the replay
+is written to the replays folder in the engine's format. Units are simulated with gamelib's Simulator, which
+follows the rules in game-configs.json but is only an estimate of the real engine, so check strategies against
+engine.jar or the website before trusting small differences.
+
+With --in-process, the AlgoStrategy of each algo folder is run inside this process instead of through run.sh,
+which is much faster. Both then use the gamelib of python-algo, and the random module is seeded before every game.
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+import contextlib
+import importlib.util
+
+file_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.abspath(os.path.join(file_dir, os.pardir))
+sys.path.insert(0, os.path.join(parent_dir, "python-algo"))
+
+import gamelib
+from gamelib.command_reader import classify
+from gamelib.simulator import Simulator
+from gamelib.unit import GameUnit
+
+ARENA_SIZE = 28
+HALF_ARENA = ARENA_SIZE // 2
+EVENT_TYPES = ("selfDestruct", "breach", "damage", "shield", "move", "spawn", "death", "attack", "melee")
+
+
+class ProcessAlgo:
+    """An algo run in its own process through its run file, like engine.jar runs it"""
+    def __init__(self, run_file, stderr=None):
+        self.name = os.path.basename(os.path.dirname(os.path.abspath(run_file)))
+        self.process = subprocess.Popen('"{}"'.format(run_file) if not run_file.endswith(".sh") else 'bash "{}"'.format(run_file),
+                                        shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr,
+                                        universal_newlines=True, bufsize=1)
+        self.crashed = False
+
+    def send(self, message):
+        try:
+            self.process.stdin.write(message + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            self.crashed = True
+
+    def receive(self):
+        line = "" if self.crashed else self.process.stdout.readline()
+        if not line:
+            self.crashed = True
+            return "[]"
+        return line
+
+    def close(self):
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class InProcessAlgo:
+    """An AlgoStrategy run inside this process, which is sent messages through AlgoCore.handle_message"""
+    def __init__(self, strategy, name, stderr=None):
+        self.name = name
+        self.strategy = strategy
+        self.stderr = stderr
+        self.crashed = False
+        self.__lines = []
+
+    def send(self, message):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(self.stderr or io.StringIO()):
+            self.strategy.handle_message(classify(message), message)
+        self.__lines += output.getvalue().splitlines()
+
+    def receive(self):
+        return self.__lines.pop(0) if self.__lines else "[]"
+
+    def close(self):
+        pass
+
+
+def load_strategy(algo_dir, index):
+    """Imports the algo_strategy.py of an algo folder under a name of its own and creates its AlgoStrategy"""
+    spec = importlib.util.spec_from_file_location("algo_strategy_{}".format(index), os.path.join(algo_dir, "algo_strategy.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.AlgoStrategy()
+
+
+def run_file(algo):
+    """The run file of an algo, given it or the folder holding it"""
+    name = "run.ps1" if sys.platform.startswith("win") else "run.sh"
+    return algo if os.path.isfile(algo) else os.path.join(algo, name)
+
+
+def parse_commands(line):
+    try:
+        commands = json.loads(line)
+    except ValueError:
+        return []
+    return [command for command in commands if isinstance(command, list) and len(command) >= 3] if isinstance(commands, list) else []
+
+
+class LocalEngine:
+    """Plays a game between two algos, following the rules of a game config.
+
+    Each turn both algos are sent the turn state and reply with their build and deploy commands. Structures are
+    built, upgraded and marked for removal in the order sent, then mobile units are deployed and the action phase
+    is simulated frame by frame with Simulator, sending each frame to both algos. Structures marked for removal are
+    removed after the action phase with a refund, and the next turn's resources are handed out.
+    Locations are kept from player 1's point of view. Player 2 is sent everything rotated, so it sees itself at the bottom.
+
+    Attributes :
+        * config (dict): The game config
+        * algos (list): The two algos playing
+        * state (:obj: GameState): The board and resources, from player 1's point of view
+        * turn (int): The current turn
+        * frames (int): The number of action frames played so far
+
+    """
+    def __init__(self, config, algos, max_turns=100, max_frames=1000, replay=None):
+        """Sets up a game
+
+        Args:
+            config: The game config
+            algos: The algo of player 1 and the algo of player 2
+            max_turns: The turn the game ends on if neither player has lost
+            max_frames: The most frames an action phase may last
+            replay: A file to write the replay to, or None
+
+        """
+        self.config = config
+        self.algos = algos
+        self.max_turns = max_turns
+        self.max_frames = max_frames
+        self.replay = replay
+        self.turn = 0
+        self.frames = 0
+        self.__types = [unit["shorthand"] for unit in config["unitInformation"]]
+        self.__type_config = {unit["shorthand"]: unit for unit in config["unitInformation"]}
+        self.__next_id = 1
+        self.__structure_ids = {}
+        self.__mobile_ids = {}
+        self.__times = [0, 0]
+        self.__total_times = [0, 0]
+        resources = config["resources"]
+        stats = [resources["startingHP"], resources["startingCores"], resources["startingBits"], 0]
+        self.state = gamelib.GameState(config, {"turnInfo": [0, 0, -1], "p1Stats": stats, "p2Stats": stats,
+                                                "p1Units": [[] for _ in self.__types], "p2Units": [[] for _ in self.__types]})
+        self.state.suppress_warnings(True)
+
+    def __new_id(self):
+        self.__next_id += 1
+        return str(self.__next_id - 1)
+
+    def __unit_id(self, unit):
+        if unit.stationary:
+            return self.__structure_ids.get((unit.x, unit.y), "")
+        return self.__mobile_ids.get(id(unit), "")
+
+    def view(self, player, turn_info, events=None):
+        """Serializes the game the way the engine sends it to a player
+
+        Args:
+            player: 1 or 2
+            turn_info: The turnInfo of the message, [phase, turn, frame]
+            events: The events of the frame, keyed by event type, from player 1's point of view
+
+        Returns:
+            The message as a JSON string
+        """
+        flip = player == 2
+        units = ([[] for _ in self.__types], [[] for _ in self.__types])
+        for unit in self.state.game_map.get_all_units():
+            x, y = (ARENA_SIZE - 1 - unit.x, ARENA_SIZE - 1 - unit.y) if flip else (unit.x, unit.y)
+            owned = units[unit.player_index if not flip else 1 - unit.player_index]
+            entry = [x, y, float(unit.health), self.__unit_id(unit)]
+            owned[self.__types.index(unit.unit_type)].append(entry)
+            if unit.pending_removal:
+                owned[6].append(entry)
+            if unit.upgraded:
+                owned[7].append(entry)
+        stats = [[self.state.my_health, self.state.get_resource(self.state.SP, 0), self.state.get_resource(self.state.MP, 0), self.__times[0]],
+                 [self.state.enemy_health, self.state.get_resource(self.state.SP, 1), self.state.get_resource(self.state.MP, 1), self.__times[1]]]
+        stats = [[round(value, 1) if index in (1, 2) else value for index, value in enumerate(player_stats)] for player_stats in stats]
+        if flip:
+            units, stats = units[::-1], stats[::-1]
+            events = {name: [self.__flip_event(name, event) for event in entries] for name, entries in events.items()} if events else None
+        return json.dumps({"p2Units": units[1], "turnInfo": turn_info, "p1Stats": stats[0], "p1Units": units[0],
+                           "p2Stats": stats[1], "events": events or {name: [] for name in EVENT_TYPES}})
+
+    @staticmethod
+    def __flip_event(name, event):
+        event = list(event)
+        event[0] = [ARENA_SIZE - 1 - event[0][0], ARENA_SIZE - 1 - event[0][1]]
+        player = {"breach": 4, "damage": 4, "spawn": 3, "death": 3, "selfDestruct": 5}[name]
+        event[player] = 3 - event[player]
+        return event
+
+    def __send(self, turn_info, events=None, replay_only=False):
+        message = self.view(1, turn_info, events)
+        if self.replay is not None:
+            self.replay.write(message + "\n")
+        if replay_only:
+            return
+        self.algos[0].send(message)
+        self.algos[1].send(self.view(2, turn_info, events))
+
+    def __event(self, name, unit, value=None):
+        location = [unit.x, unit.y]
+        type_index = self.__types.index(unit.unit_type)
+        unit_id = self.__unit_id(unit)
+        player = unit.player_index + 1
+        if name in ("breach", "damage"):
+            return [location, value, type_index, unit_id, player]
+        if name == "death":
+            return [location, type_index, unit_id, player, False]
+        if name == "selfDestruct":
+            return [location, [], 0.0, type_index, unit_id, player]
+        return [location, type_index, unit_id, player]
+
+    def __location(self, player_index, command):
+        x, y = int(command[1]), int(command[2])
+        return (x, y) if player_index == 0 else (ARENA_SIZE - 1 - x, ARENA_SIZE - 1 - y)
+
+    def __build(self, player_index, command, built):
+        state = self.state
+        game_map = state.game_map
+        unit_type = command[0]
+        x, y = self.__location(player_index, command)
+        if not game_map.in_arena_bounds([x, y]) or (y < HALF_ARENA) != (player_index == 0):
+            return
+        resources = state._player_resources[player_index]
+        existing = game_map[x, y][0] if state.contains_stationary_unit([x, y]) else None
+        if unit_type == self.__types[7]:
+            if existing is None or existing.player_index != player_index or existing.upgraded or "upgrade" not in self.__type_config[existing.unit_type]:
+                return
+            cost = state.type_cost(existing.unit_type, upgrade=True)[0]
+            if resources['SP'] >= cost:
+                resources['SP'] -= cost
+                game_map.upgrade_unit([x, y])
+        elif unit_type == self.__types[6]:
+            if existing is not None and existing.player_index == player_index:
+                existing.pending_removal = True
+        elif unit_type in self.__types[:3] and existing is None:
+            cost = state.type_cost(unit_type)[0]
+            if resources['SP'] >= cost:
+                resources['SP'] -= cost
+                unit = GameUnit(unit_type, self.config, player_index, None, x, y)
+                game_map.place_unit(unit)
+                self.__structure_ids[x, y] = self.__new_id()
+                built.append((x, y))
+
+    def __deploy(self, simulator, player_index, command, spawned):
+        state = simulator.game_state
+        game_map = state.game_map
+        unit_type = command[0]
+        x, y = self.__location(player_index, command)
+        edges = (game_map.BOTTOM_LEFT, game_map.BOTTOM_RIGHT) if player_index == 0 else (game_map.TOP_LEFT, game_map.TOP_RIGHT)
+        if unit_type not in self.__types[3:6] or not any((x, y) in game_map.get_edge_location_set(edge) for edge in edges):
+            return
+        resources = state._player_resources[player_index]
+        cost = state.type_cost(unit_type)[1]
+        if state.contains_stationary_unit([x, y]) or resources['MP'] < cost:
+            return
+        resources['MP'] -= cost
+        simulator.add_unit(unit_type, [x, y], 1, player_index)
+        unit = game_map[x, y][-1]
+        self.__mobile_ids[id(unit)] = self.__new_id()
+        spawned.append(unit)
+
+    def __play_turn(self):
+        state = self.state
+        state.turn_number = self.turn
+        self.__send([0, self.turn, -1], replay_only=True)
+        # Processes work on their turns at the same time, while in-process algos take theirs as they are sent the state
+        starts = []
+        for player_index, algo in enumerate(self.algos):
+            starts.append(time.perf_counter())
+            algo.send(self.view(player_index + 1, [0, self.turn, -1]))
+        commands = []
+        for player_index, algo in enumerate(self.algos):
+            commands.append((parse_commands(algo.receive()), parse_commands(algo.receive())))
+            self.__times[player_index] = int(1000 * (time.perf_counter() - starts[player_index]))
+            self.__total_times[player_index] += self.__times[player_index]
+
+        built = []
+        for player_index, (build, _) in enumerate(commands):
+            for command in build:
+                self.__build(player_index, command, built)
+        simulator = Simulator(state, record_events=True)
+        # The simulator works on copies of the units, so the new structures are found again by location
+        spawned = [simulator.game_state.game_map[location][0] for location in built]
+        self.state = simulator.game_state
+        self.state.parent = None
+        for player_index, (_, deploy) in enumerate(commands):
+            for command in deploy:
+                self.__deploy(simulator, player_index, command, spawned)
+
+        events = {name: [] for name in EVENT_TYPES}
+        events["spawn"] = [self.__event("spawn", unit) for unit in spawned]
+        self.__send([1, self.turn, 0], events)
+        while simulator.running and simulator.frame < self.max_frames:
+            simulator.step()
+            events = {name: [] for name in EVENT_TYPES}
+            for name, unit, value in simulator.events:
+                events[name].append(self.__event(name, unit, value))
+            for name, unit, value in simulator.events:
+                if name == "death" and unit.stationary:
+                    self.__structure_ids.pop((unit.x, unit.y), None)
+            self.__send([1, self.turn, simulator.frame], events)
+        self.frames += simulator.frame + 1
+        self.__mobile_ids.clear()
+        self.__end_turn()
+
+    def __end_turn(self):
+        state = self.state
+        for unit in list(state.game_map.get_all_units()):
+            if unit.stationary and unit.pending_removal:
+                type_config = self.__type_config[unit.unit_type]
+                cost = state.type_cost(unit.unit_type)[0] + (state.type_cost(unit.unit_type, upgrade=True)[0] if unit.upgraded else 0)
+                state._player_resources[unit.player_index]['SP'] += cost * type_config.get("refundPercentage", 0) * unit.health / unit.max_health
+                state.game_map.remove_unit([unit.x, unit.y])
+                self.__structure_ids.pop((unit.x, unit.y), None)
+
+    def __hand_out_resources(self):
+        state = self.state
+        resources = self.config["resources"]
+        for player_index in (0, 1):
+            player_resources = state._player_resources[player_index]
+            player_resources['MP'] = min(resources["maxBits"], state.project_future_MP(1, player_index, player_resources['MP']))
+            player_resources['SP'] += resources["coresPerRound"]
+        for unit in state.game_map.get_all_units():
+            type_config = self.__type_config[unit.unit_type]
+            upgraded_config = type_config.get("upgrade", {}) if unit.upgraded else {}
+            player_resources = state._player_resources[unit.player_index]
+            player_resources['SP'] += upgraded_config.get("generatesResource1", type_config.get("generatesResource1", 0))
+            player_resources['MP'] += upgraded_config.get("generatesResource2", type_config.get("generatesResource2", 0))
+        self.state.turn_number = self.turn
+
+    def play(self):
+        """Plays the game to the end
+
+        Returns:
+            The endStats of the game, also written to the replay. The winner is 1 or 2, or 0 for a draw
+        """
+        start = time.perf_counter()
+        config = json.dumps(self.config)
+        if self.replay is not None:
+            self.replay.write(config + "\n")
+        for algo in self.algos:
+            algo.send(config)
+
+        while True:
+            self.__play_turn()
+            if self.state.my_health <= 0 or self.state.enemy_health <= 0 or self.turn + 1 >= self.max_turns:
+                break
+            self.turn += 1
+            self.__hand_out_resources()
+
+        health = [self.state.my_health, self.state.enemy_health]
+        winner = 0 if health[0] == health[1] else (1 if health[0] > health[1] else 2)
+        end_stats = {"winner": winner, "turns": self.turn + 1, "frames": self.frames, "duration": int(1000 * (time.perf_counter() - start))}
+        for player_index, algo in enumerate(self.algos):
+            end_stats["player{}".format(player_index + 1)] = {
+                "name": algo.name, "crashed": algo.crashed, "total_computation_time": self.__total_times[player_index],
+                "points_scored": self.config["resources"]["startingHP"] - health[1 - player_index]}
+        message = json.loads(self.view(1, [2, self.turn, -1]))
+        message["endStats"] = end_stats
+        if self.replay is not None:
+            self.replay.write(json.dumps(message) + "\n")
+        for player_index, algo in enumerate(self.algos):
+            algo.send(self.view(player_index + 1, [2, self.turn, -1]))
+            algo.close()
+        return end_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays local matches without engine.jar")
+    parser.add_argument("algos", nargs="*", help="The folders or run files of the two algos, python-algo by default")
+    parser.add_argument("--in-process", action="store_true", help="Run the AlgoStrategy of each folder in this process instead of its run file")
+    parser.add_argument("--games", type=int, default=1, help="The number of games to play")
+    parser.add_argument("--max-turns", type=int, default=100, help="The turn games end on")
+    parser.add_argument("--seed", type=int, default=0, help="The seed of the random module for in-process algos, plus the game number")
+    parser.add_argument("--no-replay", action="store_true", help="Do not write replays")
+    parser.add_argument("--debug", action="store_true", help="Show the debug output of the algos")
+    args = parser.parse_args()
+
+    algos = (args.algos + [os.path.join(parent_dir, "python-algo")] * 2)[:2]
+    with open(os.path.join(parent_dir, "game-configs.json")) as config_file:
+        config = json.load(config_file)
+    replay_dir = os.path.join(parent_dir, "replays")
+    stderr = None if args.debug else subprocess.DEVNULL
+    wins = [0, 0, 0]
+    for game in range(args.games):
+        if args.in_process:
+            random.seed(args.seed + game)
+            players = [InProcessAlgo(load_strategy(algo, index), os.path.basename(os.path.abspath(algo)), sys.stderr if args.debug else None)
+                       for index, algo in enumerate(algos)]
+        else:
+            players = [ProcessAlgo(run_file(algo), stderr) for algo in algos]
+        replay = None
+        if not args.no_replay:
+            os.makedirs(replay_dir, exist_ok=True)
+            replay = open(os.path.join(replay_dir, "local-{}-{}.replay".format(time.strftime("%Y%m%d-%H%M%S"), game)), "w")
+        try:
+            end_stats = LocalEngine(config, players, args.max_turns, replay=replay).play()
+        finally:
+            if replay is not None:
+                replay.close()
+        wins[end_stats["winner"]] += 1
+        print("Game {}: winner {}, {} turns, {} frames, {} ms".format(
+            game + 1, end_stats["winner"] or "draw", end_stats["turns"], end_stats["frames"], end_stats["duration"]))
+    print("Player 1 won {}, player 2 won {}, {} draws".format(wins[1], wins[2], wins[0]))
+
+
+if __name__ == "__main__":
+    main()